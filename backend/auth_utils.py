@@ -1,14 +1,39 @@
 import os
 import jwt
+import time
+import asyncio
+import hashlib
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
 from typing import Optional
 import secrets
 
+from cache import TTLCache
+
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Password hashing pool settings
+PASSWORD_HASH_EXECUTOR = os.environ.get("PASSWORD_HASH_EXECUTOR", "thread")
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_QUEUE = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 32))
+
+# Authenticated-principal cache settings
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 2048))
+USER_CACHE_TTL_SECONDS = float(os.environ.get("USER_CACHE_TTL_SECONDS", 60))
+
+# Resolved users keyed by user_id; writers to the users collection must invalidate
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
+# Verified-token cache settings
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10000))
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", 300))
+
+# Verified claims keyed by SHA-256 of the raw token, never outliving the token's exp
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+
 # JWT settings
 SECRET_KEY = os.environ.get("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
@@ -22,6 +47,73 @@ def get_password_hash(password):
     """Hash a password using bcrypt"""
     return pwd_context.hash(password)
 
+class PasswordHashPool:
+    """Bounded worker pool that keeps bcrypt work off the event loop.
+
+    At most ``workers`` hashes run at once and at most ``max_queue`` more may
+    wait for a worker; anything beyond that is rejected with a 503 instead of
+    piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int, executor: str = "thread"):
+        if executor not in ("thread", "process"):
+            raise ValueError("executor must be 'thread' or 'process'")
+        self.workers = workers
+        self.max_queue = max_queue
+        self.executor_type = executor
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Number of hashes currently running or queued"""
+        return self._in_flight
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+        return self._executor
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` in the pool, or fail fast when it is saturated"""
+        if self._in_flight >= self.workers + self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server busy, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self._in_flight -= 1
+
+    def shutdown(self):
+        """Release the pool's workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+password_hash_pool = PasswordHashPool(
+    workers=PASSWORD_HASH_WORKERS,
+    max_queue=PASSWORD_HASH_MAX_QUEUE,
+    executor=PASSWORD_HASH_EXECUTOR,
+)
+
+async def verify_password_async(plain_password, hashed_password):
+    """Verify a password in the hashing pool without blocking the event loop"""
+    return await password_hash_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    """Hash a password in the hashing pool without blocking the event loop"""
+    return await password_hash_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a new JWT access token"""
     to_encode = data.copy()
@@ -34,8 +126,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
-    """Verify and decode JWT token"""
+def _decode_token(token: str):
+    """Decode and validate a JWT, returning its claims and expiry timestamp"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
@@ -49,7 +141,7 @@ def verify_token(token: str):
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        return {"email": email, "user_id": user_id, "role": role}
+        return {"email": email, "user_id": user_id, "role": role}, payload.get("exp")
     except jwt.PyJWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -57,6 +149,22 @@ def verify_token(token: str):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def verify_token(token: str):
+    """Verify and decode JWT token"""
+    token_key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(token_key)
+    if claims is None:
+        claims, expires_at = _decode_token(token)
+        ttl = TOKEN_CACHE_TTL_SECONDS
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        token_cache.set(token_key, claims, ttl=ttl)
+    return dict(claims)
+
+def invalidate_cached_user(user_id: str):
+    """Drop a user from the principal cache after their document changes"""
+    user_cache.invalidate(user_id)
+
 def generate_reset_token():
     """Generate a secure random token for password reset"""
     return secrets.token_urlsafe(32)
@@ -0,0 +1,321 @@
+"""
+Caching helpers
+
+``TTLCache`` is a bounded in-process LRU. ``SharedCache`` is the tier used by
+the hot read endpoints: it stores serialized values in a backend shared by
+every server worker (Redis) or, when CACHE_BACKEND=local, in this process.
+
+Shared entries live under versioned keys (``<prefix>:<name>:v<version>:<key>``).
+Bumping a name's version invalidates all of its entries at once and leaves
+the old keys to expire on their own. A miss is computed only once: callers
+in the same process wait on one in-flight load, and workers take a short
+lock in the backend so that only one of them recomputes a cold key.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - only needed for CACHE_BACKEND=redis
+    aioredis = None
+
+_MISSING = object()
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after a time-to-live.
+
+    Reads refresh recency; once ``maxsize`` is reached the least recently used
+    entry is evicted. Hit and miss counters are kept for monitoring.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` or ``default`` if absent or expired"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value`` for ``ttl`` seconds (defaults to the cache TTL)"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._clock() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop ``key`` from the cache if present"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of size and hit/miss counters"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Shared cache tier
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "local")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+CACHE_KEY_PREFIX = os.environ.get("CACHE_KEY_PREFIX", "ibyp")
+CACHE_DEFAULT_TTL_SECONDS = float(os.environ.get("CACHE_DEFAULT_TTL_SECONDS", "300"))
+# How long a worker trusts its copy of a version number before re-reading it
+CACHE_VERSION_TTL_SECONDS = float(os.environ.get("CACHE_VERSION_TTL_SECONDS", "1"))
+# How long a worker holds the recompute lock for a cold key
+CACHE_LOCK_TTL_SECONDS = float(os.environ.get("CACHE_LOCK_TTL_SECONDS", "10"))
+
+class LocalCacheBackend:
+    """Process-local backend with the same interface as RedisCacheBackend"""
+
+    def __init__(self, maxsize: int = 10000):
+        self._entries = TTLCache(maxsize=maxsize, ttl=CACHE_DEFAULT_TTL_SECONDS)
+        self._counters: Dict[str, int] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._entries.set(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        """Set ``key`` only if it is absent; True when it was set"""
+        if self._entries.get(key) is not None:
+            return False
+        self._entries.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str) -> None:
+        self._entries.invalidate(key)
+
+    async def get_counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def close(self) -> None:
+        pass
+
+class RedisCacheBackend:
+    """Backend on any Redis-protocol server through ``redis.asyncio``"""
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_url(cls, url: str = REDIS_URL) -> "RedisCacheBackend":
+        if aioredis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the redis package")
+        return cls(aioredis.Redis.from_url(url))
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: bytes, ttl: float) -> bool:
+        return bool(await self.client.set(key, value, px=int(ttl * 1000), nx=True))
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(key)
+
+    async def get_counter(self, key: str) -> int:
+        value = await self.client.get(key)
+        return int(value) if value is not None else 0
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(key)
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+class SharedCache:
+    """Versioned, stampede-protected cache of serialized values"""
+
+    def __init__(
+        self,
+        backend,
+        prefix: str = CACHE_KEY_PREFIX,
+        default_ttl: float = CACHE_DEFAULT_TTL_SECONDS,
+        version_ttl: float = CACHE_VERSION_TTL_SECONDS,
+        lock_ttl: float = CACHE_LOCK_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.backend = backend
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+        self.version_ttl = version_ttl
+        self.lock_ttl = lock_ttl
+        self._clock = clock
+        self._versions: Dict[str, tuple] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _version_key(self, name: str) -> str:
+        return f"{self.prefix}:{name}:version"
+
+    async def version(self, name: str) -> int:
+        cached = self._versions.get(name)
+        if cached is not None and cached[1] > self._clock():
+            return cached[0]
+        version = await self.backend.get_counter(self._version_key(name))
+        self._versions[name] = (version, self._clock() + self.version_ttl)
+        return version
+
+    async def bump(self, name: str) -> None:
+        """Invalidate every entry stored under ``name``"""
+        try:
+            version = await self.backend.incr(self._version_key(name))
+            self._versions[name] = (version, self._clock() + self.version_ttl)
+        except Exception as e:
+            self.errors += 1
+            self._versions.pop(name, None)
+            logging.error(f"Error invalidating cache {name}: {e}")
+
+    async def get_or_load(
+        self,
+        name: str,
+        key: str,
+        loader: Callable[[], Awaitable[bytes]],
+        ttl: Optional[float] = None
+    ) -> bytes:
+        """Cached bytes for ``name``/``key``, computing them with ``loader`` on a miss.
+
+        Backend failures degrade to calling ``loader`` directly.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        try:
+            full_key = f"{self.prefix}:{name}:v{await self.version(name)}:{key}"
+            value = await self.backend.get(full_key)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Error reading cache {name}: {e}")
+            return await loader()
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        inflight = self._inflight.get(full_key)
+        if inflight is None:
+            # The load runs as its own task: a cancelled caller (a client that
+            # disconnected) neither cancels it nor fails the callers sharing it
+            inflight = asyncio.ensure_future(self._load(full_key, loader, ttl))
+            self._inflight[full_key] = inflight
+            inflight.add_done_callback(lambda task: self._finish_load(full_key, task))
+        return await asyncio.shield(inflight)
+
+    def _finish_load(self, full_key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(full_key) is task:
+            del self._inflight[full_key]
+        # Mark retrieved so a load nobody awaits any more does not log a warning
+        if not task.cancelled():
+            task.exception()
+
+    async def _load(self, full_key: str, loader: Callable[[], Awaitable[bytes]], ttl: float) -> bytes:
+        lock_key = f"{full_key}:lock"
+        try:
+            acquired = await self.backend.add(lock_key, b"1", self.lock_ttl)
+            if not acquired:
+                # Another worker is computing this key; wait for its result
+                deadline = self._clock() + self.lock_ttl
+                while self._clock() < deadline:
+                    await asyncio.sleep(0.05)
+                    value = await self.backend.get(full_key)
+                    if value is not None:
+                        return value
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Error locking cache key {full_key}: {e}")
+            return await loader()
+
+        try:
+            value = await loader()
+        except BaseException:
+            # Workers waiting on the lock load for themselves instead of timing out
+            if acquired:
+                try:
+                    await self.backend.delete(lock_key)
+                except Exception as e:
+                    self.errors += 1
+                    logging.error(f"Error unlocking cache key {full_key}: {e}")
+            raise
+        try:
+            await self.backend.set(full_key, value, ttl)
+            if acquired:
+                await self.backend.delete(lock_key)
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"Error writing cache key {full_key}: {e}")
+        return value
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+def create_shared_cache(backend: Optional[str] = None) -> SharedCache:
+    """SharedCache for CACHE_BACKEND (``local`` or ``redis``)"""
+    backend = backend or CACHE_BACKEND
+    if backend == "redis":
+        return SharedCache(RedisCacheBackend.from_url(REDIS_URL))
+    if backend == "local":
+        return SharedCache(LocalCacheBackend())
+    raise ValueError(f"Unknown CACHE_BACKEND {backend!r}; expected 'local' or 'redis'")
+
+shared_cache = create_shared_cache()
@@ -0,0 +1,174 @@
+"""
+Stale checkout sweeper
+
+An abandoned checkout leaves a PENDING donation and a PENDING payment
+transaction behind. Without a sweeper, both stay pending forever. The
+sweeper walks pending transactions older than CHECKOUT_STALE_SECONDS in
+``(status, created_at)`` index order, in batches. It asks the provider for
+each session's status, with at most SWEEP_CONCURRENCY calls in flight, and
+writes every change in a batch with one ``bulk_write`` per collection:
+
+- expired sessions become EXPIRED,
+- paid sessions go through ``complete_donation`` (the webhook was missed),
+- sessions past CHECKOUT_SESSION_TTL_SECONDS are expired even when the
+  provider still reports them open (Stripe expires sessions after 24 hours
+  at most; the mock provider never does).
+
+Every write is guarded by ``status: PENDING``, so a sweep racing a webhook
+or a status poll cannot undo it. One worker at a time holds the sweep lease
+in ``counters``.
+
+Usage:
+    python checkout_sweeper.py sweep
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from donation_models import DonationStatus, PaymentStatus
+from donation_service import DonationService
+from storage import create_client
+
+CHECKOUT_STALE_SECONDS = float(os.environ.get("CHECKOUT_STALE_SECONDS", "3600"))
+CHECKOUT_SESSION_TTL_SECONDS = float(os.environ.get("CHECKOUT_SESSION_TTL_SECONDS", "86400"))
+SWEEP_INTERVAL_SECONDS = float(os.environ.get("SWEEP_INTERVAL_SECONDS", "600"))
+SWEEP_BATCH_SIZE = int(os.environ.get("SWEEP_BATCH_SIZE", "200"))
+SWEEP_CONCURRENCY = int(os.environ.get("SWEEP_CONCURRENCY", "8"))
+
+SWEEP_LEASE = "checkout_sweep"
+
+async def acquire_sweep_lease(db, holder: str, seconds: float) -> bool:
+    """Take the sweep lease unless another worker holds an unexpired one"""
+    now = datetime.utcnow()
+    try:
+        await db.counters.find_one_and_update(
+            {"_id": SWEEP_LEASE, "$or": [{"lease_until": {"$lte": now}}, {"holder": holder}]},
+            {"$set": {"holder": holder, "lease_until": now + timedelta(seconds=seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The lease document exists and is held by someone else
+        return False
+    return True
+
+async def _statuses(service: DonationService, session_ids: List[str], concurrency: int) -> Dict[str, object]:
+    """Provider status per session; sessions whose lookup failed are left out"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(session_id: str):
+        async with semaphore:
+            try:
+                return session_id, await service.get_checkout_status(session_id)
+            except Exception as e:
+                logging.warning(f"Sweeper could not check session {session_id}: {e}")
+                return session_id, None
+
+    results = await asyncio.gather(*(lookup(session_id) for session_id in session_ids))
+    return {session_id: status for session_id, status in results if status is not None}
+
+async def sweep_batch(
+    service: DonationService, transactions: List[Dict], concurrency: int, now: datetime
+) -> Dict[str, int]:
+    statuses = await _statuses(service, [t["session_id"] for t in transactions], concurrency)
+    expire_before = now - timedelta(seconds=CHECKOUT_SESSION_TTL_SECONDS)
+    transaction_ops, donation_ops = [], []
+    counts = {"checked": len(statuses), "expired": 0, "completed": 0}
+
+    for transaction in transactions:
+        status = statuses.get(transaction["session_id"])
+        if status is None:
+            continue
+        pending = {"session_id": transaction["session_id"], "status": DonationStatus.PENDING}
+        if status.payment_status == "paid":
+            if transaction.get("donation_id"):
+                await service.complete_donation(transaction["donation_id"], customer_id=status.customer)
+            transaction_ops.append(UpdateOne(pending, {"$set": {
+                "payment_status": PaymentStatus.PAID,
+                "status": DonationStatus.COMPLETED,
+                "completed_at": now,
+                "updated_at": now,
+            }}))
+            counts["completed"] += 1
+        elif status.status == "expired" or transaction["created_at"] < expire_before:
+            transaction_ops.append(UpdateOne(pending, {"$set": {"status": DonationStatus.EXPIRED, "updated_at": now}}))
+            if transaction.get("donation_id"):
+                donation_ops.append(UpdateOne(
+                    {"id": transaction["donation_id"], "status": DonationStatus.PENDING},
+                    {"$set": {"status": DonationStatus.EXPIRED}}
+                ))
+            counts["expired"] += 1
+
+    if transaction_ops:
+        await service.db.payment_transactions.bulk_write(transaction_ops, ordered=False)
+    if donation_ops:
+        await service.db.donations.bulk_write(donation_ops, ordered=False)
+    return counts
+
+async def sweep_stale_checkouts(
+    service: DonationService,
+    batch_size: int = SWEEP_BATCH_SIZE,
+    concurrency: int = SWEEP_CONCURRENCY,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """Settle every pending transaction older than CHECKOUT_STALE_SECONDS"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=CHECKOUT_STALE_SECONDS)
+    totals = {"checked": 0, "expired": 0, "completed": 0}
+    query = {"status": DonationStatus.PENDING, "created_at": {"$lt": cutoff}}
+    while True:
+        transactions = await service.db.payment_transactions.find(
+            query, {"_id": 0, "session_id": 1, "donation_id": 1, "created_at": 1}
+        ).sort("created_at", 1).limit(batch_size).to_list(batch_size)
+        if not transactions:
+            break
+        counts = await sweep_batch(service, transactions, concurrency, now)
+        for key, value in counts.items():
+            totals[key] += value
+        if len(transactions) < batch_size:
+            break
+        # Still-open sessions stay pending, so resume after the last one seen.
+        # Ties on the boundary timestamp wait for the next sweep.
+        query["created_at"] = {"$gt": transactions[-1]["created_at"], "$lt": cutoff}
+
+    if totals["expired"] or totals["completed"]:
+        logging.info(f"Checkout sweep: {totals}")
+    return totals
+
+async def sweep_periodically(service: DonationService, interval: float = SWEEP_INTERVAL_SECONDS) -> None:
+    """Background task: sweep every ``interval`` seconds while holding the lease"""
+    holder = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    while True:
+        try:
+            if await acquire_sweep_lease(service.db, holder, interval):
+                await sweep_stale_checkouts(service)
+        except Exception as e:
+            logging.error(f"Error sweeping stale checkouts: {e}")
+        await asyncio.sleep(interval)
+
+async def main(command: str) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client()
+    service = DonationService(client[os.environ.get('DB_NAME', 'test_database')])
+    try:
+        totals = await sweep_stale_checkouts(service)
+        logging.info(f"Checked {totals['checked']} stale checkouts")
+        return 0
+    finally:
+        await service.provider.close()
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["sweep"])
+    sys.exit(asyncio.run(main(parser.parse_args().command)))
@@ -0,0 +1,197 @@
+"""
+Response compression
+
+ASGI middleware that compresses responses with brotli (when the ``brotli``
+package is installed) or gzip, whichever the client prefers in
+``Accept-Encoding``. Only text-like media types are compressed, and complete
+responses smaller than COMPRESSION_MIN_SIZE are sent as they are. Streaming
+responses (exports) are compressed chunk by chunk, so they stay streaming.
+
+Responses that carry an ETag come from a cache, so their compressed bytes
+are cached too, keyed by ETag and encoding. The same payload is compressed
+once, not on every request. Compressible responses get a weak ETag and
+``Vary: Accept-Encoding``, as nginx does, and so do the 304s answering them,
+so the validator a client holds never changes between the two. Conditional
+requests still match, because If-None-Match uses weak comparison.
+"""
+import gzip
+import os
+import zlib
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from cache import TTLCache
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+# Quality 11 is meant for offline compression; 4-6 suits dynamic responses
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "5"))
+COMPRESSION_CACHE_SIZE = int(os.environ.get("COMPRESSION_CACHE_SIZE", "256"))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+)
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def choose_encoding(accept_encoding: str, supported: Tuple[str, ...]) -> Optional[str]:
+    """Best supported coding in an Accept-Encoding header, honouring q-values"""
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    best, best_q = None, 0.0
+    # ``supported`` is in server preference order, which breaks ties
+    for coding in supported:
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+class _StreamCompressor:
+    """Incremental compressor that flushes after every chunk"""
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        out = self._compress(data)
+        return out + (self._finish() if last else self._flush())
+
+def _is_compressible(headers: Headers) -> bool:
+    if "content-encoding" in headers:
+        return False
+    content_type = headers.get("content-type", "")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+def _weak(etag: str) -> str:
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size: int = COMPRESSION_MIN_SIZE, cache_size: int = COMPRESSION_CACHE_SIZE):
+        self.app = app
+        self.min_size = min_size
+        self.encodings = available_encodings()
+        # (etag, encoding) -> compressed body; entries live until evicted
+        self.cache = TTLCache(maxsize=cache_size, ttl=float("inf"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    # Bodiless, so sent now; it must repeat the 200's validator
+                    passthrough = True
+                    headers = MutableHeaders(scope=message)
+                    if "etag" in headers:
+                        headers["ETag"] = _weak(headers["etag"])
+                        headers.add_vary_header("Accept-Encoding")
+                    await send(message)
+                    return
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is not None:
+                await send({
+                    "type": "http.response.body",
+                    "body": compressor.chunk(body, last=not more_body),
+                    "more_body": more_body,
+                })
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            if not _is_compressible(headers):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            # Weak whether or not this body is compressed, to match the 304s
+            etag = headers.get("etag")
+            if etag is not None:
+                headers["ETag"] = _weak(etag)
+            if not more_body and len(body) < self.min_size:
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = encoding
+
+            if not more_body:
+                compressed = self._compress_complete(body, encoding, etag)
+                headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Streaming: length unknown, compress as chunks arrive
+            if "content-length" in headers:
+                del headers["content-length"]
+            compressor = _StreamCompressor(encoding)
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressor.chunk(body, last=False), "more_body": True})
+
+        await self.app(scope, receive, send_compressed)
+
+    def _compress_complete(self, body: bytes, encoding: str, etag: Optional[str]) -> bytes:
+        if etag is None or etag.startswith("W/"):
+            return compress(body, encoding)
+        key = (etag, encoding)
+        compressed = self.cache.get(key)
+        if compressed is None:
+            compressed = compress(body, encoding)
+            self.cache.set(key, compressed)
+        return compressed
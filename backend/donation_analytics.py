@@ -0,0 +1,152 @@
+"""
+Donation analytics
+
+Trends over completed donations for the admin dashboard: totals per week or
+month, split by donation type and by anonymous versus named, plus the
+median and 90th percentile gift size. Only the four columns involved are
+read, with a projection and in cursor batches, into numpy arrays. Bucketing,
+breakdowns and percentiles are then vectorized. Bucket codes are integer
+week or month offsets, sums come from ``np.bincount``, and per-bucket
+percentiles need one sort by (bucket, amount).
+"""
+from datetime import datetime
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from donation_models import DonationStatus
+
+ANALYTICS_BATCH_SIZE = 10000
+INTERVALS = ("week", "month")
+
+COLUMNS = ("completed_at", "amount", "donation_type", "anonymous")
+
+async def load_frame(
+    db, start: datetime, end: datetime, batch_size: int = ANALYTICS_BATCH_SIZE
+) -> pd.DataFrame:
+    """Completed donations with ``start <= completed_at < end`` as a DataFrame"""
+    cursor = db.donations.find(
+        {"status": DonationStatus.COMPLETED, "completed_at": {"$gte": start, "$lt": end}},
+        {"_id": 0, **{column: 1 for column in COLUMNS}}
+    ).batch_size(batch_size)
+
+    columns: Dict[str, List[Any]] = {column: [] for column in COLUMNS}
+    async for doc in cursor:
+        columns["completed_at"].append(doc["completed_at"])
+        columns["amount"].append(doc["amount"])
+        columns["donation_type"].append(doc.get("donation_type", "one_time"))
+        columns["anonymous"].append(doc.get("anonymous", False))
+
+    return pd.DataFrame({
+        "completed_at": pd.to_datetime(np.array(columns["completed_at"], dtype="datetime64[ms]")),
+        "amount": np.array(columns["amount"], dtype=np.float64),
+        "donation_type": pd.Categorical(columns["donation_type"]),
+        "anonymous": np.array(columns["anonymous"], dtype=bool),
+    })
+
+def bucket_index(completed_at: np.ndarray, interval: str) -> np.ndarray:
+    """Months, or Monday-started weeks, since the epoch for each timestamp"""
+    if interval == "month":
+        return completed_at.astype("datetime64[M]").astype(np.int64)
+    days = completed_at.astype("datetime64[D]").astype(np.int64)
+    # 1970-01-01 was a Thursday
+    return (days + 3) // 7
+
+def bucket_start(index: int, interval: str) -> str:
+    if interval == "month":
+        return str(np.datetime64(index, "M").astype("datetime64[D]"))
+    return str(np.datetime64(index * 7 - 3, "D"))
+
+def sort_within_groups(amounts: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """``amounts`` ordered by group code, then by amount"""
+    order = np.argsort(amounts, kind="stable")
+    grouped = codes[order]
+    if grouped.size and grouped.max() < np.iinfo(np.int16).max:
+        # Stable sorts of 16-bit keys use radix sort
+        grouped = grouped.astype(np.int16)
+    return amounts[order[np.argsort(grouped, kind="stable")]]
+
+def grouped_percentile(ordered: np.ndarray, counts: np.ndarray, q: float) -> np.ndarray:
+    """Per-group percentile with linear interpolation, as ``np.percentile`` computes it.
+
+    ``ordered`` comes from ``sort_within_groups``; empty groups yield NaN.
+    """
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = offsets + np.maximum(counts - 1, 0) * q
+    low = np.minimum(np.floor(position).astype(np.int64), max(ordered.size - 1, 0))
+    high = np.minimum(np.ceil(position).astype(np.int64), max(ordered.size - 1, 0))
+    values = ordered[low] + (ordered[high] - ordered[low]) * (position - np.floor(position))
+    return np.where(counts > 0, values, np.nan)
+
+def _money(value) -> float:
+    return round(float(value), 2)
+
+def _breakdown(labels, sums: np.ndarray, counts: np.ndarray) -> Dict[str, Dict[str, Any]]:
+    return {
+        str(label): {"amount": _money(total), "count": int(count)}
+        for label, total, count in zip(labels, sums, counts)
+        if count
+    }
+
+def summarize(frame: pd.DataFrame, interval: str = "month") -> Dict[str, Any]:
+    """Totals, per-bucket trends, breakdowns and gift-size percentiles"""
+    amounts = frame["amount"].to_numpy(dtype=np.float64)
+    types = frame["donation_type"].astype("category")
+    type_labels = list(types.cat.categories)
+    type_codes = types.cat.codes.to_numpy(dtype=np.int64)
+    anonymous = frame["anonymous"].to_numpy(dtype=bool).astype(np.int64)
+    n_types = len(type_labels)
+
+    buckets = []
+    if amounts.size:
+        index = bucket_index(frame["completed_at"].to_numpy(), interval)
+        first = int(index.min())
+        codes = index - first
+        n_buckets = int(codes.max()) + 1
+        sums = np.bincount(codes, weights=amounts, minlength=n_buckets)
+        counts = np.bincount(codes, minlength=n_buckets)
+        type_sums = np.bincount(
+            codes * n_types + type_codes, weights=amounts, minlength=n_buckets * n_types
+        ).reshape(n_buckets, n_types)
+        anonymous_sums = np.bincount(
+            codes * 2 + anonymous, weights=amounts, minlength=n_buckets * 2
+        ).reshape(n_buckets, 2)
+        ordered = sort_within_groups(amounts, codes)
+        medians = grouped_percentile(ordered, counts, 0.5)
+        p90s = grouped_percentile(ordered, counts, 0.9)
+        # Buckets with no donations are left out
+        for b in np.flatnonzero(counts):
+            buckets.append({
+                "start": bucket_start(first + int(b), interval),
+                "amount": _money(sums[b]),
+                "count": int(counts[b]),
+                "median": _money(medians[b]),
+                "p90": _money(p90s[b]),
+                "by_type": {str(label): _money(type_sums[b, t]) for t, label in enumerate(type_labels)},
+                "anonymous_amount": _money(anonymous_sums[b, 1]),
+                "named_amount": _money(anonymous_sums[b, 0]),
+            })
+
+    median, p90 = np.percentile(amounts, [50, 90]) if amounts.size else (0.0, 0.0)
+    return {
+        "interval": interval,
+        "total_amount": _money(amounts.sum()),
+        "total_count": int(amounts.size),
+        "median": _money(median),
+        "p90": _money(p90),
+        "by_type": _breakdown(
+            type_labels,
+            np.bincount(type_codes, weights=amounts, minlength=n_types),
+            np.bincount(type_codes, minlength=n_types)
+        ),
+        "by_anonymity": _breakdown(
+            ["named", "anonymous"],
+            np.bincount(anonymous, weights=amounts, minlength=2),
+            np.bincount(anonymous, minlength=2)
+        ),
+        "buckets": buckets,
+    }
+
+async def donation_analytics(db, start: datetime, end: datetime, interval: str = "month") -> Dict[str, Any]:
+    return summarize(await load_frame(db, start, end), interval)
@@ -34,6 +34,10 @@ class Donation(BaseModel):
     message: Optional[str] = None
     anonymous: bool = False
     payment_session_id: Optional[str] = None
+    # Provider customer holding the card saved by a recurring checkout
+    customer_id: Optional[str] = None
+    # Set on charges made by a recurring pledge
+    pledge_id: Optional[str] = None
     payment_status: PaymentStatus = PaymentStatus.PENDING
     status: DonationStatus = DonationStatus.PENDING
     created_at: datetime = Field(default_factory=datetime.utcnow)
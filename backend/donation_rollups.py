@@ -0,0 +1,169 @@
+"""
+Materialized donation rollups
+
+Completed donations are totalled into the ``donation_rollups`` collection,
+one document per bucket:
+
+    {"_id": "day:2025-03-15", "period": "day", "key": "2025-03-15", "total": 150.0, "count": 3}
+    {"_id": "month:2025-03", ...}
+    {"_id": "all", ...}
+
+``record_completion`` adds a donation to its three buckets with ``$inc``
+upserts in a single bulk write, right after the guarded update that moves
+the donation to COMPLETED. This way each donation is counted exactly once.
+Stats read two documents, and a date range sums its day buckets through an
+``_id`` range scan.
+
+The backfill command fills an empty collection from existing donations. The
+rebuild command recomputes every bucket, repairing drift.
+
+Usage:
+    python donation_rollups.py backfill
+    python donation_rollups.py rebuild
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+
+from donation_models import DonationStatus
+from storage import create_client
+
+ROLLUPS_COLLECTION = "donation_rollups"
+ALL_TIME = "all"
+
+def bucket_keys(completed_at: datetime) -> Dict[str, str]:
+    """Bucket period -> bucket key for a completion time (UTC)"""
+    return {"day": f"{completed_at:%Y-%m-%d}", "month": f"{completed_at:%Y-%m}", ALL_TIME: ALL_TIME}
+
+def bucket_id(period: str, key: str) -> str:
+    return ALL_TIME if period == ALL_TIME else f"{period}:{key}"
+
+def _bucket_doc(period: str, key: str, total: float, count: int) -> Dict[str, Any]:
+    return {
+        "_id": bucket_id(period, key),
+        "period": period,
+        "key": key,
+        "total": total,
+        "count": count,
+        "updated_at": datetime.utcnow(),
+    }
+
+async def record_completion(db: AsyncIOMotorDatabase, amount: float, completed_at: datetime, session=None) -> None:
+    """Add one completed donation to its day, month and all-time buckets"""
+    now = datetime.utcnow()
+    await db[ROLLUPS_COLLECTION].bulk_write([
+        UpdateOne(
+            {"_id": bucket_id(period, key)},
+            {
+                "$inc": {"total": amount, "count": 1},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {"period": period, "key": key},
+            },
+            upsert=True,
+        )
+        for period, key in bucket_keys(completed_at).items()
+    ], session=session)
+
+def _totals(doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {"total": doc["total"], "count": doc["count"]} if doc else {"total": 0, "count": 0}
+
+async def read_stats(db: AsyncIOMotorDatabase, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """All-time and current-month totals from two rollup documents"""
+    month_id = bucket_id("month", bucket_keys(now or datetime.utcnow())["month"])
+    docs = {
+        doc["_id"]: doc
+        for doc in await db[ROLLUPS_COLLECTION].find({"_id": {"$in": [ALL_TIME, month_id]}}).to_list(2)
+    }
+    all_time = _totals(docs.get(ALL_TIME))
+    month = _totals(docs.get(month_id))
+    return {
+        "total_amount": all_time["total"],
+        "total_count": all_time["count"],
+        "monthly_amount": month["total"],
+        "monthly_count": month["count"],
+    }
+
+async def read_range(db: AsyncIOMotorDatabase, start: date, end: date) -> Dict[str, Any]:
+    """Totals for completions between ``start`` and ``end`` inclusive, from day buckets"""
+    amount, count = 0, 0
+    cursor = db[ROLLUPS_COLLECTION].find(
+        {"_id": {"$gte": f"day:{start:%Y-%m-%d}", "$lte": f"day:{end:%Y-%m-%d}"}},
+        {"total": 1, "count": 1}
+    )
+    async for doc in cursor:
+        amount += doc["total"]
+        count += doc["count"]
+    return {"start": start.isoformat(), "end": end.isoformat(), "amount": amount, "count": count}
+
+async def compute_rollups(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Every bucket recomputed from completed donations (one aggregation)"""
+    pipeline = [
+        {"$match": {"status": DonationStatus.COMPLETED, "completed_at": {"$ne": None}}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$completed_at"}},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ]
+    days = await db.donations.aggregate(pipeline).to_list(length=None)
+    months: Dict[str, List[float]] = {}
+    grand = [0, 0]
+    for day in days:
+        month = months.setdefault(day["_id"][:7], [0, 0])
+        for totals in (month, grand):
+            totals[0] += day["total"]
+            totals[1] += day["count"]
+
+    buckets = [_bucket_doc("day", day["_id"], day["total"], day["count"]) for day in days]
+    buckets += [_bucket_doc("month", key, total, count) for key, (total, count) in months.items()]
+    buckets.append(_bucket_doc(ALL_TIME, ALL_TIME, grand[0], grand[1]))
+    return buckets
+
+async def rebuild_rollups(db: AsyncIOMotorDatabase) -> int:
+    """Replace every bucket with values recomputed from ``donations``.
+
+    Completions recorded while the rebuild runs can be lost from their
+    buckets; run it when payments are quiet, or run it again.
+    """
+    buckets = await compute_rollups(db)
+    ids = [bucket["_id"] for bucket in buckets]
+    operations = [ReplaceOne({"_id": bucket["_id"]}, bucket, upsert=True) for bucket in buckets]
+    operations.append(DeleteMany({"_id": {"$nin": ids}}))
+    await db[ROLLUPS_COLLECTION].bulk_write(operations)
+    logging.info(f"Rebuilt {len(buckets)} donation rollup buckets")
+    return len(buckets)
+
+async def backfill_rollups(db: AsyncIOMotorDatabase) -> int:
+    """Build the rollups if they have never been built; returns the bucket count written"""
+    if await db[ROLLUPS_COLLECTION].find_one({"_id": ALL_TIME}):
+        logging.info("Donation rollups already exist; use rebuild to recompute them")
+        return 0
+    return await rebuild_rollups(db)
+
+async def main(command: str) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client()
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        if command == "backfill":
+            await backfill_rollups(db)
+        else:
+            await rebuild_rollups(db)
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["backfill", "rebuild"])
+    sys.exit(asyncio.run(main(parser.parse_args().command)))
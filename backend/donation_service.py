@@ -1,5 +1,5 @@
 import os
-from typing import Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from fastapi import HTTPException, Request
 # Temporarily disable Stripe integration due to missing emergentintegrations module
 # from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionRequest
@@ -15,12 +15,43 @@ from donation_models import (
     CheckoutResponse
 )
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from auth_utils import invalidate_cached_user
+from cache import shared_cache
+from donation_rollups import read_range, read_stats, record_completion
+from donation_analytics import donation_analytics
+from donor_ledger import get_ledger, record_donation
+from payment_provider import SESSION_ID_PLACEHOLDER, CheckoutStatus, PaymentProvider, create_provider
+from payment_status import is_terminal, payment_status_broker
+from recurring_pledges import cancel_pledge, create_pledge, get_user_pledges
+from serialization import dumps, projection_for
+from storage import supports_transactions
+from webhook_queue import STRIPE_WEBHOOK_SECRET, InvalidSignature, WebhookQueue, verify_signature
+import json
 import logging
-from datetime import datetime
+from datetime import date, datetime, timedelta
+
+DONATION_STATS_CACHE_TTL_SECONDS = float(os.environ.get("DONATION_STATS_CACHE_TTL_SECONDS", "60"))
+DONATION_ANALYTICS_CACHE_TTL_SECONDS = float(os.environ.get("DONATION_ANALYTICS_CACHE_TTL_SECONDS", "300"))
+
+# A completion whose effects are still pending after this long is resumed by the next retry
+COMPLETION_EFFECTS_LEASE_SECONDS = float(os.environ.get("COMPLETION_EFFECTS_LEASE_SECONDS", "60"))
+
+RECURRING_TYPES = (DonationType.MONTHLY, DonationType.YEARLY)
+
+# Side effects of completing a donation, applied in this order
+COMPLETION_EFFECTS = ("rollup", "ledger", "pledge")
+COMPLETION_PROJECTION = {
+    "_id": 0, "id": 1, "amount": 1, "user_id": 1, "email": 1, "currency": 1, "donation_type": 1,
+    "pledge_id": 1, "customer_id": 1, "completed_at": 1, "effects_pending": 1
+}
 
 class DonationService:
-    def __init__(self, db: AsyncIOMotorDatabase):
+    # db is an AsyncIOMotorDatabase or its in-memory stand-in (see storage.py)
+    def __init__(self, db: AsyncIOMotorDatabase, provider: Optional[PaymentProvider] = None):
         self.db = db
+        self.provider = provider or create_provider()
+        self.webhook_queue = WebhookQueue(db)
         self.stripe_api_key = os.environ.get("STRIPE_API_KEY")
         if not self.stripe_api_key:
             raise ValueError("STRIPE_API_KEY environment variable is required")
@@ -79,6 +110,23 @@ class DonationService:
         email: Optional[str] = None
     ) -> Donation:
         """Create a new donation record"""
+        donation = self.build_donation(donation_data, user_id, email)
+        
+        try:
+            await self.db.donations.insert_one(donation.dict())
+            logging.info(f"Created donation: {donation.id} for amount ${donation.amount}")
+            return donation
+        except Exception as e:
+            logging.error(f"Error creating donation: {e}")
+            raise HTTPException(status_code=500, detail="Error creating donation")
+
+    def build_donation(
+        self,
+        donation_data: DonationCreate,
+        user_id: Optional[str] = None,
+        email: Optional[str] = None
+    ) -> Donation:
+        """Donation model for a request, not yet stored"""
         donation_dict = donation_data.dict()
         
         if user_id:
@@ -88,15 +136,7 @@ class DonationService:
         if donation_data.donor_email:
             donation_dict["email"] = donation_data.donor_email
             
-        donation = Donation(**donation_dict)
-        
-        try:
-            await self.db.donations.insert_one(donation.dict())
-            logging.info(f"Created donation: {donation.id} for amount ${donation.amount}")
-            return donation
-        except Exception as e:
-            logging.error(f"Error creating donation: {e}")
-            raise HTTPException(status_code=500, detail="Error creating donation")
+        return Donation(**donation_dict)
 
     async def create_checkout_session(
         self, 
@@ -134,16 +174,14 @@ class DonationService:
             donor_email=checkout_request.donor_email
         )
         
-        donation = await self.create_donation(
+        donation = self.build_donation(
             donation_create, 
             user_id=user_id, 
             email=user_email or checkout_request.donor_email
         )
 
-        # TEMPORARILY MOCKED - Stripe integration disabled due to missing emergentintegrations module
-        # Setup mock checkout session for testing
         host_url = checkout_request.origin_url
-        success_url = f"{host_url}/dons/succes?session_id=mock_session_123"
+        success_url = f"{host_url}/dons/succes?session_id={SESSION_ID_PLACEHOLDER}"
         cancel_url = f"{host_url}/dons"
 
         # Prepare metadata
@@ -159,15 +197,22 @@ class DonationService:
             metadata["donor_name"] = donation.donor_name
 
         try:
-            # MOCK: Create fake session for testing
-            class MockSession:
-                def __init__(self):
-                    self.session_id = f"mock_session_{donation.id}"
-                    self.url = f"https://checkout.stripe.com/pay/mock_session_{donation.id}"
-            
-            session = MockSession()
+            session = await self.provider.create_checkout_session(
+                amount=amount,
+                currency="usd",
+                product_name="Don - Iglesia Bautista Yaguita de Pastor",
+                success_url=success_url,
+                cancel_url=cancel_url,
+                metadata=metadata,
+                # Retried creations return the same session
+                idempotency_key=donation.id,
+                # Later gifts of a pledge are charged to the saved card
+                save_payment_method=donation.donation_type in RECURRING_TYPES
+            )
             
-            # Create payment transaction record
+            # The session id is known before anything is written, so both
+            # documents are inserted once, complete
+            donation.payment_session_id = session.session_id
             payment_transaction = PaymentTransaction(
                 session_id=session.session_id,
                 user_id=user_id,
@@ -180,13 +225,7 @@ class DonationService:
                 status=DonationStatus.PENDING
             )
             
-            await self.db.payment_transactions.insert_one(payment_transaction.dict())
-            
-            # Update donation with session ID
-            await self.db.donations.update_one(
-                {"id": donation.id},
-                {"$set": {"payment_session_id": session.session_id}}
-            )
+            await self.insert_checkout_records(donation, payment_transaction)
             
             logging.info(f"Created checkout session {session.session_id} for donation {donation.id}")
             
@@ -198,157 +237,351 @@ class DonationService:
             
         except Exception as e:
             logging.error(f"Error creating checkout session: {e}")
-            # Clean up donation if checkout fails
-            await self.db.donations.delete_one({"id": donation.id})
             raise HTTPException(status_code=500, detail="Error creating payment session")
 
+    async def insert_checkout_records(self, donation: Donation, transaction: PaymentTransaction):
+        """Write a checkout's donation and payment transaction together.
+
+        On a replica set both inserts run in one multi-document transaction.
+        Otherwise they are ordered inserts, and the donation is removed again
+        if the transaction insert fails.
+        """
+        donation_doc = donation.dict()
+        transaction_doc = transaction.dict()
+
+        if await supports_transactions(self.db):
+            async def write(session):
+                await self.db.donations.insert_one(donation_doc, session=session)
+                await self.db.payment_transactions.insert_one(transaction_doc, session=session)
+
+            async with await self.db.client.start_session() as session:
+                await session.with_transaction(write)
+            return
+
+        await self.db.donations.insert_one(donation_doc)
+        try:
+            await self.db.payment_transactions.insert_one(transaction_doc)
+        except Exception:
+            await self.db.donations.delete_one({"id": donation.id})
+            raise
+
+    async def get_checkout_status(self, session_id: str) -> CheckoutStatus:
+        """Checkout session status from the payment provider"""
+        return await self.provider.get_checkout_status(session_id)
+
     async def check_payment_status(self, session_id: str):
-        """Check payment status from Stripe and update records"""
-        
-        # Check if already processed
-        existing_transaction = await self.db.payment_transactions.find_one(
-            {"session_id": session_id, "payment_status": PaymentStatus.PAID}
+        """Check payment status from Stripe and update records.
+
+        Terminal results are served from the in-process cache, and the
+        transaction is only rewritten when its status actually changes.
+        """
+        cached = payment_status_broker.cached(session_id)
+        if cached is not None:
+            return cached
+
+        transaction = await self.db.payment_transactions.find_one(
+            {"session_id": session_id},
+            {"_id": 0, "payment_status": 1, "status": 1, "amount": 1, "currency": 1, "donation_id": 1}
         )
-        if existing_transaction:
-            return {
+
+        # Check if already processed
+        if transaction and transaction.get("payment_status") == PaymentStatus.PAID:
+            return self._terminal(session_id, {
                 "status": "completed",
                 "payment_status": "paid",
-                "amount": existing_transaction["amount"],
-                "currency": existing_transaction["currency"]
-            }
+                "amount": transaction["amount"],
+                "currency": transaction["currency"]
+            })
+        if transaction and transaction.get("status") == DonationStatus.EXPIRED:
+            return self._terminal(session_id, {
+                "status": "expired",
+                "payment_status": transaction["payment_status"],
+                "amount": transaction["amount"],
+                "currency": transaction["currency"]
+            })
 
         try:
-            # MOCK: Return mock status for testing
-            class MockCheckoutStatus:
-                def __init__(self):
-                    self.status = "open"
-                    self.payment_status = "unpaid"
-                    self.amount_total = 5000  # $50.00 in cents
-                    self.currency = "usd"
-            
-            checkout_status = MockCheckoutStatus()
+            checkout_status = await self.get_checkout_status(session_id)
             
             # Update payment transaction
             update_data = {
-                "payment_status": PaymentStatus.PAID if checkout_status.payment_status == "paid" else PaymentStatus.FAILED,
-                "updated_at": datetime.utcnow()
+                "payment_status": PaymentStatus.PAID if checkout_status.payment_status == "paid" else PaymentStatus.FAILED
             }
-            
             if checkout_status.payment_status == "paid":
                 update_data["status"] = DonationStatus.COMPLETED
                 update_data["completed_at"] = datetime.utcnow()
-                
-                # Update donation record
-                transaction = await self.db.payment_transactions.find_one({"session_id": session_id})
-                if transaction and transaction.get("donation_id"):
-                    await self.db.donations.update_one(
-                        {"id": transaction["donation_id"]},
-                        {"$set": {
-                            "payment_status": PaymentStatus.PAID,
-                            "status": DonationStatus.COMPLETED,
-                            "completed_at": datetime.utcnow()
-                        }}
-                    )
-                    
-                    # Update user donation total if user is logged in
-                    if transaction.get("user_id"):
-                        await self.update_user_donation_total(
-                            transaction["user_id"], 
-                            transaction["amount"]
-                        )
+            elif checkout_status.status == "expired":
+                update_data["status"] = DonationStatus.EXPIRED
             
-            await self.db.payment_transactions.update_one(
-                {"session_id": session_id},
-                {"$set": update_data}
+            # Polls of an unchanged session leave the transaction untouched
+            changed = transaction is not None and any(
+                transaction.get(field) != update_data[field]
+                for field in ("payment_status", "status") if field in update_data
             )
+            if changed:
+                if checkout_status.payment_status == "paid" and transaction.get("donation_id"):
+                    await self.complete_donation(transaction["donation_id"], customer_id=checkout_status.customer)
+                
+                update_data["updated_at"] = datetime.utcnow()
+                await self.db.payment_transactions.update_one(
+                    {"session_id": session_id},
+                    {"$set": update_data}
+                )
             
-            return {
+            payload = {
                 "status": checkout_status.status,
                 "payment_status": checkout_status.payment_status,
                 "amount": checkout_status.amount_total / 100,  # Convert from cents
                 "currency": checkout_status.currency
             }
+            if is_terminal(payload):
+                return self._terminal(session_id, payload)
+            return payload
             
         except Exception as e:
             logging.error(f"Error checking payment status: {e}")
             raise HTTPException(status_code=500, detail="Error checking payment status")
 
+    def _terminal(self, session_id: str, payload: Dict) -> Dict:
+        payment_status_broker.publish(session_id, payload)
+        return payload
+
+    async def complete_donation(
+        self, donation_id: str, invalidate: bool = True, customer_id: Optional[str] = None
+    ) -> bool:
+        """Move a donation to COMPLETED and apply its side effects.
+
+        The guarded flip to COMPLETED happens once. It also records every side
+        effect (rollups, donor ledger, pledge) in ``effects_pending``, and each
+        effect is pulled from that list once it has been applied. A call that
+        finds the donation already completed finishes whatever is still pending,
+        so an error part way through is repaired when the caller (the webhook
+        queue, the sweeper, the next status poll) retries. On replica sets each
+        effect and its marker are one transaction, so effects apply exactly
+        once; elsewhere a crash between the two can repeat one effect, which the
+        rollup and ledger rebuild commands correct.
+
+        Returns False when the donation does not exist or was already completed.
+        Batch callers pass ``invalidate=False`` and bump the stats caches once.
+        ``customer_id`` is the provider customer the checkout saved the card on.
+        """
+        completed_at = datetime.utcnow()
+        update = {
+            "payment_status": PaymentStatus.PAID,
+            "status": DonationStatus.COMPLETED,
+            "completed_at": completed_at,
+            "effects_pending": list(COMPLETION_EFFECTS),
+            "effects_lease_until": completed_at + timedelta(seconds=COMPLETION_EFFECTS_LEASE_SECONDS)
+        }
+        if customer_id:
+            update["customer_id"] = customer_id
+        donation = await self.db.donations.find_one_and_update(
+            {"id": donation_id, "status": {"$ne": DonationStatus.COMPLETED}},
+            {"$set": update},
+            projection=COMPLETION_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if donation is None:
+            await self._resume_effects(donation_id, invalidate)
+            return False
+        await self._apply_effects(donation, invalidate)
+        return True
+
+    async def _resume_effects(self, donation_id: str, invalidate: bool) -> None:
+        """Finish the effects a failed completion left pending, once its lease expired"""
+        now = datetime.utcnow()
+        donation = await self.db.donations.find_one_and_update(
+            {
+                "id": donation_id,
+                "status": DonationStatus.COMPLETED,
+                "effects_pending": {"$exists": True, "$ne": []},
+                "effects_lease_until": {"$lte": now},
+            },
+            {"$set": {"effects_lease_until": now + timedelta(seconds=COMPLETION_EFFECTS_LEASE_SECONDS)}},
+            projection=COMPLETION_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if donation is not None:
+            logging.warning(f"Resuming completion effects {donation['effects_pending']} of donation {donation['id']}")
+            await self._apply_effects(donation, invalidate)
+
+    async def _apply_effects(self, donation: Dict, invalidate: bool) -> None:
+        pending = donation["effects_pending"]
+        amount, completed_at = donation["amount"], donation["completed_at"]
+        user_id = donation.get("user_id")
+        starts_pledge = donation.get("donation_type") in RECURRING_TYPES and not donation.get("pledge_id")
+        if starts_pledge and not donation.get("customer_id"):
+            logging.error(f"Recurring donation {donation['id']} completed without a saved customer; no pledge created")
+            starts_pledge = False
+
+        if "rollup" in pending:
+            await self._apply_effect(donation["id"], "rollup", lambda session: record_completion(
+                self.db, amount, completed_at, session=session
+            ))
+            if invalidate:
+                await shared_cache.bump("donation_stats")
+                await shared_cache.bump("donation_analytics")
+        if "ledger" in pending:
+            apply_ledger = None
+            if user_id:
+                def apply_ledger(session):
+                    return record_donation(self.db, user_id, amount, completed_at, session=session)
+            await self._apply_effect(donation["id"], "ledger", apply_ledger)
+            if user_id:
+                invalidate_cached_user(user_id)
+        if "pledge" in pending:
+            apply_pledge = None
+            if starts_pledge:
+                def apply_pledge(session):
+                    return create_pledge(self.db, donation, completed_at, session=session)
+            await self._apply_effect(donation["id"], "pledge", apply_pledge)
+
+    async def _apply_effect(
+        self, donation_id: str, effect: str, apply: Optional[Callable[[Any], Awaitable[Any]]]
+    ) -> None:
+        """Run one completion effect (None: nothing to do) and clear its marker"""
+        marker = ({"id": donation_id, "effects_pending": effect}, {"$pull": {"effects_pending": effect}})
+        if apply is None:
+            await self.db.donations.update_one(*marker)
+            return
+        if await supports_transactions(self.db):
+            async def write(session):
+                # The marker is cleared first: a concurrent retry conflicts and then finds it gone
+                result = await self.db.donations.update_one(*marker, session=session)
+                if result.modified_count:
+                    await apply(session)
+
+            async with await self.db.client.start_session() as session:
+                await session.with_transaction(write)
+            return
+        await apply(None)
+        await self.db.donations.update_one(*marker)
+
     async def handle_webhook(self, request_body: bytes, stripe_signature: str):
-        """Handle Stripe webhook events - MOCKED"""
+        """Verify a Stripe webhook and queue it; workers apply it later"""
         try:
-            # MOCK: Return success for testing
-            return {"status": "success", "message": "Webhook mocked - emergentintegrations not available"}
-            
-        except Exception as e:
+            verify_signature(request_body, stripe_signature, STRIPE_WEBHOOK_SECRET)
+            event = json.loads(request_body)
+            event_id, event_type = event["id"], event["type"]
+        except (InvalidSignature, ValueError, KeyError, TypeError) as e:
             logging.error(f"Webhook error: {e}")
             raise HTTPException(status_code=400, detail="Webhook processing failed")
 
-    async def update_user_donation_total(self, user_id: str, amount: float):
-        """Update user's total donation amount"""
-        try:
-            # Get current total
-            user = await self.db.users.find_one({"id": user_id})
-            current_total = user.get("donation_total", 0.0) if user else 0.0
-            
-            # Update total
-            new_total = current_total + amount
-            await self.db.users.update_one(
-                {"id": user_id},
-                {"$set": {"donation_total": new_total, "updated_at": datetime.utcnow()}}
+        queued = await self.webhook_queue.enqueue(event_id, event_type, request_body)
+        return {"status": "success", "duplicate": not queued}
+
+    async def apply_webhook_event(self, event: Dict):
+        """Apply a queued Stripe event to donations and payment transactions.
+
+        Safe to run more than once for the same event: every write is guarded
+        by the state it moves away from.
+        """
+        event_type = event["type"]
+        session = event["data"]["object"]
+        session_id = session["id"]
+
+        if event_type in ("checkout.session.completed", "checkout.session.async_payment_succeeded"):
+            if session.get("payment_status") != "paid":
+                # Delayed payment methods complete later with async_payment_succeeded
+                return
+            update = {"payment_status": PaymentStatus.PAID, "status": DonationStatus.COMPLETED}
+            terminal = {"status": "complete", "payment_status": "paid"}
+        elif event_type == "checkout.session.async_payment_failed":
+            update = {"payment_status": PaymentStatus.FAILED, "status": DonationStatus.FAILED}
+            terminal = {"status": "complete", "payment_status": "failed"}
+        elif event_type == "checkout.session.expired":
+            update = {"status": DonationStatus.EXPIRED}
+            terminal = {"status": "expired", "payment_status": session.get("payment_status", "unpaid")}
+        else:
+            return
+
+        transaction = await self.db.payment_transactions.find_one(
+            {"session_id": session_id},
+            {"_id": 0, "donation_id": 1, "amount": 1, "currency": 1}
+        )
+        if transaction is None:
+            raise LookupError(f"No payment transaction for session {session_id}")
+
+        now = datetime.utcnow()
+        if update["status"] == DonationStatus.COMPLETED:
+            await self.complete_donation(transaction["donation_id"], customer_id=session.get("customer"))
+            update["completed_at"] = now
+        else:
+            await self.db.donations.update_one(
+                {"id": transaction["donation_id"], "status": DonationStatus.PENDING},
+                {"$set": update}
             )
-            
-            logging.info(f"Updated user {user_id} donation total to ${new_total}")
-            
-        except Exception as e:
-            logging.error(f"Error updating user donation total: {e}")
+        # A paid transaction is final, whatever arrives after it
+        await self.db.payment_transactions.update_one(
+            {"session_id": session_id, "payment_status": {"$ne": PaymentStatus.PAID}},
+            {"$set": {**update, "updated_at": now}}
+        )
+        payment_status_broker.publish(session_id, {
+            **terminal,
+            "amount": transaction["amount"],
+            "currency": transaction["currency"]
+        })
 
-    async def get_user_donations(self, user_id: str, limit: int = 20) -> List[Donation]:
-        """Get user's donation history"""
+    async def get_user_pledges(self, user_id: str) -> List[Dict]:
+        """User's recurring pledges, newest first"""
+        return await get_user_pledges(self.db, user_id)
+
+    async def cancel_pledge(self, user_id: str, pledge_id: str) -> bool:
+        """Stop future charges of one of the user's pledges"""
+        return await cancel_pledge(self.db, user_id, pledge_id)
+
+    async def get_donor_ledger(self, user_id: str) -> Dict:
+        """User's lifetime and per-year donation totals"""
+        return await get_ledger(self.db, user_id)
+
+    async def get_user_donation_documents(self, user_id: str, limit: int = 20) -> List[Dict]:
+        """Get user's donation history as raw documents projected to Donation fields"""
         try:
             donations_cursor = self.db.donations.find(
-                {"user_id": user_id}
+                {"user_id": user_id}, projection_for(Donation)
             ).sort("created_at", -1).limit(limit)
             
-            donations = await donations_cursor.to_list(length=limit)
-            return [Donation(**donation) for donation in donations]
+            return await donations_cursor.to_list(length=limit)
             
         except Exception as e:
             logging.error(f"Error getting user donations: {e}")
             return []
 
-    async def get_donation_stats(self) -> Dict:
-        """Get donation statistics for admin"""
+    async def get_user_donations(self, user_id: str, limit: int = 20) -> List[Donation]:
+        """Get user's donation history"""
+        donations = await self.get_user_donation_documents(user_id, limit)
+        return [Donation(**donation) for donation in donations]
+
+    async def get_donation_stats(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict:
+        """Get donation statistics for admin, optionally with totals for a date range"""
         try:
-            # Total donations
-            total_pipeline = [
-                {"$match": {"status": DonationStatus.COMPLETED}},
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}
-            ]
-            total_result = await self.db.donations.aggregate(total_pipeline).to_list(length=1)
-            total_amount = total_result[0]["total"] if total_result else 0
-            total_count = total_result[0]["count"] if total_result else 0
-            
-            # Monthly donations
-            monthly_pipeline = [
-                {"$match": {
-                    "status": DonationStatus.COMPLETED,
-                    "completed_at": {
-                        "$gte": datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                    }
-                }},
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}}
-            ]
-            monthly_result = await self.db.donations.aggregate(monthly_pipeline).to_list(length=1)
-            monthly_amount = monthly_result[0]["total"] if monthly_result else 0
-            monthly_count = monthly_result[0]["count"] if monthly_result else 0
-            
-            return {
-                "total_amount": total_amount,
-                "total_count": total_count,
-                "monthly_amount": monthly_amount,
-                "monthly_count": monthly_count
-            }
+            # Keyed by month so the monthly figures roll over on the 1st
+            key = datetime.utcnow().strftime("%Y-%m")
+            if start and end:
+                key += f":{start.isoformat()}:{end.isoformat()}"
+            body = await shared_cache.get_or_load(
+                "donation_stats", key, lambda: self._load_donation_stats(start, end), DONATION_STATS_CACHE_TTL_SECONDS
+            )
+            return json.loads(body)
             
         except Exception as e:
             logging.error(f"Error getting donation stats: {e}")
-            return {"total_amount": 0, "total_count": 0, "monthly_amount": 0, "monthly_count": 0}
\ No newline at end of file
+            return {"total_amount": 0, "total_count": 0, "monthly_amount": 0, "monthly_count": 0}
+
+    async def _load_donation_stats(self, start: Optional[date], end: Optional[date]) -> bytes:
+        # Read from the rollups maintained by complete_donation
+        stats = await read_stats(self.db)
+        if start and end:
+            stats["range"] = await read_range(self.db, start, end)
+        return dumps(stats)
+
+    async def get_donation_analytics(self, start: datetime, end: datetime, interval: str = "month") -> Dict:
+        """Donation trends for admin over ``start <= completed_at < end``, cached per range"""
+        async def load() -> bytes:
+            return dumps(await donation_analytics(self.db, start, end, interval))
+
+        key = f"{start.isoformat()}:{end.isoformat()}:{interval}"
+        body = await shared_cache.get_or_load(
+            "donation_analytics", key, load, DONATION_ANALYTICS_CACHE_TTL_SECONDS
+        )
+        return json.loads(body)
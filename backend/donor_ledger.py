@@ -0,0 +1,139 @@
+"""
+Per-donor donation ledger
+
+One ``donor_ledger`` document per signed-in donor holds the running total,
+the donation count, and per-year subtotals that annual receipts are built
+from:
+
+    {"_id": "<user id>", "total": 350.0, "count": 4,
+     "years": {"2024": {"total": 100.0, "count": 1}, "2025": {...}}}
+
+Completions apply ``$inc`` to the ledger and to ``users.donation_total``, so
+concurrent completions for the same donor never lose updates. The reconcile
+command recomputes every ledger and user total from ``donations`` in a single
+aggregation and writes them back in bulk.
+
+Usage:
+    python donor_ledger.py reconcile
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne, UpdateOne
+
+from donation_models import DonationStatus
+from storage import create_client
+
+LEDGER_COLLECTION = "donor_ledger"
+RECONCILE_BATCH_SIZE = 1000
+
+async def record_donation(
+    db: AsyncIOMotorDatabase, user_id: str, amount: float, completed_at: datetime, session=None
+) -> None:
+    """Add a completed donation to the donor's ledger and user total"""
+    now = datetime.utcnow()
+    year = str(completed_at.year)
+    await db[LEDGER_COLLECTION].update_one(
+        {"_id": user_id},
+        {
+            "$inc": {
+                "total": amount,
+                "count": 1,
+                f"years.{year}.total": amount,
+                f"years.{year}.count": 1,
+            },
+            "$set": {"updated_at": now},
+        },
+        upsert=True,
+        session=session
+    )
+    await db.users.update_one(
+        {"id": user_id},
+        {"$inc": {"donation_total": amount}, "$set": {"updated_at": now}},
+        session=session
+    )
+
+async def get_ledger(db: AsyncIOMotorDatabase, user_id: str) -> Dict[str, Any]:
+    """The donor's ledger, or an empty one"""
+    ledger = await db[LEDGER_COLLECTION].find_one({"_id": user_id}, {"_id": 0, "updated_at": 0})
+    return ledger or {"total": 0.0, "count": 0, "years": {}}
+
+async def compute_ledgers(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Every donor's ledger recomputed from completed donations"""
+    pipeline = [
+        {"$match": {"status": DonationStatus.COMPLETED, "user_id": {"$ne": None}}},
+        {"$group": {
+            "_id": {"user_id": "$user_id", "year": {"$year": "$completed_at"}},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$group": {
+            "_id": "$_id.user_id",
+            "total": {"$sum": "$total"},
+            "count": {"$sum": "$count"},
+            "years": {"$push": {"year": "$_id.year", "total": "$total", "count": "$count"}},
+        }},
+    ]
+    ledgers = await db.donations.aggregate(pipeline).to_list(length=None)
+    for ledger in ledgers:
+        ledger["years"] = {
+            str(year["year"]): {"total": year["total"], "count": year["count"]}
+            for year in ledger["years"]
+        }
+    return ledgers
+
+async def reconcile_ledgers(db: AsyncIOMotorDatabase, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    """Rewrite every ledger and ``users.donation_total`` from ``donations``.
+
+    Completions recorded while this runs can be overwritten; run it when
+    payments are quiet. Returns the number of donors reconciled.
+    """
+    ledgers = await compute_ledgers(db)
+    now = datetime.utcnow()
+    for offset in range(0, len(ledgers), batch_size):
+        batch = ledgers[offset:offset + batch_size]
+        await db[LEDGER_COLLECTION].bulk_write(
+            [ReplaceOne({"_id": ledger["_id"]}, {**ledger, "updated_at": now}, upsert=True) for ledger in batch],
+            ordered=False
+        )
+        await db.users.bulk_write(
+            [
+                UpdateOne({"id": ledger["_id"]}, {"$set": {"donation_total": ledger["total"], "updated_at": now}})
+                for ledger in batch
+            ],
+            ordered=False
+        )
+
+    # Donors whose completed donations are all gone
+    donor_ids = [ledger["_id"] for ledger in ledgers]
+    await db[LEDGER_COLLECTION].delete_many({"_id": {"$nin": donor_ids}})
+    await db.users.update_many(
+        {"id": {"$nin": donor_ids}, "donation_total": {"$ne": 0}},
+        {"$set": {"donation_total": 0.0, "updated_at": now}}
+    )
+    logging.info(f"Reconciled {len(ledgers)} donor ledgers")
+    return len(ledgers)
+
+async def main(command: str) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client()
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        await reconcile_ledgers(db)
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["reconcile"])
+    sys.exit(asyncio.run(main(parser.parse_args().command)))
@@ -0,0 +1,64 @@
+"""
+Cached event reads
+
+The homepage event list and event detail pages are read on every visit but
+change rarely. Their serialized responses live in the shared cache under the
+``events`` name; every write to the events collection calls ``invalidate()``,
+which bumps that name's version so all workers stop serving the old entries.
+
+Missing events are not cached: the loader raises EventNotFound, which skips
+the store, so requests for made-up ids cannot fill the cache with junk keys.
+"""
+import os
+from typing import List, Optional, Tuple
+
+from cache import SharedCache, shared_cache
+from http_cache import etag_for
+from serialization import construct_trusted, projection_for, trusted_json
+
+EVENTS_CACHE_TTL_SECONDS = float(os.environ.get("EVENTS_CACHE_TTL_SECONDS", "300"))
+
+# Browsers must revalidate, which costs a 304 once the ETag matches
+EVENTS_CACHE_CONTROL = "no-cache"
+
+UPCOMING_EVENTS_LIMIT = 50
+
+# (body, etag)
+CachedBody = Tuple[bytes, str]
+
+class EventNotFound(LookupError):
+    pass
+
+class EventsCache:
+    def __init__(self, cache: SharedCache, ttl: float = EVENTS_CACHE_TTL_SECONDS):
+        self.cache = cache
+        self.ttl = ttl
+
+    async def invalidate(self) -> None:
+        """Call after any create, update or delete of an event"""
+        await self.cache.bump("events")
+
+    async def event_list(self, db, model) -> CachedBody:
+        """Upcoming events sorted by date"""
+        async def load() -> bytes:
+            events = await db.events.find({}, projection_for(model)).sort("date", 1).to_list(UPCOMING_EVENTS_LIMIT)
+            return trusted_json(List[model], construct_trusted(model, events))
+
+        body = await self.cache.get_or_load("events", "list", load, self.ttl)
+        return body, etag_for(body)
+
+    async def event(self, db, model, event_id: str) -> Optional[CachedBody]:
+        """A single event, or None when it does not exist"""
+        async def load() -> bytes:
+            event = await db.events.find_one({"id": event_id}, projection_for(model))
+            if event is None:
+                raise EventNotFound(event_id)
+            return trusted_json(model, model(**event))
+
+        try:
+            body = await self.cache.get_or_load("events", f"event:{event_id}", load, self.ttl)
+        except EventNotFound:
+            return None
+        return body, etag_for(body)
+
+events_cache = EventsCache(shared_cache)
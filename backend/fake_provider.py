@@ -0,0 +1,273 @@
+"""
+Local fake payment provider
+
+A small FastAPI app that serves the Stripe checkout API subset used by
+HttpPaymentProvider, so the whole checkout flow runs and can be load-tested
+offline:
+
+    POST /v1/checkout/sessions             create a session (honours Idempotency-Key)
+    GET  /v1/checkout/sessions/{id}        session status
+    GET  /checkout/{id}                    "hosted page": pays and redirects to success_url
+    POST /v1/payment_intents               off-session charge of a saved customer
+                                           (honours Idempotency-Key)
+    POST /test/sessions/{id}/pay           mark paid and deliver checkout.session.completed
+    POST /test/sessions/{id}/expire        mark expired and deliver checkout.session.expired
+
+Webhooks are signed with the same ``Stripe-Signature`` scheme the API
+verifies and POSTed to --webhook-url. Failed deliveries are retried with
+backoff, as Stripe retries them. --latency-ms adds a delay to every API call
+to model a remote provider, and --decline-rate declines that fraction of
+charges. Paying a session created with setup_future_usage=off_session saves
+the card on a new customer; charges for any other customer are rejected.
+
+Point the API at it with PAYMENT_PROVIDER=http and
+PAYMENT_PROVIDER_URL=http://localhost:12111.
+
+Usage:
+    python fake_provider.py [--port 12111] [--webhook-url URL] [--webhook-secret SECRET]
+                            [--latency-ms 0] [--decline-rate 0]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+from payment_provider import SESSION_ID_PLACEHOLDER
+from webhook_queue import sign_payload
+
+WEBHOOK_DELIVERY_ATTEMPTS = 5
+
+class FakeProvider:
+    def __init__(
+        self,
+        webhook_url: Optional[str] = None,
+        webhook_secret: Optional[str] = None,
+        latency: float = 0.0,
+        public_url: str = "http://localhost:12111",
+        retry_base: float = 0.5,
+        decline_rate: float = 0.0,
+    ):
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.latency = latency
+        self.public_url = public_url
+        self.retry_base = retry_base
+        self.decline_rate = decline_rate
+        self.customers: Dict[str, Dict[str, Any]] = {}
+        self.intents: Dict[str, Dict[str, Any]] = {}
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        # (kind, Idempotency-Key) -> object id
+        self.idempotency: Dict[tuple, str] = {}
+        self.deliveries = {"sent": 0, "failed": 0}
+        self._delivery_tasks: set = set()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def create_session(self, form: Dict[str, str], idempotency_key: Optional[str]) -> Dict[str, Any]:
+        if idempotency_key and ("session", idempotency_key) in self.idempotency:
+            return self.sessions[self.idempotency["session", idempotency_key]]
+        try:
+            amount = int(form["line_items[0][price_data][unit_amount]"]) * int(form.get("line_items[0][quantity]", "1"))
+            currency = form["line_items[0][price_data][currency]"]
+            success_url = form["success_url"]
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=400, detail="Missing or invalid line item")
+        session_id = f"cs_test_{uuid.uuid4().hex}"
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"{self.public_url}/checkout/{session_id}",
+            "status": "open",
+            "payment_status": "unpaid",
+            "amount_total": amount,
+            "currency": currency,
+            "success_url": success_url.replace(SESSION_ID_PLACEHOLDER, session_id),
+            "cancel_url": form.get("cancel_url"),
+            "customer": None,
+            "setup_future_usage": form.get("payment_intent_data[setup_future_usage]"),
+            "metadata": {key[len("metadata["):-1]: value for key, value in form.items() if key.startswith("metadata[")},
+            "created": int(time.time()),
+        }
+        self.sessions[session_id] = session
+        if idempotency_key:
+            self.idempotency["session", idempotency_key] = session_id
+        return session
+
+    def create_payment_intent(self, form: Dict[str, str], idempotency_key: Optional[str]) -> Dict[str, Any]:
+        if idempotency_key and ("intent", idempotency_key) in self.idempotency:
+            return self.intents[self.idempotency["intent", idempotency_key]]
+        try:
+            amount = int(form["amount"])
+            currency = form["currency"]
+        except (KeyError, ValueError):
+            raise HTTPException(status_code=400, detail="Missing or invalid amount")
+        if form.get("customer") not in self.customers:
+            raise HTTPException(status_code=400, detail=f"No such customer: {form.get('customer')}")
+        intent_id = f"pi_test_{uuid.uuid4().hex}"
+        intent = {
+            "id": intent_id,
+            "object": "payment_intent",
+            "amount": amount,
+            "currency": currency,
+            "customer": form.get("customer"),
+            "status": "requires_payment_method" if random.random() < self.decline_rate else "succeeded",
+            "metadata": {key[len("metadata["):-1]: value for key, value in form.items() if key.startswith("metadata[")},
+            "created": int(time.time()),
+        }
+        self.intents[intent_id] = intent
+        if idempotency_key:
+            self.idempotency["intent", idempotency_key] = intent_id
+        return intent
+
+    def get_session(self, session_id: str) -> Dict[str, Any]:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="No such checkout session")
+        return session
+
+    def settle(self, session_id: str, paid: bool) -> Dict[str, Any]:
+        """Close an open session as paid or expired and send its webhook"""
+        session = self.get_session(session_id)
+        if session["status"] == "open":
+            if paid:
+                session.update(status="complete", payment_status="paid")
+                if session["setup_future_usage"] == "off_session":
+                    customer_id = f"cus_test_{uuid.uuid4().hex[:14]}"
+                    self.customers[customer_id] = {"id": customer_id, "payment_method": f"pm_test_{session_id[-14:]}"}
+                    session["customer"] = customer_id
+                self.deliver("checkout.session.completed", session)
+            else:
+                session.update(status="expired")
+                self.deliver("checkout.session.expired", session)
+        return session
+
+    def deliver(self, event_type: str, session: Dict[str, Any]) -> None:
+        if not self.webhook_url:
+            return
+        event = {
+            "id": f"evt_{uuid.uuid4().hex}",
+            "object": "event",
+            "type": event_type,
+            "created": int(time.time()),
+            "data": {"object": dict(session)},
+        }
+        task = asyncio.create_task(self._deliver(json.dumps(event).encode()))
+        self._delivery_tasks.add(task)
+        task.add_done_callback(self._delivery_tasks.discard)
+
+    async def _deliver(self, payload: bytes) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=10)
+        for attempt in range(WEBHOOK_DELIVERY_ATTEMPTS):
+            try:
+                response = await self._client.post(
+                    self.webhook_url,
+                    content=payload,
+                    headers={
+                        "Content-Type": "application/json",
+                        "Stripe-Signature": sign_payload(payload, self.webhook_secret or ""),
+                    },
+                )
+                if response.status_code < 300:
+                    self.deliveries["sent"] += 1
+                    return
+            except httpx.HTTPError as e:
+                logging.warning(f"Webhook delivery failed: {e}")
+            await asyncio.sleep(self.retry_base * 2 ** attempt)
+        self.deliveries["failed"] += 1
+
+    async def close(self) -> None:
+        for task in list(self._delivery_tasks):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+
+def create_app(provider: FakeProvider) -> FastAPI:
+    app = FastAPI(title="Fake payment provider")
+    app.state.provider = provider
+
+    async def simulate_latency():
+        if provider.latency:
+            await asyncio.sleep(provider.latency)
+
+    def require_key(request: Request) -> None:
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            raise HTTPException(status_code=401, detail="No API key provided")
+
+    @app.post("/v1/checkout/sessions")
+    async def create_checkout_session(request: Request):
+        require_key(request)
+        await simulate_latency()
+        form = dict(parse_qsl((await request.body()).decode()))
+        return provider.create_session(form, request.headers.get("idempotency-key"))
+
+    @app.get("/v1/checkout/sessions/{session_id}")
+    async def get_checkout_session(session_id: str, request: Request):
+        require_key(request)
+        await simulate_latency()
+        return provider.get_session(session_id)
+
+    @app.post("/v1/payment_intents")
+    async def create_payment_intent(request: Request):
+        require_key(request)
+        await simulate_latency()
+        form = dict(parse_qsl((await request.body()).decode()))
+        intent = provider.create_payment_intent(form, request.headers.get("idempotency-key"))
+        if intent["status"] != "succeeded":
+            return JSONResponse(
+                {"error": {"type": "card_error", "code": "card_declined", "decline_code": "generic_decline", "payment_intent": intent}},
+                status_code=402
+            )
+        return intent
+
+    @app.get("/checkout/{session_id}")
+    async def hosted_checkout(session_id: str):
+        return RedirectResponse(provider.settle(session_id, paid=True)["success_url"], status_code=303)
+
+    @app.post("/test/sessions/{session_id}/pay")
+    async def pay_session(session_id: str):
+        return provider.settle(session_id, paid=True)
+
+    @app.post("/test/sessions/{session_id}/expire")
+    async def expire_session(session_id: str):
+        return provider.settle(session_id, paid=False)
+
+    @app.get("/test/stats")
+    async def stats():
+        return {"sessions": len(provider.sessions), "customers": len(provider.customers), "payment_intents": len(provider.intents), "webhooks": provider.deliveries}
+
+    @app.on_event("shutdown")
+    async def close_provider():
+        await provider.close()
+
+    return app
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12111)
+    parser.add_argument("--webhook-url", default="http://localhost:8001/api/webhook/stripe")
+    parser.add_argument("--webhook-secret", default=os.environ.get("STRIPE_WEBHOOK_SECRET"))
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--decline-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeProvider(
+        webhook_url=args.webhook_url,
+        webhook_secret=args.webhook_secret,
+        latency=args.latency_ms / 1000,
+        decline_rate=args.decline_rate,
+        public_url=f"http://{args.host}:{args.port}",
+    )
+    uvicorn.run(create_app(fake), host=args.host, port=args.port)
@@ -0,0 +1,60 @@
+"""
+HTTP caching helpers
+
+Responses whose content only changes when the code (or a known version)
+changes are serialized once and served as precomputed bytes with a strong
+ETag. Clients that send the ETag back in ``If-None-Match`` get an empty 304.
+"""
+import hashlib
+import os
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from serialization import dumps
+
+STATIC_CACHE_MAX_AGE = int(os.environ.get("STATIC_CACHE_MAX_AGE", "300"))
+
+def etag_for(body: bytes) -> str:
+    """Strong ETag derived from the response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match covers ``etag`` (weak comparison, RFC 9110)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def cached_response(
+    request: Request,
+    body: bytes,
+    etag: str,
+    cache_control: str,
+    media_type: str = "application/json"
+) -> Response:
+    """200 with ``body``, or 304 when the client already holds ``etag``"""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+class StaticPayload:
+    """A JSON response body serialized once, with its ETag"""
+
+    def __init__(self, content: Any, max_age: Optional[int] = None):
+        self.body = dumps(content)
+        self.etag = etag_for(self.body)
+        max_age = STATIC_CACHE_MAX_AGE if max_age is None else max_age
+        self.cache_control = f"public, max-age={max_age}"
+
+    def response(self, request: Request) -> Response:
+        return cached_response(request, self.body, self.etag, self.cache_control)
@@ -0,0 +1,192 @@
+"""
+Declarative MongoDB index registry
+
+Every index the API relies on is declared once in INDEX_SPECS. The server
+applies them idempotently at startup, and the check command runs explain()
+on each handler's query shape and fails if any still scans its collection.
+
+Usage:
+    python indexes.py apply
+    python indexes.py check
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from storage import create_client
+from webhook_queue import WEBHOOK_RETENTION_SECONDS
+
+@dataclass(frozen=True)
+class IndexSpec:
+    collection: str
+    keys: Tuple[Tuple[str, int], ...]
+    unique: bool = False
+    # TTL index: documents expire this long after the (date) key
+    expire_after_seconds: Optional[int] = None
+
+    @property
+    def name(self) -> str:
+        return "_".join(f"{field}_{direction}" for field, direction in self.keys)
+
+    def to_model(self) -> IndexModel:
+        options: Dict[str, Any] = {}
+        if self.expire_after_seconds is not None:
+            options["expireAfterSeconds"] = self.expire_after_seconds
+        return IndexModel(list(self.keys), name=self.name, unique=self.unique, **options)
+
+@dataclass(frozen=True)
+class QueryShape:
+    handler: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[Tuple[Tuple[str, int], ...]] = None
+
+# Unique wherever the code assumes a single document per value
+INDEX_SPECS: List[IndexSpec] = [
+    IndexSpec("users", (("id", ASCENDING),), unique=True),
+    IndexSpec("users", (("email", ASCENDING),), unique=True),
+    IndexSpec("users", (("username", ASCENDING),), unique=True),
+    IndexSpec("members", (("email", ASCENDING),), unique=True),
+    IndexSpec("members", (("id", ASCENDING),), unique=True),
+    IndexSpec("members", (("active", ASCENDING), ("registration_date", ASCENDING), ("id", ASCENDING))),
+    IndexSpec("newsletter_subscribers", (("email", ASCENDING),), unique=True),
+    IndexSpec("newsletter_subscribers", (("active", ASCENDING), ("subscribed_at", ASCENDING), ("id", ASCENDING))),
+    IndexSpec("events", (("id", ASCENDING),), unique=True),
+    IndexSpec("events", (("date", ASCENDING),)),
+    IndexSpec("contact_messages", (("created_at", DESCENDING), ("id", DESCENDING))),
+    IndexSpec("course_reservations", (("created_at", DESCENDING), ("id", DESCENDING))),
+    IndexSpec("status_checks", (("timestamp", ASCENDING), ("id", ASCENDING))),
+    IndexSpec("donations", (("id", ASCENDING),), unique=True),
+    IndexSpec("donations", (("user_id", ASCENDING), ("created_at", DESCENDING))),
+    IndexSpec("donations", (("status", ASCENDING), ("completed_at", ASCENDING))),
+    IndexSpec("payment_transactions", (("session_id", ASCENDING),), unique=True),
+    IndexSpec("payment_transactions", (("status", ASCENDING), ("created_at", ASCENDING))),
+    IndexSpec("recurring_pledges", (("id", ASCENDING),), unique=True),
+    IndexSpec("recurring_pledges", (("status", ASCENDING), ("next_due", ASCENDING))),
+    IndexSpec("recurring_pledges", (("user_id", ASCENDING), ("created_at", DESCENDING))),
+    IndexSpec("webhook_events", (("status", ASCENDING), ("available_at", ASCENDING))),
+    # Only processed events have processed_at; dead ones are kept for inspection
+    IndexSpec("webhook_events", (("processed_at", ASCENDING),), expire_after_seconds=WEBHOOK_RETENTION_SECONDS),
+]
+
+# Query shapes issued by the handlers; values are placeholders for explain()
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("get_current_user", "users", {"id": "x"}),
+    QueryShape("login_user / register_user", "users", {"email": "x"}),
+    QueryShape("register_user", "users", {"username": "x"}),
+    QueryShape("register_member", "members", {"email": "x"}),
+    QueryShape("reconcile_active_members", "members", {"active": True}),
+    QueryShape("deactivate_member", "members", {"id": "x", "active": True}),
+    QueryShape("get_members", "members", {"active": True}, sort=(("registration_date", ASCENDING), ("id", ASCENDING))),
+    QueryShape("subscribe_newsletter", "newsletter_subscribers", {"email": "x"}),
+    QueryShape(
+        "get_newsletter_subscribers", "newsletter_subscribers", {"active": True},
+        sort=(("subscribed_at", ASCENDING), ("id", ASCENDING)),
+    ),
+    QueryShape("get_events", "events", {}, sort=(("date", ASCENDING),)),
+    QueryShape("get_event", "events", {"id": "x"}),
+    QueryShape("get_contact_messages", "contact_messages", {}, sort=(("created_at", DESCENDING), ("id", DESCENDING))),
+    QueryShape(
+        "get_course_reservations", "course_reservations", {},
+        sort=(("created_at", DESCENDING), ("id", DESCENDING)),
+    ),
+    QueryShape("get_status_checks", "status_checks", {}, sort=(("timestamp", ASCENDING), ("id", ASCENDING))),
+    QueryShape("check_payment_status", "donations", {"id": "x"}),
+    QueryShape("get_user_donations", "donations", {"user_id": "x"}, sort=(("created_at", DESCENDING),)),
+    QueryShape("rebuild_rollups", "donations", {"status": "completed"}),
+    QueryShape("get_donation_stats", "donation_rollups", {"_id": {"$in": ["all", "month:x"]}}),
+    QueryShape("get_donation_stats", "donation_rollups", {"_id": {"$gte": "day:x", "$lte": "day:y"}}),
+    QueryShape("check_payment_status", "payment_transactions", {"session_id": "x"}),
+    QueryShape(
+        "sweep_stale_checkouts", "payment_transactions", {"status": "pending", "created_at": {"$lt": "x"}},
+        sort=(("created_at", ASCENDING),),
+    ),
+    QueryShape(
+        "claim_due", "recurring_pledges", {"status": "active", "next_due": {"$lte": "x"}, "lease_until": {"$lte": "x"}},
+        sort=(("next_due", ASCENDING),),
+    ),
+    QueryShape("get_user_pledges", "recurring_pledges", {"user_id": "x"}, sort=(("created_at", DESCENDING),)),
+    QueryShape(
+        "webhook worker claim", "webhook_events",
+        {"status": {"$in": ["pending", "processing"]}, "available_at": {"$lte": "x"}, "attempts": {"$lt": "x"}},
+        sort=(("available_at", ASCENDING),),
+    ),
+    QueryShape(
+        "webhook exhausted leases", "webhook_events",
+        {"status": "processing", "available_at": {"$lte": "x"}, "attempts": {"$gte": "x"}},
+    ),
+]
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> bool:
+    """Create every registered index; returns False if any collection failed"""
+    by_collection: Dict[str, List[IndexModel]] = {}
+    for spec in INDEX_SPECS:
+        by_collection.setdefault(spec.collection, []).append(spec.to_model())
+
+    ok = True
+    for collection, models in by_collection.items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            ok = False
+            logging.error(f"Error creating indexes on {collection}: {e}")
+    if ok:
+        logging.info(f"Ensured {len(INDEX_SPECS)} indexes on {len(by_collection)} collections")
+    return ok
+
+def _plan_stages(plan: Dict[str, Any]):
+    """Yield every stage name in an explain() plan tree"""
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+async def check_query_plans(db: AsyncIOMotorDatabase) -> List[str]:
+    """Explain each registered query shape; returns the handlers that COLLSCAN"""
+    scanning = []
+    for shape in QUERY_SHAPES:
+        cursor = db[shape.collection].find(shape.filter)
+        if shape.sort:
+            cursor = cursor.sort(list(shape.sort))
+        explain = await cursor.explain()
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        status = "COLLSCAN" if "COLLSCAN" in stages else "ok"
+        print(f"{status:<9} {shape.collection}.find({shape.filter}) [{shape.handler}] -> {' <- '.join(stages)}")
+        if status == "COLLSCAN":
+            scanning.append(shape.handler)
+    return scanning
+
+async def main(command: str) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    client = create_client()
+    db = client[os.environ.get('DB_NAME', 'test_database')]
+    try:
+        if command == "apply":
+            return 0 if await ensure_indexes(db) else 1
+        scanning = await check_query_plans(db)
+        if scanning:
+            print(f"❌ {len(scanning)} query shape(s) still scan their collection")
+            return 1
+        print(f"✅ All {len(QUERY_SHAPES)} query shapes use an index")
+        return 0
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["apply", "check"])
+    sys.exit(asyncio.run(main(parser.parse_args().command)))
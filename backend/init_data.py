@@ -5,7 +5,7 @@ import asyncio
 import os
 from dotenv import load_dotenv
 from pathlib import Path
-from motor.motor_asyncio import AsyncIOMotorClient
+from storage import create_client
 from datetime import datetime, timedelta
 import uuid
 
@@ -13,10 +13,13 @@ import uuid
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Imported after load_dotenv: the cache backend is chosen from CACHE_BACKEND
+from events_cache import events_cache  # noqa: E402
+
 # MongoDB connection
 mongo_url = os.environ.get('MONGO_URL')
 db_name = os.environ.get('DB_NAME', 'test_database')
-client = AsyncIOMotorClient(mongo_url)
+client = create_client(mongo_url=mongo_url)
 db = client[db_name]
 
 async def init_events():
@@ -71,6 +74,9 @@ async def init_events():
     # Clear existing events and insert new ones
     await db.events.delete_many({})
     await db.events.insert_many(events)
+    # Running servers stop serving the old list (with CACHE_BACKEND=redis;
+    # a local cache expires on its own after EVENTS_CACHE_TTL_SECONDS)
+    await events_cache.invalidate()
     print(f"✅ {len(events)} événements initialisés")
 
 async def init_testimonials():
@@ -0,0 +1,142 @@
+"""
+Active member counter
+
+``/members/count`` used to run ``count_documents({"active": True})`` on every
+homepage view. The count now lives in a single document in the ``counters``
+collection: registrations and deactivations adjust it atomically with
+``$inc``, and a periodic reconciliation resets it to the real count to
+repair any drift. Reads go through the shared cache, which every change
+invalidates.
+
+On replica sets the member write and its ``$inc`` commit in one
+transaction. Elsewhere they are two writes, and the counter can drift until
+the next reconciliation: one too low when the ``$inc`` fails or the process
+dies between the writes, one too high when a reconciliation counts the new
+member before its ``$inc`` lands. Edits made directly in the database drift
+it as well.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict
+
+from pymongo.errors import DuplicateKeyError
+
+from cache import shared_cache
+from storage import supports_transactions
+
+COUNTERS_COLLECTION = "counters"
+ACTIVE_MEMBERS = "active_members"
+
+MEMBER_COUNT_RECONCILE_SECONDS = float(os.environ.get("MEMBER_COUNT_RECONCILE_SECONDS", "3600"))
+MEMBER_COUNT_CACHE_TTL_SECONDS = float(os.environ.get("MEMBER_COUNT_CACHE_TTL_SECONDS", "60"))
+MEMBER_COUNT_RECONCILE_ATTEMPTS = 5
+
+async def adjust_active_members(db, delta: int, session=None) -> None:
+    await db[COUNTERS_COLLECTION].update_one(
+        {"_id": ACTIVE_MEMBERS},
+        {"$inc": {"value": delta}},
+        upsert=True,
+        session=session
+    )
+    if session is None:
+        await shared_cache.bump(ACTIVE_MEMBERS)
+
+async def _write_and_count(db, write: Callable[[Any], Awaitable[bool]], delta: int) -> bool:
+    """Run a member write and, if it returns True, adjust the counter by ``delta``.
+
+    Errors of the write itself propagate. Without transactions a failed
+    ``$inc`` is only logged: the member change stands and the next
+    reconciliation repairs the counter.
+    """
+    if await supports_transactions(db):
+        async def write_and_count(session):
+            changed = await write(session)
+            if changed:
+                await adjust_active_members(db, delta, session=session)
+            return changed
+
+        async with await db.client.start_session() as session:
+            changed = await session.with_transaction(write_and_count)
+        if changed:
+            await shared_cache.bump(ACTIVE_MEMBERS)
+        return changed
+    changed = await write(None)
+    if changed:
+        try:
+            await adjust_active_members(db, delta)
+        except Exception as e:
+            logging.error(f"Error adjusting active member counter by {delta}; left to reconciliation: {e}")
+    return changed
+
+async def add_member(db, member: Dict[str, Any]) -> None:
+    """Insert a member, counting it when active; DuplicateKeyError on a known email"""
+    async def insert(session) -> bool:
+        await db.members.insert_one(member, session=session)
+        return bool(member.get("active"))
+
+    await _write_and_count(db, insert, 1)
+
+async def reconcile_active_members(db, attempts: int = MEMBER_COUNT_RECONCILE_ATTEMPTS) -> int:
+    """Reset the counter to the actual number of active members.
+
+    The reset is a compare-and-set against the value read before counting,
+    so an ``$inc`` landing while the members are counted is never
+    overwritten; the count is simply taken again.
+    """
+    counters = db[COUNTERS_COLLECTION]
+    for _ in range(attempts):
+        counter = await counters.find_one({"_id": ACTIVE_MEMBERS})
+        actual = await db.members.count_documents({"active": True})
+        if counter is None:
+            try:
+                await counters.insert_one({"_id": ACTIVE_MEMBERS, "value": actual})
+            except DuplicateKeyError:
+                continue
+            return actual
+        previous = counter.get("value")
+        if previous == actual:
+            return actual
+        result = await counters.update_one(
+            {"_id": ACTIVE_MEMBERS, "value": previous},
+            {"$set": {"value": actual}}
+        )
+        if result.modified_count:
+            logging.warning(f"Active member counter drifted: {previous} -> {actual}")
+            await shared_cache.bump(ACTIVE_MEMBERS)
+            return actual
+    logging.warning(f"Active member counter kept changing; not reconciled after {attempts} attempts")
+    return actual
+
+async def get_active_members(db) -> int:
+    """O(1) read of the counter, seeding it on first use"""
+    async def load() -> bytes:
+        counter = await db[COUNTERS_COLLECTION].find_one({"_id": ACTIVE_MEMBERS})
+        if counter is None:
+            value = await reconcile_active_members(db)
+        else:
+            value = max(0, counter["value"])
+        return str(value).encode()
+
+    return int(await shared_cache.get_or_load(ACTIVE_MEMBERS, "value", load, MEMBER_COUNT_CACHE_TTL_SECONDS))
+
+async def deactivate_member(db, member_id: str) -> bool:
+    """Mark a member inactive; False when no active member has this id"""
+    async def deactivate(session) -> bool:
+        result = await db.members.update_one(
+            {"id": member_id, "active": True},
+            {"$set": {"active": False}},
+            session=session
+        )
+        return bool(result.modified_count)
+
+    return await _write_and_count(db, deactivate, -1)
+
+async def reconcile_periodically(db, interval: float = MEMBER_COUNT_RECONCILE_SECONDS) -> None:
+    """Background task: reconcile now, then every ``interval`` seconds"""
+    while True:
+        try:
+            await reconcile_active_members(db)
+        except Exception as e:
+            logging.error(f"Error reconciling active member counter: {e}")
+        await asyncio.sleep(interval)
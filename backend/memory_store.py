@@ -0,0 +1,959 @@
+"""
+In-process async storage engine with a Motor-compatible surface
+
+Implements the subset of AsyncIOMotorClient / Database / Collection / Cursor
+that the API uses (find, sort, limit, insert, update, delete, count,
+aggregate, bulk writes and indexes) on plain dicts, so the HTTP and
+serialization stack can be load-tested and the test suite run without a
+mongod. Every operation completes without yielding to the event loop, which
+makes each single-document write atomic just like it is in MongoDB.
+
+Select it with STORAGE_BACKEND=memory (see storage.py).
+"""
+import heapq
+import re
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DeleteMany, DeleteOne, IndexModel, InsertOne, ReplaceOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+
+_MISSING = object()
+
+# ---------------------------------------------------------------------------
+# Values, paths and ordering
+# ---------------------------------------------------------------------------
+
+def _copy(value: Any) -> Any:
+    """Deep copy a value the way a BSON round trip through MongoDB returns it"""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_copy(v) for v in value]
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, datetime):
+        # BSON dates have millisecond precision and come back naive
+        return value.replace(microsecond=value.microsecond // 1000 * 1000, tzinfo=None)
+    return value
+
+def _get_path(doc: Any, path: str) -> Any:
+    """Resolve a dotted path; returns _MISSING when any segment is absent"""
+    if "." not in path:
+        return doc.get(path, _MISSING) if isinstance(doc, dict) else _MISSING
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+def _set_path(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+def _unset_path(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+def _type_rank(value: Any) -> int:
+    # Follows BSON comparison order for the types the API stores
+    if value is None or value is _MISSING:
+        return 1
+    if isinstance(value, bool):
+        return 8
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, str):
+        return 3
+    if isinstance(value, dict):
+        return 4
+    if isinstance(value, list):
+        return 5
+    if isinstance(value, ObjectId):
+        return 7
+    if isinstance(value, datetime):
+        return 9
+    return 10
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    if type(value) is str:
+        return (3, value)
+    rank = _type_rank(value)
+    if rank == 1:
+        return (rank, 0)
+    if rank in (4, 5):
+        return (rank, repr(value))
+    return (rank, value)
+
+def _compare(a: Any, b: Any) -> Optional[int]:
+    """Three-way compare within one BSON type class; None if not comparable"""
+    if _type_rank(a) != _type_rank(b):
+        return None
+    ka, kb = _sort_key(a), _sort_key(b)
+    return (ka > kb) - (ka < kb)
+
+# ---------------------------------------------------------------------------
+# Query matching
+# ---------------------------------------------------------------------------
+
+def _candidates(value: Any) -> List[Any]:
+    # A query on an array field matches the array itself or any element
+    if isinstance(value, list):
+        return [value] + value
+    return [value]
+
+def _match_operator(value: Any, op: str, arg: Any) -> bool:
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if op == "$eq":
+        return _match_equal(value, arg)
+    if op == "$ne":
+        return not _match_equal(value, arg)
+    if op == "$in":
+        return any(_match_equal(value, item) for item in arg)
+    if op == "$nin":
+        return not any(_match_equal(value, item) for item in arg)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for candidate in _candidates(value):
+            if candidate is _MISSING:
+                continue
+            result = _compare(candidate, arg)
+            if result is None:
+                continue
+            if (op == "$gt" and result > 0) or (op == "$gte" and result >= 0) \
+                    or (op == "$lt" and result < 0) or (op == "$lte" and result <= 0):
+                return True
+        return False
+    if op == "$regex":
+        pattern = re.compile(arg) if isinstance(arg, str) else arg
+        return any(isinstance(c, str) and pattern.search(c) for c in _candidates(value))
+    if op == "$not":
+        return not _match_condition(value, arg)
+    raise OperationFailure(f"Unsupported query operator in memory store: {op}")
+
+def _match_equal(value: Any, expected: Any) -> bool:
+    if expected is None:
+        return value is _MISSING or value is None or (isinstance(value, list) and None in value)
+    if not isinstance(value, list):
+        return value is not _MISSING and value == expected and _type_rank(value) == _type_rank(expected)
+    return any(c is not _MISSING and c == expected and _type_rank(c) == _type_rank(expected)
+               for c in _candidates(value))
+
+def _match_condition(value: Any, condition: Any) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        return all(_match_operator(value, op, arg) for op, arg in condition.items() if op != "$options")
+    return _match_equal(value, condition)
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    """True if ``doc`` satisfies the MongoDB ``query`` (already passed through _copy)"""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+# ---------------------------------------------------------------------------
+# Updates
+# ---------------------------------------------------------------------------
+
+def _apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> None:
+    if not any(key.startswith("$") for key in update):
+        # Replacement document
+        _id = doc.get("_id")
+        doc.clear()
+        doc.update(_copy(update))
+        if _id is not None:
+            doc.setdefault("_id", _id)
+        return
+
+    for op, fields in update.items():
+        if op == "$setOnInsert" and not inserting:
+            continue
+        for path, arg in fields.items():
+            current = _get_path(doc, path)
+            if op in ("$set", "$setOnInsert"):
+                _set_path(doc, path, _copy(arg))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op == "$min":
+                if current is _MISSING or _sort_key(arg) < _sort_key(current):
+                    _set_path(doc, path, _copy(arg))
+            elif op == "$max":
+                if current is _MISSING or _sort_key(arg) > _sort_key(current):
+                    _set_path(doc, path, _copy(arg))
+            elif op == "$push":
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                _set_path(doc, path, (current if isinstance(current, list) else []) + _copy(items))
+            elif op == "$addToSet":
+                items = arg["$each"] if isinstance(arg, dict) and "$each" in arg else [arg]
+                existing = current if isinstance(current, list) else []
+                _set_path(doc, path, existing + [_copy(i) for i in items if i not in existing])
+            elif op == "$pull":
+                if isinstance(current, list):
+                    _set_path(doc, path, [i for i in current if not _match_condition(i, arg)])
+            else:
+                raise OperationFailure(f"Unsupported update operator in memory store: {op}")
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """Equality fields of a query, which an upsert copies into the new document"""
+    seed: Dict[str, Any] = {}
+    for key, condition in query.items():
+        if key == "$and":
+            for sub in condition:
+                seed.update(_upsert_seed(sub))
+        elif not key.startswith("$"):
+            if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+                if "$eq" in condition:
+                    _set_path(seed, key, _copy(condition["$eq"]))
+            else:
+                _set_path(seed, key, _copy(condition))
+    return seed
+
+def _project(doc: Dict[str, Any], projection: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not projection:
+        return _copy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        projected: Dict[str, Any] = {}
+        for path in include:
+            value = _get_path(doc, path)
+            if value is not _MISSING:
+                _set_path(projected, path, _copy(value))
+        if projection.get("_id", 1) and "_id" in doc:
+            projected["_id"] = doc["_id"]
+        return projected
+    projected = _copy(doc)
+    for path, flag in projection.items():
+        if not flag:
+            _unset_path(projected, path)
+    return projected
+
+class _Reversed:
+    """Inverts ordering of a sort key so mixed directions fit in one key tuple"""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+def _sort_docs(docs: List[Dict[str, Any]], sort: List[Tuple[str, int]], limit: int = 0) -> List[Dict[str, Any]]:
+    """Order documents by ``sort``; with a limit only the top ``limit`` are kept"""
+    if all(direction < 0 for _, direction in sort):
+        key = lambda d: tuple(_sort_key(_get_path(d, field)) for field, _ in sort)  # noqa: E731
+        if limit and limit < len(docs):
+            return heapq.nlargest(limit, docs, key=key)
+        return sorted(docs, key=key, reverse=True)
+    key = lambda d: tuple(  # noqa: E731
+        _sort_key(_get_path(d, field)) if direction > 0 else _Reversed(_sort_key(_get_path(d, field)))
+        for field, direction in sort
+    )
+    if limit and limit < len(docs):
+        return heapq.nsmallest(limit, docs, key=key)
+    return sorted(docs, key=key)
+
+def _normalize_sort(key_or_list: Any, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else ASCENDING)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+def _evaluate(expr: Any, doc: Dict[str, Any]) -> Any:
+    """Evaluate the aggregation expression subset used by the API"""
+    if isinstance(expr, str) and expr.startswith("$"):
+        value = _get_path(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, dict):
+        if len(expr) == 1:
+            op, arg = next(iter(expr.items()))
+            if op.startswith("$"):
+                return _evaluate_operator(op, arg, doc)
+        return {k: _evaluate(v, doc) for k, v in expr.items()}
+    if isinstance(expr, list):
+        return [_evaluate(item, doc) for item in expr]
+    return expr
+
+def _evaluate_operator(op: str, arg: Any, doc: Dict[str, Any]) -> Any:
+    if op == "$literal":
+        return arg
+    if op in ("$year", "$month", "$dayOfMonth", "$hour"):
+        value = _evaluate(arg, doc)
+        if value is None:
+            return None
+        return {"$year": value.year, "$month": value.month, "$dayOfMonth": value.day, "$hour": value.hour}[op]
+    if op == "$dateToString":
+        value = _evaluate(arg["date"], doc)
+        return None if value is None else value.strftime(arg["format"])
+    if op == "$cond":
+        if isinstance(arg, dict):
+            condition, then, otherwise = arg["if"], arg["then"], arg["else"]
+        else:
+            condition, then, otherwise = arg
+        return _evaluate(then if _evaluate(condition, doc) else otherwise, doc)
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        left, right = (_evaluate(a, doc) for a in arg)
+        result = _compare(left, right)
+        if op == "$eq":
+            return left == right
+        if op == "$ne":
+            return left != right
+        if result is None:
+            return False
+        return {"$gt": result > 0, "$gte": result >= 0, "$lt": result < 0, "$lte": result <= 0}[op]
+    if op == "$add":
+        return sum(_evaluate(a, doc) or 0 for a in arg)
+    if op == "$multiply":
+        product = 1
+        for a in arg:
+            product *= _evaluate(a, doc) or 0
+        return product
+    if op == "$ifNull":
+        for a in arg:
+            value = _evaluate(a, doc)
+            if value is not None:
+                return value
+        return None
+    if op == "$toString":
+        value = _evaluate(arg, doc)
+        return None if value is None else str(value)
+    raise OperationFailure(f"Unsupported aggregation operator in memory store: {op}")
+
+def _group(docs: Iterable[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Any, Dict[str, Any]] = {}
+    keys: Dict[Any, Any] = {}
+    for doc in docs:
+        group_id = _evaluate(spec["_id"], doc)
+        hashable = repr(group_id)
+        state = groups.get(hashable)
+        if state is None:
+            state = groups[hashable] = {}
+            keys[hashable] = group_id
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = accumulator.items()
+            value = _evaluate(expr, doc)
+            if op == "$sum":
+                state[field] = state.get(field, 0) + (value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0)
+            elif op == "$avg":
+                total, count = state.get(field, (0, 0))
+                if isinstance(value, (int, float)):
+                    total, count = total + value, count + 1
+                state[field] = (total, count)
+            elif op == "$min":
+                if value is not None and (field not in state or _sort_key(value) < _sort_key(state[field])):
+                    state[field] = value
+            elif op == "$max":
+                if value is not None and (field not in state or _sort_key(value) > _sort_key(state[field])):
+                    state[field] = value
+            elif op == "$first":
+                state.setdefault(field, value)
+            elif op == "$last":
+                state[field] = value
+            elif op == "$push":
+                state.setdefault(field, []).append(value)
+            elif op == "$addToSet":
+                bucket = state.setdefault(field, [])
+                if value not in bucket:
+                    bucket.append(value)
+            else:
+                raise OperationFailure(f"Unsupported accumulator in memory store: {op}")
+
+    results = []
+    for hashable, state in groups.items():
+        row = {"_id": keys[hashable]}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            op = next(iter(accumulator))
+            value = state.get(field)
+            if op == "$avg":
+                total, count = value or (0, 0)
+                value = total / count if count else None
+            row[field] = value
+        results.append(row)
+    return results
+
+def run_pipeline(docs: List[Dict[str, Any]], pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Run an aggregation pipeline over already-copied documents"""
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            spec = _copy(spec)
+            docs = [d for d in docs if matches(d, spec)]
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$sort":
+            docs = _sort_docs(docs, _normalize_sort(spec))
+        elif name == "$limit":
+            docs = docs[:spec]
+        elif name == "$skip":
+            docs = docs[spec:]
+        elif name == "$project":
+            if all(v in (0, 1, True, False) for v in spec.values()):
+                docs = [_project(d, spec) for d in docs]
+            else:
+                projected = []
+                for d in docs:
+                    row = {"_id": d.get("_id")} if spec.get("_id", 1) else {}
+                    for field, expr in spec.items():
+                        if field == "_id" and expr in (0, False):
+                            continue
+                        row[field] = _get_path(d, field) if expr in (1, True) else _evaluate(expr, d)
+                    projected.append(row)
+                docs = projected
+        elif name == "$count":
+            docs = [{spec: len(docs)}] if docs else []
+        else:
+            raise OperationFailure(f"Unsupported aggregation stage in memory store: {name}")
+    return docs
+
+# ---------------------------------------------------------------------------
+# Results
+# ---------------------------------------------------------------------------
+
+class InsertOneResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+        self.acknowledged = True
+
+class InsertManyResult:
+    def __init__(self, inserted_ids):
+        self.inserted_ids = inserted_ids
+        self.acknowledged = True
+
+class UpdateResult:
+    def __init__(self, matched_count, modified_count, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.upserted_id = upserted_id
+        self.acknowledged = True
+
+class DeleteResult:
+    def __init__(self, deleted_count):
+        self.deleted_count = deleted_count
+        self.acknowledged = True
+
+class BulkWriteResult:
+    def __init__(self):
+        self.inserted_count = 0
+        self.matched_count = 0
+        self.modified_count = 0
+        self.deleted_count = 0
+        self.upserted_count = 0
+        self.upserted_ids: Dict[int, Any] = {}
+        self.acknowledged = True
+
+    @property
+    def bulk_api_result(self) -> Dict[str, Any]:
+        return {
+            "nInserted": self.inserted_count,
+            "nMatched": self.matched_count,
+            "nModified": self.modified_count,
+            "nRemoved": self.deleted_count,
+            "nUpserted": self.upserted_count,
+            "upserted": [{"index": i, "_id": _id} for i, _id in self.upserted_ids.items()],
+        }
+
+# ---------------------------------------------------------------------------
+# Cursors
+# ---------------------------------------------------------------------------
+
+class MemoryCursor:
+    """Lazy cursor mirroring AsyncIOMotorCursor's chaining API"""
+
+    def __init__(self, collection: "MemoryCollection", query=None, projection=None):
+        self._collection = collection
+        self._query = query or {}
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict[str, Any]]] = None
+        self._position = 0
+
+    def sort(self, key_or_list, direction=None) -> "MemoryCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int) -> "MemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "MemoryCursor":
+        self._limit = count
+        return self
+
+    def batch_size(self, size: int) -> "MemoryCursor":
+        return self
+
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            docs = self._collection._select(self._query)
+            if self._sort:
+                docs = _sort_docs(docs, self._sort, self._skip + self._limit if self._limit else 0)
+            docs = docs[self._skip:]
+            if self._limit:
+                docs = docs[:self._limit]
+            self._results = [_project(d, self._projection) for d in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        results = self._evaluate()[self._position:]
+        if length is not None:
+            results = results[:length]
+        self._position += len(results)
+        return results
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        results = self._evaluate()
+        if self._position >= len(results):
+            raise StopAsyncIteration
+        self._position += 1
+        return results[self._position - 1]
+
+    async def explain(self) -> Dict[str, Any]:
+        index = self._collection._usable_index(self._query, self._sort)
+        if index is None:
+            plan = {"stage": "COLLSCAN"}
+        else:
+            plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": index}}
+        return {"queryPlanner": {"winningPlan": plan}}
+
+class MemoryCommandCursor(MemoryCursor):
+    """Cursor over precomputed aggregation results"""
+
+    def __init__(self, results: List[Dict[str, Any]]):
+        self._results = results
+        self._position = 0
+
+# ---------------------------------------------------------------------------
+# Collections, databases and the client
+# ---------------------------------------------------------------------------
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[Any, Dict[str, Any]] = {}
+        # name -> (keys, unique); unique single-field indexes also keep a lookup map
+        self._indexes: Dict[str, Tuple[List[Tuple[str, int]], bool]] = {"_id_": ([("_id", 1)], True)}
+        self._unique_maps: Dict[str, Dict[Any, Any]] = {}
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.database.name}.{self.name}"
+
+    # -- indexes ------------------------------------------------------------
+
+    async def create_indexes(self, indexes: List[IndexModel], **kwargs) -> List[str]:
+        names = []
+        for model in indexes:
+            document = model.document
+            keys = list(document["key"].items())
+            name = document["name"]
+            unique = bool(document.get("unique", False))
+            existing = self._indexes.get(name)
+            if existing is not None and existing != (keys, unique):
+                raise OperationFailure(f"Index with name: {name} already exists with different options", code=86)
+            if unique and name not in self._unique_maps:
+                lookup: Dict[Any, Any] = {}
+                for _id, doc in self._docs.items():
+                    key = self._index_key(doc, keys)
+                    if key in lookup:
+                        raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.full_name} index: {name}", 11000)
+                    lookup[key] = _id
+                self._unique_maps[name] = lookup
+            self._indexes[name] = (keys, unique)
+            names.append(name)
+        return names
+
+    async def create_index(self, keys, **kwargs) -> str:
+        model = IndexModel(keys, **kwargs)
+        return (await self.create_indexes([model]))[0]
+
+    async def index_information(self) -> Dict[str, Any]:
+        return {
+            name: {"key": keys, **({"unique": True} if unique and name != "_id_" else {})}
+            for name, (keys, unique) in self._indexes.items()
+        }
+
+    async def drop_indexes(self) -> None:
+        self._indexes = {"_id_": ([("_id", 1)], True)}
+        self._unique_maps = {}
+
+    @staticmethod
+    def _key_part(value: Any) -> Any:
+        if value is _MISSING or value is None:
+            return None
+        value = _copy(value)
+        if isinstance(value, (dict, list)):
+            return repr(value)
+        return (_type_rank(value), value)
+
+    @classmethod
+    def _index_key(cls, doc: Dict[str, Any], keys: List[Tuple[str, int]]) -> Tuple:
+        return tuple(cls._key_part(_get_path(doc, field)) for field, _ in keys)
+
+    def _check_unique(self, doc: Dict[str, Any], ignore_id: Any = _MISSING) -> None:
+        if doc["_id"] in self._docs and ignore_id is _MISSING:
+            raise DuplicateKeyError(
+                f"E11000 duplicate key error collection: {self.full_name} index: _id_",
+                11000, {"keyPattern": {"_id": 1}, "keyValue": {"_id": doc["_id"]}},
+            )
+        for name, lookup in self._unique_maps.items():
+            keys = self._indexes[name][0]
+            owner = lookup.get(self._index_key(doc, keys), _MISSING)
+            if owner is not _MISSING and owner != ignore_id:
+                key_pattern = dict(keys)
+                key_value = {field: _get_path(doc, field) for field, _ in keys}
+                raise DuplicateKeyError(
+                    f"E11000 duplicate key error collection: {self.full_name} index: {name} dup key: {key_value}",
+                    11000, {"keyPattern": key_pattern, "keyValue": key_value},
+                )
+
+    def _index_add(self, doc: Dict[str, Any]) -> None:
+        for name, lookup in self._unique_maps.items():
+            lookup[self._index_key(doc, self._indexes[name][0])] = doc["_id"]
+
+    def _index_remove(self, doc: Dict[str, Any]) -> None:
+        for name, lookup in self._unique_maps.items():
+            lookup.pop(self._index_key(doc, self._indexes[name][0]), None)
+
+    def _usable_index(self, query: Dict[str, Any], sort: List[Tuple[str, int]]) -> Optional[str]:
+        fields = {k for k in query if not k.startswith("$")}
+        for clause in query.get("$or", []):
+            fields.update(k for k in clause if not k.startswith("$"))
+        leading = {keys[0][0]: name for name, (keys, _) in self._indexes.items()}
+        for field in list(fields) + [field for field, _ in sort[:1]]:
+            if field in leading:
+                return leading[field]
+        return None
+
+    def _lookup_ids(self, ids: Iterable[Any], query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        docs, seen = [], set()
+        for _id in ids:
+            doc = self._docs.get(_id) if _id is not None and not isinstance(_id, (dict, list)) else None
+            if doc is not None and _id not in seen and matches(doc, query):
+                seen.add(_id)
+                docs.append(doc)
+        return docs
+
+    def _select(self, query: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Stored documents (not copies) matching ``query``"""
+        # Query values are BSON-encoded too (enums become strings, dates lose microseconds)
+        query = _copy(query or {})
+        # Equality on a unique single-field index is a direct lookup
+        for name, lookup in self._unique_maps.items():
+            keys = self._indexes[name][0]
+            if len(keys) == 1:
+                field = keys[0][0]
+                value = query.get(field, _MISSING)
+                if value is not _MISSING and not isinstance(value, (dict, list)):
+                    _id = lookup.get((self._key_part(value),))
+                    doc = self._docs.get(_id) if _id is not None else None
+                    return [doc] if doc is not None and matches(doc, query) else []
+                # $in on the same index is one lookup per value
+                if isinstance(value, dict) and set(value) == {"$in"}:
+                    ids = (lookup.get((self._key_part(item),)) for item in value["$in"])
+                    return self._lookup_ids(ids, query)
+        if "_id" in query and not isinstance(query["_id"], dict):
+            doc = self._docs.get(query["_id"])
+            return [doc] if doc is not None and matches(doc, query) else []
+        if isinstance(query.get("_id"), dict) and set(query["_id"]) == {"$in"}:
+            return self._lookup_ids(query["_id"]["$in"], query)
+        return [doc for doc in self._docs.values() if matches(doc, query)]
+
+    # -- reads --------------------------------------------------------------
+
+    def find(self, filter=None, projection=None, **kwargs) -> MemoryCursor:
+        cursor = MemoryCursor(self, filter, projection)
+        if kwargs.get("sort"):
+            cursor.sort(kwargs["sort"])
+        if kwargs.get("limit"):
+            cursor.limit(kwargs["limit"])
+        return cursor
+
+    async def find_one(self, filter=None, projection=None, sort=None, **kwargs) -> Optional[Dict[str, Any]]:
+        if filter is not None and not isinstance(filter, dict):
+            filter = {"_id": filter}
+        cursor = self.find(filter, projection)
+        if sort:
+            cursor.sort(sort)
+        results = await cursor.limit(1).to_list(1)
+        return results[0] if results else None
+
+    async def count_documents(self, filter=None, **kwargs) -> int:
+        if not filter:
+            return len(self._docs)
+        return len(self._select(filter))
+
+    async def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    async def distinct(self, key: str, filter=None, **kwargs) -> List[Any]:
+        values: List[Any] = []
+        for doc in self._select(filter):
+            value = _get_path(doc, key)
+            for item in (value if isinstance(value, list) else [value]):
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], **kwargs) -> MemoryCommandCursor:
+        docs = list(self._docs.values())
+        # Leading $match stages only need to see candidates, not copies
+        while pipeline and "$match" in pipeline[0]:
+            query = _copy(pipeline[0]["$match"])
+            docs = [d for d in docs if matches(d, query)]
+            pipeline = pipeline[1:]
+        return MemoryCommandCursor(run_pipeline([_copy(d) for d in docs], pipeline))
+
+    # -- writes -------------------------------------------------------------
+
+    def _insert(self, document: Dict[str, Any]) -> Any:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        doc = _copy(document)
+        self._check_unique(doc)
+        self._docs[doc["_id"]] = doc
+        self._index_add(doc)
+        return doc["_id"]
+
+    async def insert_one(self, document: Dict[str, Any], **kwargs) -> InsertOneResult:
+        return InsertOneResult(self._insert(document))
+
+    async def insert_many(self, documents: Iterable[Dict[str, Any]], ordered: bool = True, **kwargs) -> InsertManyResult:
+        inserted, errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted.append(self._insert(document))
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e), "keyPattern": e.details.get("keyPattern")})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return InsertManyResult(inserted)
+
+    def _replace_stored(self, old: Dict[str, Any], new: Dict[str, Any]) -> None:
+        self._index_remove(old)
+        try:
+            self._check_unique(new, ignore_id=old["_id"])
+        except DuplicateKeyError:
+            self._index_add(old)
+            raise
+        self._docs[old["_id"]] = new
+        self._index_add(new)
+
+    def _update(self, filter, update, upsert: bool, multi: bool, sort=None) -> Tuple[UpdateResult, Optional[Dict], Optional[Dict]]:
+        """Apply an update; returns the result plus the first document before and after"""
+        filter = filter or {}
+        docs = self._select(filter)
+        if sort:
+            docs = _sort_docs(list(docs), _normalize_sort(sort))
+        if not multi:
+            docs = docs[:1]
+
+        if not docs:
+            if not upsert:
+                return UpdateResult(0, 0), None, None
+            new = _upsert_seed(filter)
+            _apply_update(new, update, inserting=True)
+            if "_id" not in new:
+                new["_id"] = ObjectId()
+            self._check_unique(new)
+            self._docs[new["_id"]] = new
+            self._index_add(new)
+            return UpdateResult(0, 0, new["_id"]), None, new
+
+        modified = 0
+        first_before = first_after = None
+        for doc in docs:
+            before = doc
+            after = _copy(doc)
+            _apply_update(after, update)
+            if after != before:
+                self._replace_stored(before, after)
+                modified += 1
+            if first_before is None:
+                first_before, first_after = before, after
+        return UpdateResult(len(docs), modified), first_before, first_after
+
+    async def update_one(self, filter, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, multi=False)[0]
+
+    async def update_many(self, filter, update, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, update, upsert, multi=True)[0]
+
+    async def replace_one(self, filter, replacement, upsert: bool = False, **kwargs) -> UpdateResult:
+        return self._update(filter, replacement, upsert, multi=False)[0]
+
+    async def find_one_and_update(
+        self, filter, update, projection=None, sort=None, upsert: bool = False,
+        return_document=ReturnDocument.BEFORE, **kwargs
+    ) -> Optional[Dict[str, Any]]:
+        _, before, after = self._update(filter, update, upsert, multi=False, sort=sort)
+        doc = after if return_document == ReturnDocument.AFTER else before
+        return None if doc is None else _project(doc, projection)
+
+    def _delete(self, filter, multi: bool) -> int:
+        docs = self._select(filter)
+        if not multi:
+            docs = docs[:1]
+        for doc in list(docs):
+            self._index_remove(doc)
+            del self._docs[doc["_id"]]
+        return len(docs)
+
+    async def delete_one(self, filter, **kwargs) -> DeleteResult:
+        return DeleteResult(self._delete(filter, multi=False))
+
+    async def delete_many(self, filter, **kwargs) -> DeleteResult:
+        return DeleteResult(self._delete(filter, multi=True))
+
+    async def find_one_and_delete(self, filter, projection=None, sort=None, **kwargs) -> Optional[Dict[str, Any]]:
+        docs = self._select(filter)
+        if sort:
+            docs = _sort_docs(list(docs), _normalize_sort(sort))
+        if not docs:
+            return None
+        doc = docs[0]
+        self._index_remove(doc)
+        del self._docs[doc["_id"]]
+        return _project(doc, projection)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, **kwargs) -> BulkWriteResult:
+        result = BulkWriteResult()
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    result.inserted_count += 1
+                    continue
+                if isinstance(request, (DeleteOne, DeleteMany)):
+                    result.deleted_count += self._delete(request._filter, multi=isinstance(request, DeleteMany))
+                    continue
+                if isinstance(request, ReplaceOne):
+                    update, multi = request._doc, False
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    update, multi = request._doc, isinstance(request, UpdateMany)
+                else:
+                    raise OperationFailure(f"Unsupported bulk operation in memory store: {request!r}")
+                outcome = self._update(request._filter, update, bool(request._upsert), multi)[0]
+                result.matched_count += outcome.matched_count
+                result.modified_count += outcome.modified_count
+                if outcome.upserted_id is not None:
+                    result.upserted_count += 1
+                    result.upserted_ids[index] = outcome.upserted_id
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": 11000, "errmsg": str(e), "keyPattern": e.details.get("keyPattern")})
+                if ordered:
+                    break
+        if errors:
+            details = result.bulk_api_result
+            details["writeErrors"] = errors
+            raise BulkWriteError(details)
+        return result
+
+    async def drop(self) -> None:
+        self.database._collections.pop(self.name, None)
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_collection(self, name: str, **kwargs) -> MemoryCollection:
+        return self[name]
+
+    async def list_collection_names(self, **kwargs) -> List[str]:
+        return list(self._collections)
+
+    async def drop_collection(self, name: str) -> None:
+        self._collections.pop(name, None)
+
+    async def command(self, command, *args, **kwargs) -> Dict[str, Any]:
+        name = command if isinstance(command, str) else next(iter(command))
+        if name in ("ping", "hello", "isMaster", "ismaster"):
+            # Standalone: no setName, so no multi-document transactions
+            return {"ok": 1.0, "isWritablePrimary": True}
+        raise OperationFailure(f"Unsupported command in memory store: {name}")
+
+class MemoryClient:
+    """Drop-in stand-in for AsyncIOMotorClient backed by process memory"""
+
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(self, name)
+        return database
+
+    def __getattr__(self, name: str) -> MemoryDatabase:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def get_database(self, name: str, **kwargs) -> MemoryDatabase:
+        return self[name]
+
+    async def drop_database(self, name) -> None:
+        self._databases.pop(getattr(name, "name", name), None)
+
+    async def list_database_names(self) -> List[str]:
+        return list(self._databases)
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,86 @@
+"""
+Keyset (cursor) pagination for list endpoints
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from fastapi import HTTPException
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pydantic import BaseModel
+from pymongo import ASCENDING
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def _encode_value(value: Any):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def _decode_value(value: Any):
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def encode_cursor(sort_value: Any, last_id: str) -> str:
+    """Opaque cursor pointing just past (sort_value, last_id)"""
+    raw = json.dumps([_encode_value(sort_value), last_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """Inverse of encode_cursor; raises a 400 for malformed cursors"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        return _decode_value(sort_value), str(last_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    sort_field: str,
+    direction: int = ASCENDING,
+    limit: int = DEFAULT_PAGE_SIZE,
+    after: Optional[str] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Fetch one page ordered by (sort_field, id) starting after ``after``.
+
+    Each page is a bounded index range scan on (sort_field, id), so its cost
+    does not grow with how deep the client has paged.
+
+    Legacy documents missing ``sort_field`` (or holding null) sort before
+    every value, like MongoDB does, and ``$gt``/``$lt`` never match null, so
+    the range after a cursor names them explicitly.
+    """
+    query = dict(query)
+    if after:
+        sort_value, last_id = decode_cursor(after)
+        op = "$gt" if direction == ASCENDING else "$lt"
+        ties = {sort_field: sort_value, "id": {op: last_id}}
+        if sort_value is None:
+            # Every non-null value follows null ascending; nothing does descending
+            query["$or"] = [{sort_field: {"$ne": None}}, ties] if direction == ASCENDING else [ties]
+        else:
+            query["$or"] = [{sort_field: {op: sort_value}}, ties]
+            if direction != ASCENDING:
+                query["$or"].append({sort_field: None})
+
+    docs = await collection.find(query, projection).sort(
+        [(sort_field, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1].get(sort_field), docs[-1]["id"])
+    return docs, next_cursor
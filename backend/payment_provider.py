@@ -0,0 +1,275 @@
+"""
+Payment provider clients
+
+DonationService talks to the payment provider through the PaymentProvider
+interface. Two clients implement it:
+
+- MockPaymentProvider reproduces the offline mock the service used before:
+  sessions that stay open and unpaid.
+- HttpPaymentProvider speaks the Stripe checkout API subset that
+  fake_provider.py serves, over one shared ``httpx.AsyncClient``. Keep-alive
+  connections are pooled and reused across requests, not opened per call.
+  Every call has a connect and a total timeout. Retries are limited by a
+  retry budget, so an outage cannot multiply the load on the provider.
+  Session creation sends an Idempotency-Key, which makes its retries safe.
+
+Select one with PAYMENT_PROVIDER=mock|http (see create_provider).
+"""
+import asyncio
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+PAYMENT_PROVIDER = os.environ.get("PAYMENT_PROVIDER", "mock")
+PAYMENT_PROVIDER_URL = os.environ.get("PAYMENT_PROVIDER_URL", "https://api.stripe.com")
+PROVIDER_TIMEOUT_SECONDS = float(os.environ.get("PROVIDER_TIMEOUT_SECONDS", "10"))
+PROVIDER_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("PROVIDER_CONNECT_TIMEOUT_SECONDS", "3"))
+PROVIDER_MAX_CONNECTIONS = int(os.environ.get("PROVIDER_MAX_CONNECTIONS", "50"))
+PROVIDER_MAX_KEEPALIVE = int(os.environ.get("PROVIDER_MAX_KEEPALIVE", "20"))
+PROVIDER_MAX_RETRIES = int(os.environ.get("PROVIDER_MAX_RETRIES", "2"))
+# Retries may add at most this fraction of extra requests, plus a small reserve
+PROVIDER_RETRY_RATIO = float(os.environ.get("PROVIDER_RETRY_RATIO", "0.2"))
+PROVIDER_RETRY_RESERVE = float(os.environ.get("PROVIDER_RETRY_RESERVE", "10"))
+PROVIDER_RETRY_BACKOFF_SECONDS = float(os.environ.get("PROVIDER_RETRY_BACKOFF_SECONDS", "0.2"))
+
+# Stripe substitutes the session id into the success URL
+SESSION_ID_PLACEHOLDER = "{CHECKOUT_SESSION_ID}"
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+@dataclass(frozen=True)
+class CheckoutSession:
+    session_id: str
+    url: str
+
+@dataclass(frozen=True)
+class CheckoutStatus:
+    status: str
+    payment_status: str
+    amount_total: int  # cents
+    currency: str
+    # Set once a session that saved the payment method is paid
+    customer: Optional[str] = None
+
+@dataclass(frozen=True)
+class ChargeResult:
+    charge_id: str
+    succeeded: bool
+    failure_reason: Optional[str] = None
+
+class ProviderError(Exception):
+    pass
+
+class PaymentProvider(ABC):
+    """Clients missing a method fail when instantiated, not mid-payment"""
+
+    # False for clients that only pretend to charge; pledges are not run on them
+    moves_money = True
+
+    @abstractmethod
+    async def create_checkout_session(
+        self,
+        amount: float,
+        currency: str,
+        product_name: str,
+        success_url: str,
+        cancel_url: str,
+        metadata: Dict[str, str],
+        idempotency_key: str,
+        save_payment_method: bool = False,
+    ) -> CheckoutSession:
+        """``save_payment_method`` keeps the card on a customer for off-session charges"""
+
+    @abstractmethod
+    async def get_checkout_status(self, session_id: str) -> CheckoutStatus:
+        ...
+
+    @abstractmethod
+    async def create_charge(
+        self,
+        amount: float,
+        currency: str,
+        customer: str,
+        metadata: Dict[str, str],
+        idempotency_key: str,
+    ) -> ChargeResult:
+        """Charge a saved customer off-session; declines are results, not errors"""
+
+    async def close(self) -> None:
+        pass
+
+class MockPaymentProvider(PaymentProvider):
+    """Sessions that are never paid, for running without a provider"""
+
+    moves_money = False
+
+    async def create_checkout_session(
+        self, amount, currency, product_name, success_url, cancel_url, metadata, idempotency_key,
+        save_payment_method=False
+    ) -> CheckoutSession:
+        session_id = f"mock_session_{idempotency_key}"
+        return CheckoutSession(session_id=session_id, url=f"https://checkout.stripe.com/pay/{session_id}")
+
+    async def get_checkout_status(self, session_id: str) -> CheckoutStatus:
+        return CheckoutStatus(status="open", payment_status="unpaid", amount_total=5000, currency="usd")
+
+    async def create_charge(self, amount, currency, customer, metadata, idempotency_key) -> ChargeResult:
+        # No money can move, so nothing may be recorded as paid
+        return ChargeResult(charge_id="", succeeded=False, failure_reason="mock_provider")
+
+class RetryBudget:
+    """Token bucket shared by every call of a client.
+
+    Each request deposits ``ratio`` tokens and each retry spends one. Over
+    time, retries therefore stay under ``ratio`` times the request volume.
+    At most ``reserve`` tokens are saved up. The reserve lets quiet periods
+    still retry, and it caps the retries a sudden outage can trigger.
+    """
+
+    def __init__(self, ratio: float = PROVIDER_RETRY_RATIO, reserve: float = PROVIDER_RETRY_RESERVE):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+        self.exhausted = 0
+
+    def deposit(self) -> None:
+        self.tokens = min(self.tokens + self.ratio, self.reserve)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+def _form(prefix: str, values: Dict[str, Any]) -> Dict[str, str]:
+    # Enum members are sent as their values
+    return {f"{prefix}[{key}]": str(getattr(value, "value", value)) for key, value in values.items()}
+
+class HttpPaymentProvider(PaymentProvider):
+    def __init__(
+        self,
+        base_url: str = PAYMENT_PROVIDER_URL,
+        api_key: Optional[str] = None,
+        timeout: float = PROVIDER_TIMEOUT_SECONDS,
+        connect_timeout: float = PROVIDER_CONNECT_TIMEOUT_SECONDS,
+        max_connections: int = PROVIDER_MAX_CONNECTIONS,
+        max_keepalive: int = PROVIDER_MAX_KEEPALIVE,
+        max_retries: int = PROVIDER_MAX_RETRIES,
+        retry_budget: Optional[RetryBudget] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.max_retries = max_retries
+        self.retry_budget = retry_budget or RetryBudget()
+        self.requests = 0
+        self.retries = 0
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {api_key or os.environ.get('STRIPE_API_KEY', '')}"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            transport=transport,
+        )
+
+    async def _request(self, method: str, path: str, accept: tuple = (), **kwargs) -> Dict[str, Any]:
+        attempt = 0
+        while True:
+            self.requests += 1
+            if attempt == 0:
+                self.retry_budget.deposit()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+                if response.status_code not in RETRYABLE_STATUS:
+                    if response.is_error and response.status_code not in accept:
+                        raise ProviderError(f"{method} {path} failed with {response.status_code}: {response.text[:200]}")
+                    return response.json()
+                error: Exception = ProviderError(f"{method} {path} failed with {response.status_code}")
+            except httpx.TransportError as e:
+                # Connect errors, timeouts and dropped connections
+                error = e
+            if attempt >= self.max_retries or not self.retry_budget.withdraw():
+                raise ProviderError(f"{method} {path} failed after {attempt + 1} attempts: {error}") from error
+            attempt += 1
+            self.retries += 1
+            logging.warning(f"Retrying {method} {path} (attempt {attempt + 1}): {error}")
+            await asyncio.sleep(PROVIDER_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+    async def create_checkout_session(
+        self, amount, currency, product_name, success_url, cancel_url, metadata, idempotency_key,
+        save_payment_method=False
+    ) -> CheckoutSession:
+        data = {
+            "mode": "payment",
+            "success_url": success_url,
+            "cancel_url": cancel_url,
+            "line_items[0][quantity]": "1",
+            "line_items[0][price_data][currency]": currency,
+            "line_items[0][price_data][unit_amount]": str(round(amount * 100)),
+            "line_items[0][price_data][product_data][name]": product_name,
+            **_form("metadata", metadata),
+        }
+        if save_payment_method:
+            data["customer_creation"] = "always"
+            data["payment_intent_data[setup_future_usage]"] = "off_session"
+        session = await self._request(
+            "POST", "/v1/checkout/sessions", data=data, headers={"Idempotency-Key": idempotency_key}
+        )
+        return CheckoutSession(session_id=session["id"], url=session["url"])
+
+    async def get_checkout_status(self, session_id: str) -> CheckoutStatus:
+        session = await self._request("GET", f"/v1/checkout/sessions/{session_id}")
+        return CheckoutStatus(
+            status=session["status"],
+            payment_status=session["payment_status"],
+            amount_total=session["amount_total"],
+            currency=session["currency"],
+            customer=session.get("customer"),
+        )
+
+    async def create_charge(self, amount, currency, customer, metadata, idempotency_key) -> ChargeResult:
+        data = {
+            "amount": str(round(amount * 100)),
+            "currency": currency,
+            "customer": customer,
+            "confirm": "true",
+            "off_session": "true",
+            **_form("metadata", metadata),
+        }
+        # Card declines come back as 402 with the failed payment intent
+        intent = await self._request(
+            "POST", "/v1/payment_intents", accept=(402,), data=data, headers={"Idempotency-Key": idempotency_key}
+        )
+        if "error" in intent:
+            error = intent["error"]
+            return ChargeResult(
+                charge_id=error.get("payment_intent", {}).get("id", ""),
+                succeeded=False,
+                failure_reason=error.get("decline_code") or error.get("code"),
+            )
+        return ChargeResult(
+            charge_id=intent["id"],
+            succeeded=intent["status"] == "succeeded",
+            failure_reason=None if intent["status"] == "succeeded" else intent["status"],
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "retry_budget_tokens": round(self.retry_budget.tokens, 2),
+            "retry_budget_exhausted": self.retry_budget.exhausted,
+        }
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+def create_provider() -> PaymentProvider:
+    if PAYMENT_PROVIDER == "http":
+        return HttpPaymentProvider()
+    if PAYMENT_PROVIDER != "mock":
+        raise ValueError(f"Unknown PAYMENT_PROVIDER: {PAYMENT_PROVIDER}")
+    return MockPaymentProvider()
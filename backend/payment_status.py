@@ -0,0 +1,106 @@
+"""
+Payment status notifications
+
+Once a checkout reaches a terminal state (paid, failed or expired) it never
+changes again. Its status payload is then cached in-process, so repeat
+lookups skip Mongo and the provider. It is also published to any
+server-sent-events streams waiting on that session in this process.
+Streams in other workers find out on their next periodic re-check.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from cache import TTLCache
+
+TERMINAL_CACHE_SIZE = int(os.environ.get("PAYMENT_STATUS_CACHE_SIZE", "10000"))
+TERMINAL_CACHE_TTL_SECONDS = float(os.environ.get("PAYMENT_STATUS_CACHE_TTL_SECONDS", "86400"))
+# How often an open stream re-checks the session when nothing is published
+STATUS_STREAM_RECHECK_SECONDS = float(os.environ.get("STATUS_STREAM_RECHECK_SECONDS", "5"))
+STATUS_STREAM_TIMEOUT_SECONDS = float(os.environ.get("STATUS_STREAM_TIMEOUT_SECONDS", "120"))
+
+def is_terminal(payload: Dict[str, Any]) -> bool:
+    """Paid, or a checkout session that closed (failed or expired) without payment"""
+    if payload.get("status") == "open":
+        return False
+    return payload.get("payment_status") in ("paid", "failed") or payload.get("status") == "expired"
+
+class PaymentStatusBroker:
+    def __init__(self, maxsize: int = TERMINAL_CACHE_SIZE, ttl: float = TERMINAL_CACHE_TTL_SECONDS):
+        self.terminal = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._waiters: Dict[str, Set[asyncio.Future]] = {}
+
+    def cached(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.terminal.get(session_id)
+
+    def publish(self, session_id: str, payload: Dict[str, Any]) -> None:
+        """Record a terminal payload and wake every stream waiting on it"""
+        self.terminal.set(session_id, payload)
+        for waiter in self._waiters.pop(session_id, ()):
+            if not waiter.done():
+                waiter.set_result(payload)
+
+    async def wait(self, session_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """The terminal payload if published within ``timeout`` seconds, else None"""
+        cached = self.cached(session_id)
+        if cached is not None:
+            return cached
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(session_id, set()).add(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(session_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[session_id]
+
+def sse_event(event: str, payload: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
+
+async def status_stream(
+    broker: PaymentStatusBroker,
+    session_id: str,
+    check: Callable[[str], Awaitable[Dict[str, Any]]],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    recheck: float = STATUS_STREAM_RECHECK_SECONDS,
+    timeout: float = STATUS_STREAM_TIMEOUT_SECONDS,
+) -> AsyncIterator[bytes]:
+    """SSE events for a checkout session until it reaches a terminal state.
+
+    The current status is sent first. After that the stream waits on the
+    broker, re-checking with ``check`` every ``recheck`` seconds in case the
+    result was published by another worker. Quiet intervals send a comment
+    as a keepalive. The stream ends with a ``timeout`` event after
+    ``timeout`` seconds.
+    """
+    payload = await check(session_id)
+    yield sse_event("status", payload)
+    if is_terminal(payload):
+        return
+
+    deadline = time.monotonic() + timeout
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            yield sse_event("timeout", {"session_id": session_id})
+            return
+        if await is_disconnected():
+            return
+        published = await broker.wait(session_id, min(recheck, remaining))
+        if published is None and time.monotonic() < deadline:
+            payload = await check(session_id)
+            if not is_terminal(payload):
+                yield b": keepalive\n\n"
+                continue
+            published = payload
+        if published is not None:
+            yield sse_event("status", published)
+            return
+
+payment_status_broker = PaymentStatusBroker()
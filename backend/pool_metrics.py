@@ -0,0 +1,134 @@
+"""
+MongoDB connection pool metrics
+
+A pymongo ConnectionPoolListener that records how long requests wait to
+check a connection out of the pool and how many connections are in use, so
+the admin metrics endpoint can show whether requests are queuing for
+connections under load.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Tuple
+
+from pymongo import monitoring
+
+# Number of recent checkout waits kept for percentile estimates
+RECENT_WAITS = 1000
+
+def _address(address: Tuple[str, int]) -> str:
+    return f"{address[0]}:{address[1]}"
+
+def _percentile(ordered, fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+class PoolStats:
+    def __init__(self):
+        self.open = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.recent_waits_ms = deque(maxlen=RECENT_WAITS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        ordered = sorted(self.recent_waits_ms)
+        return {
+            "open_connections": self.open,
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.checkout_failures),
+            "wait_ms": {
+                "avg": round(self.wait_total_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                "p50": round(_percentile(ordered, 0.50), 3),
+                "p95": round(_percentile(ordered, 0.95), 3),
+                "p99": round(_percentile(ordered, 0.99), 3),
+                "max": round(self.wait_max_ms, 3),
+            },
+        }
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Collects per-server pool usage; events arrive on driver worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, PoolStats] = {}
+        # Checkout happens synchronously on the thread that needs the
+        # connection, so the start time can be correlated per thread
+        self._local = threading.local()
+
+    def _stats(self, address) -> PoolStats:
+        key = _address(address)
+        stats = self._pools.get(key)
+        if stats is None:
+            stats = self._pools[key] = PoolStats()
+        return stats
+
+    def _wait_ms(self) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        return (time.perf_counter() - started) * 1000 if started is not None else 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self._stats(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(_address(event.address), None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._stats(event.address).open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.open = max(0, stats.open - 1)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.checkout_failures[event.reason] = stats.checkout_failures.get(event.reason, 0) + 1
+            stats.wait_max_ms = max(stats.wait_max_ms, wait_ms)
+
+    def connection_checked_out(self, event):
+        wait_ms = self._wait_ms()
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.checkouts += 1
+            stats.in_use += 1
+            stats.max_in_use = max(stats.max_in_use, stats.in_use)
+            stats.wait_total_ms += wait_ms
+            stats.wait_max_ms = max(stats.wait_max_ms, wait_ms)
+            stats.recent_waits_ms.append(wait_ms)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            stats = self._stats(event.address)
+            stats.in_use = max(0, stats.in_use - 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-server pool metrics"""
+        with self._lock:
+            return {address: stats.snapshot() for address, stats in self._pools.items()}
+
+pool_metrics = PoolMetricsListener()
@@ -0,0 +1,332 @@
+"""
+Recurring donation pledges
+
+When a MONTHLY or YEARLY donation completes, its pledge is stored in
+``recurring_pledges``. The pledge id is the donation id, and ``next_due``
+is indexed with ``status``:
+
+    {"id": "<first donation id>", "interval": "monthly", "anchor_day": 31,
+     "amount": 50.0, "customer": "<provider customer>", "status": "active",
+     "period": <date>, "next_due": <date>, "failures": 0, "lease_until": <date>}
+
+Each tick claims due pledges in batches. A find, then a leased update_many,
+stamps each batch with this run's owner id. The batch's pledges are charged
+through the provider with at most RECURRING_CONCURRENCY calls in flight,
+and the outcomes are written with one bulk write per collection.
+
+Every charge attempt has a key, ``<pledge>:<period>:<failures>``. The key is
+recorded in ``recurring_charges`` before the provider is called, and it is
+sent as the Idempotency-Key. The completed donation's id is derived from
+it, and the pledge only advances after the outcome is stored. A run that
+dies part way through therefore repeats the same keys once the leases
+expire. The provider returns the original charge, the donation insert
+hits its unique id, and ``complete_donation`` applies side effects once, so
+nothing is charged or counted twice.
+
+A successful charge moves the pledge to its first period after now, so a
+pledge that fell several periods behind is charged once, not once per
+missed period. Declined charges are retried every RECURRING_RETRY_DAYS
+days. Provider errors keep the attempt's key and are retried with a
+growing backoff. After RECURRING_MAX_FAILURES declines or
+RECURRING_MAX_ERRORS errors in a row the pledge becomes ``past_due``.
+
+Usage:
+    python recurring_pledges.py run
+"""
+import argparse
+import asyncio
+import calendar
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from cache import shared_cache
+from donation_models import Donation, DonationStatus, DonationType, PaymentStatus
+from storage import create_client
+
+PLEDGES_COLLECTION = "recurring_pledges"
+CHARGES_COLLECTION = "recurring_charges"
+
+RECURRING_TICK_SECONDS = float(os.environ.get("RECURRING_TICK_SECONDS", "300"))
+RECURRING_BATCH_SIZE = int(os.environ.get("RECURRING_BATCH_SIZE", "1000"))
+RECURRING_CONCURRENCY = int(os.environ.get("RECURRING_CONCURRENCY", "32"))
+RECURRING_LEASE_SECONDS = float(os.environ.get("RECURRING_LEASE_SECONDS", "600"))
+RECURRING_RETRY_DAYS = float(os.environ.get("RECURRING_RETRY_DAYS", "3"))
+RECURRING_MAX_FAILURES = int(os.environ.get("RECURRING_MAX_FAILURES", "3"))
+RECURRING_MAX_ERRORS = int(os.environ.get("RECURRING_MAX_ERRORS", "8"))
+
+ACTIVE = "active"
+PAST_DUE = "past_due"
+CANCELLED = "cancelled"
+
+INTERVAL_MONTHS = {DonationType.MONTHLY.value: 1, DonationType.YEARLY.value: 12}
+
+def add_months(value: datetime, months: int, day: int) -> datetime:
+    """``value`` moved ``months`` months on, on ``day`` or the month's last day"""
+    index = value.month - 1 + months
+    year, month = value.year + index // 12, index % 12 + 1
+    return value.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+def next_period(pledge: Dict[str, Any], now: datetime) -> datetime:
+    """First period after ``now``; periods missed while the pledge was overdue are skipped"""
+    months = INTERVAL_MONTHS[pledge["interval"]]
+    period = add_months(pledge["period"], months, pledge["anchor_day"])
+    while period <= now:
+        period = add_months(period, months, pledge["anchor_day"])
+    return period
+
+def error_backoff(errors: int) -> timedelta:
+    return timedelta(seconds=min(RECURRING_LEASE_SECONDS * 2 ** errors, RECURRING_RETRY_DAYS * 86400))
+
+def charge_key(pledge: Dict[str, Any]) -> str:
+    return f"{pledge['id']}:{pledge['period']:%Y-%m-%d}:{pledge['failures']}"
+
+def charge_donation_id(key: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"recurring:{key}"))
+
+async def create_pledge(db, donation: Dict[str, Any], completed_at: datetime, session=None) -> bool:
+    """Store the pledge started by a completed recurring donation; False if it exists"""
+    interval = getattr(donation["donation_type"], "value", donation["donation_type"])
+    pledge = {
+        "id": donation["id"],
+        "user_id": donation.get("user_id"),
+        "email": donation.get("email"),
+        "amount": donation["amount"],
+        "currency": donation.get("currency", "usd"),
+        "interval": interval,
+        "anchor_day": completed_at.day,
+        # Provider customer the first checkout saved the card on
+        "customer": donation["customer_id"],
+        "status": ACTIVE,
+        "failures": 0,
+        "errors": 0,
+        "charges": 0,
+        "created_at": completed_at,
+        "lease_until": completed_at,
+    }
+    pledge["period"] = pledge["next_due"] = add_months(completed_at, INTERVAL_MONTHS[interval], completed_at.day)
+    try:
+        await db[PLEDGES_COLLECTION].insert_one(pledge, session=session)
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def get_user_pledges(db, user_id: str) -> List[Dict[str, Any]]:
+    return await db[PLEDGES_COLLECTION].find(
+        {"user_id": user_id},
+        {"_id": 0, "id": 1, "amount": 1, "currency": 1, "interval": 1, "status": 1, "next_due": 1, "created_at": 1}
+    ).sort("created_at", -1).to_list(100)
+
+async def cancel_pledge(db, user_id: str, pledge_id: str) -> bool:
+    result = await db[PLEDGES_COLLECTION].update_one(
+        {"id": pledge_id, "user_id": user_id, "status": {"$ne": CANCELLED}},
+        {"$set": {"status": CANCELLED, "cancelled_at": datetime.utcnow()}}
+    )
+    return result.modified_count == 1
+
+async def claim_due(db, owner: str, now: datetime, batch_size: int, lease_seconds: float) -> List[Dict[str, Any]]:
+    """Lease up to ``batch_size`` due pledges for ``owner``"""
+    due = await db[PLEDGES_COLLECTION].find(
+        {"status": ACTIVE, "next_due": {"$lte": now}, "lease_until": {"$lte": now}},
+        {"_id": 0, "id": 1}
+    ).sort("next_due", 1).limit(batch_size).to_list(batch_size)
+    if not due:
+        return []
+    ids = [pledge["id"] for pledge in due]
+    # The due filter is repeated: pledges another worker leased, charged or
+    # that were cancelled since the find are not matched again
+    await db[PLEDGES_COLLECTION].update_many(
+        {"id": {"$in": ids}, "status": ACTIVE, "next_due": {"$lte": now}, "lease_until": {"$lte": now}},
+        {"$set": {"lease_owner": owner, "lease_until": now + timedelta(seconds=lease_seconds)}}
+    )
+    return await db[PLEDGES_COLLECTION].find(
+        {"id": {"$in": ids}, "lease_owner": owner}, {"_id": 0}
+    ).to_list(len(ids))
+
+async def _insert_ignoring_duplicates(collection, operations: List[InsertOne]) -> None:
+    if not operations:
+        return
+    try:
+        await collection.bulk_write(operations, ordered=False)
+    except BulkWriteError as e:
+        # Inserts repeated by a resumed run
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+async def process_batch(service, pledges: List[Dict[str, Any]], owner: str, now: datetime, concurrency: int) -> Dict[str, int]:
+    db = service.db
+    keys = {pledge["id"]: charge_key(pledge) for pledge in pledges}
+    await db[CHARGES_COLLECTION].bulk_write([
+        UpdateOne(
+            {"_id": keys[pledge["id"]]},
+            {"$setOnInsert": {"pledge_id": pledge["id"], "amount": pledge["amount"], "status": "pending", "created_at": now}},
+            upsert=True
+        )
+        for pledge in pledges
+    ], ordered=False)
+    recorded = {
+        charge["_id"]: charge
+        async for charge in db[CHARGES_COLLECTION].find({"_id": {"$in": list(keys.values())}, "status": "succeeded"})
+    }
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def charge(pledge: Dict[str, Any]):
+        key = keys[pledge["id"]]
+        if key in recorded:
+            return pledge, recorded[key]["charge_id"], True, None
+        async with semaphore:
+            try:
+                result = await service.provider.create_charge(
+                    amount=pledge["amount"],
+                    currency=pledge["currency"],
+                    customer=pledge["customer"],
+                    metadata={"pledge_id": pledge["id"], "source": "church_website"},
+                    idempotency_key=key
+                )
+            except Exception as e:
+                # Retried later with the same key, in case the charge went through
+                logging.warning(f"Charging pledge {pledge['id']} failed: {e}")
+                return pledge, None, None, str(e)[:200]
+        return pledge, result.charge_id, result.succeeded, result.failure_reason
+
+    outcomes = await asyncio.gather(*(charge(pledge) for pledge in pledges))
+
+    succeeded = [(pledge, charge_id) for pledge, charge_id, ok, _ in outcomes if ok]
+    await _insert_ignoring_duplicates(db.donations, [
+        InsertOne(Donation(
+            id=charge_donation_id(keys[pledge["id"]]),
+            user_id=pledge.get("user_id"),
+            email=pledge.get("email"),
+            amount=pledge["amount"],
+            currency=pledge["currency"],
+            donation_type=pledge["interval"],
+            pledge_id=pledge["id"],
+            payment_status=PaymentStatus.PENDING,
+            status=DonationStatus.PENDING,
+            metadata={"charge_id": charge_id},
+        ).model_dump())
+        for pledge, charge_id in succeeded
+    ])
+
+    async def complete(pledge: Dict[str, Any]):
+        async with semaphore:
+            await service.complete_donation(charge_donation_id(keys[pledge["id"]]), invalidate=False)
+
+    await asyncio.gather(*(complete(pledge) for pledge, _ in succeeded))
+    if succeeded:
+        await shared_cache.bump("donation_stats")
+        await shared_cache.bump("donation_analytics")
+
+    charge_ops, pledge_ops = [], []
+    counts = {"charged": 0, "declined": 0, "errors": 0}
+    for pledge, charge_id, ok, reason in outcomes:
+        key = keys[pledge["id"]]
+        owned = {"id": pledge["id"], "lease_owner": owner}
+        if ok is None:
+            counts["errors"] += 1
+            errors = pledge.get("errors", 0) + 1
+            update = {"errors": errors, "last_error": reason, "lease_until": now}
+            if errors >= RECURRING_MAX_ERRORS:
+                update["status"] = PAST_DUE
+            else:
+                update["next_due"] = update["lease_until"] = now + error_backoff(errors)
+            pledge_ops.append(UpdateOne(owned, {"$set": update}))
+            continue
+        charge_ops.append(UpdateOne({"_id": key}, {"$set": {
+            "status": "succeeded" if ok else "declined",
+            "charge_id": charge_id,
+            "failure_reason": reason,
+            "donation_id": charge_donation_id(key) if ok else None,
+            "updated_at": now,
+        }}))
+        if ok:
+            counts["charged"] += 1
+            period = next_period(pledge, now)
+            pledge_ops.append(UpdateOne(owned, {
+                "$set": {
+                    "period": period, "next_due": period, "failures": 0, "errors": 0,
+                    # Not claimable again before the next period, whatever clock a stale worker uses
+                    "last_charged_at": now, "lease_until": period,
+                },
+                "$inc": {"charges": 1},
+            }))
+        else:
+            counts["declined"] += 1
+            failures = pledge["failures"] + 1
+            update = {"failures": failures, "errors": 0, "last_failure_reason": reason, "lease_until": now}
+            if failures >= RECURRING_MAX_FAILURES:
+                update["status"] = PAST_DUE
+            else:
+                update["next_due"] = update["lease_until"] = now + timedelta(days=RECURRING_RETRY_DAYS)
+            pledge_ops.append(UpdateOne(owned, {"$set": update}))
+
+    if charge_ops:
+        await db[CHARGES_COLLECTION].bulk_write(charge_ops, ordered=False)
+    if pledge_ops:
+        await db[PLEDGES_COLLECTION].bulk_write(pledge_ops, ordered=False)
+    return counts
+
+async def run_due_pledges(
+    service,
+    now: Optional[datetime] = None,
+    batch_size: int = RECURRING_BATCH_SIZE,
+    concurrency: int = RECURRING_CONCURRENCY,
+    lease_seconds: float = RECURRING_LEASE_SECONDS,
+) -> Dict[str, int]:
+    """Charge every pledge due at ``now``; returns charged/declined/errors counts"""
+    now = now or datetime.utcnow()
+    owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    totals = {"charged": 0, "declined": 0, "errors": 0}
+    while True:
+        pledges = await claim_due(service.db, owner, now, batch_size, lease_seconds)
+        if not pledges:
+            break
+        counts = await process_batch(service, pledges, owner, now, concurrency)
+        for key, value in counts.items():
+            totals[key] += value
+    if any(totals.values()):
+        logging.info(f"Recurring pledges: {totals}")
+    return totals
+
+async def run_periodically(service, interval: float = RECURRING_TICK_SECONDS) -> None:
+    """Background task: charge due pledges every ``interval`` seconds"""
+    while True:
+        try:
+            await run_due_pledges(service)
+        except Exception as e:
+            logging.error(f"Error charging recurring pledges: {e}")
+        await asyncio.sleep(interval)
+
+async def main(command: str) -> int:
+    load_dotenv(Path(__file__).parent / '.env')
+    # donation_service imports this module
+    from donation_service import DonationService
+
+    client = create_client()
+    service = DonationService(client[os.environ.get('DB_NAME', 'test_database')])
+    if not service.provider.moves_money:
+        logging.error("PAYMENT_PROVIDER=mock cannot charge pledges; set a real provider")
+        await service.provider.close()
+        client.close()
+        return 1
+    try:
+        await run_due_pledges(service)
+        return 0
+    finally:
+        await service.provider.close()
+        client.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("command", choices=["run"])
+    sys.exit(asyncio.run(main(parser.parse_args().command)))
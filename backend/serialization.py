@@ -0,0 +1,131 @@
+"""
+JSON serialization helpers
+
+``FastJSONResponse`` is the app-wide response class: it renders with orjson
+when available and produces the same bytes as Starlette's ``JSONResponse``.
+
+List handlers used to rebuild every Mongo document into a Pydantic model and
+then let FastAPI validate the result again through ``response_model``. For
+documents that already went through model validation on write, the trusted
+helpers project only the response fields, build models with
+``model_construct`` (no validation) and serialize them to JSON in one pass.
+"""
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Type, TypeVar
+
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+from pagination import Page
+
+M = TypeVar("M", bound=BaseModel)
+
+# "orjson" (default when installed) or "stdlib"
+JSON_BACKEND = os.environ.get("JSON_BACKEND", "orjson" if orjson else "stdlib")
+
+# Floats json.dumps writes in exponent form (abs >= 1e16 or < 1e-4) come out
+# differently from orjson: 1e16 / 1e-7 / 0.00001 instead of 1e+16 / 1e-07 /
+# 1e-05. The scans look for those number tokens in value or float-key position
+# (literal prefixes keep them fast) and check the punctuation around them, so
+# look-alike text inside strings, such as UUIDs, does not count. A rare false
+# positive only costs the stdlib fallback.
+_EXPONENT_TAIL = re.compile(rb'e-?[0-9]+(?:[,\]}]|":|$)')
+_SMALL_DECIMAL = b"0.0000"
+_MANTISSA = frozenset(b"0123456789.")
+_VALUE_START = frozenset(b"[{:,")
+
+def _starts_value(body: bytes, start: int) -> bool:
+    if start and body[start - 1] == 45:  # "-"
+        start -= 1
+    if start and body[start - 1] == 34:  # opening quote of a float key
+        start -= 1
+    return start == 0 or body[start - 1] in _VALUE_START
+
+def _has_exponent(body: bytes) -> bool:
+    for match in _EXPONENT_TAIL.finditer(body):
+        start = match.start()
+        while start and body[start - 1] in _MANTISSA:
+            start -= 1
+        if start < match.start() and body[start] != 46 and _starts_value(body, start):
+            return True
+    start = body.find(_SMALL_DECIMAL)
+    while start != -1:
+        if not (start and body[start - 1] in _MANTISSA) and _starts_value(body, start):
+            return True
+        start = body.find(_SMALL_DECIMAL, start + 1)
+    return False
+
+def _stdlib_dumps(content: Any) -> bytes:
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+def dumps(content: Any) -> bytes:
+    """Serialize ``content`` to the exact bytes Starlette's JSONResponse emits.
+
+    With orjson, datetimes, enums and UUIDs are rendered natively (matching
+    ``jsonable_encoder``); payloads orjson would format differently, such as
+    exponent floats or integers beyond 64 bits, fall back to the stdlib.
+    The one known difference: orjson renders NaN/Infinity as null where the
+    stdlib raises.
+    """
+    if JSON_BACKEND == "orjson" and orjson is not None:
+        try:
+            body = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        except orjson.JSONEncodeError:
+            body = None
+        if body is not None and not _has_exponent(body):
+            return body
+    return _stdlib_dumps(jsonable_encoder(content))
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def projection_for(model: Type[BaseModel]) -> Dict[str, int]:
+    """MongoDB projection selecting exactly the model's fields"""
+    projection = {field: 1 for field in model.model_fields}
+    projection["_id"] = 0
+    return projection
+
+def construct_trusted(model: Type[M], docs: Iterable[Dict[str, Any]]) -> List[M]:
+    """Build models from trusted documents without re-validating them"""
+    return [model.model_construct(**doc) for doc in docs]
+
+@lru_cache(maxsize=None)
+def _adapter(response_type: Any) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+def trusted_json(response_type: Any, content: Any) -> bytes:
+    """Serialize constructed models the way FastAPI would render ``response_type``"""
+    # Enum fields hold the raw strings read from Mongo; skip the type warnings
+    return _adapter(response_type).dump_json(content, warnings=False)
+
+def trusted_list_response(model: Type[BaseModel], docs: Iterable[Dict[str, Any]]) -> Response:
+    """JSON response for a list of trusted documents"""
+    return Response(
+        content=trusted_json(List[model], construct_trusted(model, docs)),
+        media_type="application/json",
+    )
+
+def trusted_page_response(
+    model: Type[BaseModel], docs: Iterable[Dict[str, Any]], next_cursor: Optional[str]
+) -> Response:
+    """JSON response for one page of trusted documents"""
+    page = Page[model].model_construct(items=construct_trusted(model, docs), next_cursor=next_cursor)
+    return Response(content=trusted_json(Page[model], page), media_type="application/json")
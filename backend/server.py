@@ -1,35 +1,78 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
+from fastapi.responses import StreamingResponse
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+import asyncio
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional
 import uuid
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from enum import Enum
 
 # Import auth modules
 from auth_models import User, UserCreate, UserLogin, UserUpdate, Token, UserRole, UserStatus
-from auth_utils import verify_password, get_password_hash, create_access_token, verify_token
+from auth_utils import (
+    verify_password_async,
+    get_password_hash_async,
+    create_access_token,
+    verify_token,
+    password_hash_pool,
+    user_cache,
+    token_cache,
+    invalidate_cached_user,
+)
 
 # Import donation modules
 from donation_models import Donation, DonationPackage, CheckoutRequest, CheckoutResponse
 from donation_service import DonationService
+from checkout_sweeper import sweep_periodically
+from recurring_pledges import run_periodically as run_recurring_pledges
+from indexes import ensure_indexes
+from storage import create_client
+from pool_metrics import pool_metrics
+from payment_status import payment_status_broker, status_stream
+from pagination import Page, paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from serialization import (
+    FastJSONResponse,
+    projection_for,
+    trusted_list_response,
+    trusted_page_response,
+)
+from compression import CompressionMiddleware
+from http_cache import StaticPayload, cached_response
+from cache import shared_cache
+from events_cache import events_cache, EVENTS_CACHE_CONTROL
+from member_counter import (
+    add_member,
+    deactivate_member,
+    get_active_members,
+    reconcile_periodically,
+)
+from exports import (
+    export_response,
+    EXPORT_FORMAT_PATTERN,
+    DEFAULT_EXPORT_BATCH_SIZE,
+    MAX_EXPORT_BATCH_SIZE,
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# Database connection (MongoDB, or the in-memory engine when STORAGE_BACKEND=memory)
+client = create_client()
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI(title="Iglesia Bautista Yaguita de Pastor API")
+app = FastAPI(
+    title="Iglesia Bautista Yaguita de Pastor API",
+    default_response_class=FastJSONResponse
+)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -40,20 +83,31 @@ donation_service = DonationService(db)
 # Security
 security = HTTPBearer()
 
+async def get_user_by_id(user_id: str) -> Optional[User]:
+    """Resolve a user through the principal cache, falling back to MongoDB"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user_doc = await db.users.find_one({"id": user_id})
+        if user_doc is None:
+            return None
+        user = User(**user_doc)
+        user_cache.set(user_id, user)
+    return user
+
 # Authentication dependency
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user"""
     token = credentials.credentials
     token_data = verify_token(token)
     
-    user = await db.users.find_one({"id": token_data["user_id"]})
+    user = await get_user_by_id(token_data["user_id"])
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return User(**user)
+    return user
 
 async def get_admin_user(current_user: User = Depends(get_current_user)):
     """Require admin role"""
@@ -200,6 +254,11 @@ class AdminLogin(BaseModel):
     username: str
     password: str
 
+def duplicate_key_field(error: DuplicateKeyError) -> Optional[str]:
+    """Name of the first field in the unique index a DuplicateKeyError hit"""
+    key_pattern = (error.details or {}).get("keyPattern") or {}
+    return next(iter(key_pattern), None)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -212,33 +271,23 @@ async def create_status_check(input: StatusCheckCreate):
     _ = await db.status_checks.insert_one(status_obj.dict())
     return status_obj
 
-@api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
-    status_checks = await db.status_checks.find().to_list(1000)
-    return [StatusCheck(**status_check) for status_check in status_checks]
+@api_router.get("/status", response_model=Page[StatusCheck])
+async def get_status_checks(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    status_checks, next_cursor = await paginate(
+        db.status_checks, {}, "timestamp", ASCENDING, limit, after,
+        projection=projection_for(StatusCheck)
+    )
+    return trusted_page_response(StatusCheck, status_checks, next_cursor)
 
 # Authentication Routes
 @api_router.post("/auth/register", response_model=Token)
 async def register_user(user_data: UserCreate):
     """Register a new user"""
-    # Check if user already exists
-    existing_user = await db.users.find_one({"email": user_data.email})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Email already registered"
-        )
-    
-    # Check username uniqueness
-    existing_username = await db.users.find_one({"username": user_data.username})
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
-    
     # Hash password and create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await get_password_hash_async(user_data.password)
     user_dict = user_data.dict()
     del user_dict["password"]
     
@@ -246,34 +295,41 @@ async def register_user(user_data: UserCreate):
     user_doc = new_user.dict()
     user_doc["hashed_password"] = hashed_password
     
+    # Email and username uniqueness is enforced by unique indexes
     try:
         await db.users.insert_one(user_doc)
-        
-        # Create access token
-        access_token_expires = timedelta(minutes=30)
-        access_token = create_access_token(
-            data={"sub": new_user.email, "user_id": new_user.id, "role": new_user.role},
-            expires_delta=access_token_expires
-        )
-        
-        return Token(
-            access_token=access_token,
-            token_type="bearer",
-            expires_in=1800,  # 30 minutes
-            user=new_user
-        )
+    except DuplicateKeyError as e:
+        if duplicate_key_field(e) == "username":
+            detail = "Username already taken"
+        else:
+            detail = "Email already registered"
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
     except Exception as e:
         logging.error(f"Error creating user: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error creating user"
         )
+    
+    # Create access token
+    access_token_expires = timedelta(minutes=30)
+    access_token = create_access_token(
+        data={"sub": new_user.email, "user_id": new_user.id, "role": new_user.role},
+        expires_delta=access_token_expires
+    )
+    
+    return Token(
+        access_token=access_token,
+        token_type="bearer",
+        expires_in=1800,  # 30 minutes
+        user=new_user
+    )
 
 @api_router.post("/auth/login", response_model=Token)
 async def login_user(credentials: UserLogin):
     """Login user"""
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["hashed_password"]):
+    if not user or not await verify_password_async(credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -292,6 +348,7 @@ async def login_user(credentials: UserLogin):
         {"id": user["id"]},
         {"$set": {"last_login": datetime.utcnow()}}
     )
+    invalidate_cached_user(user["id"])
     
     # Create access token
     access_token_expires = timedelta(minutes=30)
@@ -326,18 +383,24 @@ async def update_user_profile(
             {"id": current_user.id},
             {"$set": update_data}
         )
+        invalidate_cached_user(current_user.id)
         
         # Get updated user
         updated_user = await db.users.find_one({"id": current_user.id})
-        return User(**updated_user)
+        user_obj = User(**updated_user)
+        user_cache.set(user_obj.id, user_obj)
+        return user_obj
     
     return current_user
 
 # Donation Routes
+# Packages are fixed at startup, so their JSON is too
+packages_payload = StaticPayload(donation_service.get_packages())
+
 @api_router.get("/donations/packages", response_model=List[DonationPackage])
-async def get_donation_packages():
+async def get_donation_packages(request: Request):
     """Get available donation packages"""
-    return donation_service.get_packages()
+    return packages_payload.response(request)
 
 # Optional authentication dependency for donations
 async def get_optional_current_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))):
@@ -348,10 +411,7 @@ async def get_optional_current_user(credentials: Optional[HTTPAuthorizationCrede
         token = credentials.credentials
         token_data = verify_token(token)
         
-        user = await db.users.find_one({"id": token_data["user_id"]})
-        if user is None:
-            return None
-        return User(**user)
+        return await get_user_by_id(token_data["user_id"])
     except Exception:
         return None
 
@@ -375,20 +435,77 @@ async def get_donation_status(session_id: str):
     """Check donation payment status"""
     return await donation_service.check_payment_status(session_id)
 
+@api_router.get("/donations/status/{session_id}/stream")
+async def stream_donation_status(session_id: str, request: Request):
+    """Server-sent events that push the payment status once it is final"""
+    return StreamingResponse(
+        status_stream(
+            payment_status_broker,
+            session_id,
+            donation_service.check_payment_status,
+            request.is_disconnected
+        ),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/donations/my-donations", response_model=List[Donation])
 async def get_my_donations(
     current_user: User = Depends(get_current_user),
     limit: int = 20
 ):
     """Get current user's donation history"""
-    return await donation_service.get_user_donations(current_user.id, limit)
+    donations = await donation_service.get_user_donation_documents(current_user.id, limit)
+    return trusted_list_response(Donation, donations)
+
+@api_router.get("/donations/my-pledges")
+async def get_my_pledges(current_user: User = Depends(get_current_user)):
+    """Get current user's recurring pledges"""
+    return await donation_service.get_user_pledges(current_user.id)
+
+@api_router.put("/donations/pledges/{pledge_id}/cancel")
+async def cancel_my_pledge(pledge_id: str, current_user: User = Depends(get_current_user)):
+    """Stop a recurring pledge"""
+    if not await donation_service.cancel_pledge(current_user.id, pledge_id):
+        raise HTTPException(status_code=404, detail="Engagement non trouvé")
+    return {"message": "Engagement annulé"}
+
+@api_router.get("/donations/my-ledger")
+async def get_my_donor_ledger(current_user: User = Depends(get_current_user)):
+    """Get current user's lifetime and per-year donation totals (for receipts)"""
+    return await donation_service.get_donor_ledger(current_user.id)
 
 @api_router.get("/donations/stats")
 async def get_donation_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """Get donation statistics, plus totals for start..end when given (admin only)"""
+    if (start is None) != (end is None) or (start and end and start > end):
+        raise HTTPException(status_code=400, detail="Plage de dates invalide")
+    return await donation_service.get_donation_stats(start, end)
+
+@api_router.get("/donations/analytics")
+async def get_donation_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    interval: str = Query("month", pattern="^(week|month)$"),
     current_user: User = Depends(get_admin_user)
 ):
-    """Get donation statistics (admin only)"""
-    return await donation_service.get_donation_stats()
+    """Donation trends per week or month, with breakdowns and percentiles (admin only)
+
+    Defaults to the last 365 days; ``end`` is inclusive.
+    """
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="Plage de dates invalide")
+    return await donation_service.get_donation_analytics(
+        datetime.combine(start, datetime.min.time()),
+        datetime.combine(end + timedelta(days=1), datetime.min.time()),
+        interval
+    )
 
 @api_router.post("/webhook/stripe")
 async def stripe_webhook(request: Request):
@@ -401,52 +518,92 @@ async def stripe_webhook(request: Request):
     
     return await donation_service.handle_webhook(body, signature)
 
-# Church Information
-@api_router.get("/church")
-async def get_church_info():
+# Admin metrics
+@api_router.get("/admin/metrics")
+async def get_admin_metrics(current_user: User = Depends(get_admin_user)):
+    """Runtime cache and connection pool metrics (admin only)"""
     return {
-        "name": "Iglesia Bautista Yaguita de Pastor",
-        "location": "Santiago, République Dominicaine", 
-        "address": "Avenida Nunez de Carcerez #9, Santiago RD",
-        "founded": "2011",
-        "years": "14",
-        "pastor": {
-            "name": "Pasteur Smith Dumont",
-            "phone": "+1 (829) 295-5254",
-            "email": "ibautistayaguitadelpastor@gmail.com",
-            "alternateEmail": "Smithdumont_3@hotmail.com"
-        }
+        "user_cache": user_cache.stats(),
+        "token_cache": token_cache.stats(),
+        "shared_cache": shared_cache.stats(),
+        "mongo_pool": pool_metrics.snapshot(),
+        "webhook_queue": await donation_service.webhook_queue.stats(),
+    }
+
+# Church Information
+CHURCH_INFO = {
+    "name": "Iglesia Bautista Yaguita de Pastor",
+    "location": "Santiago, République Dominicaine", 
+    "address": "Avenida Nunez de Carcerez #9, Santiago RD",
+    "founded": "2011",
+    "years": "14",
+    "pastor": {
+        "name": "Pasteur Smith Dumont",
+        "phone": "+1 (829) 295-5254",
+        "email": "ibautistayaguitadelpastor@gmail.com",
+        "alternateEmail": "Smithdumont_3@hotmail.com"
     }
+}
+church_payload = StaticPayload(CHURCH_INFO)
+
+@api_router.get("/church")
+async def get_church_info(request: Request):
+    return church_payload.response(request)
 
 # Member Routes
 @api_router.post("/members/register", response_model=Member)
 async def register_member(member: MemberCreate):
-    # Check if email already exists
-    existing = await db.members.find_one({"email": member.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Cette adresse e-mail est déjà enregistrée")
-    
     member_dict = member.dict()
     member_obj = Member(**member_dict)
     
+    # Email uniqueness is enforced by a unique index
     try:
-        await db.members.insert_one(member_obj.dict())
+        await add_member(db, member_obj.dict())
         logging.info(f"New member registered: {member_obj.name} ({member_obj.email})")
         return member_obj
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Cette adresse e-mail est déjà enregistrée")
     except Exception as e:
         logging.error(f"Error registering member: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de l'inscription du membre")
 
 @api_router.get("/members/count")
 async def get_members_count():
-    total = await db.members.count_documents({"active": True})
+    total = await get_active_members(db)
     return {"total": total, "registered": total}
 
-@api_router.get("/members", response_model=List[Member])
-async def get_members():
-    """Get all members (admin only)"""
-    members = await db.members.find({"active": True}).to_list(1000)
-    return [Member(**member) for member in members]
+@api_router.put("/members/{member_id}/deactivate")
+async def deactivate_member_route(member_id: str, current_user: User = Depends(get_admin_user)):
+    """Deactivate a member (admin only)"""
+    if not await deactivate_member(db, member_id):
+        raise HTTPException(status_code=404, detail="Membre actif non trouvé")
+    return {"message": "Membre désactivé"}
+
+@api_router.get("/members", response_model=Page[Member])
+async def get_members(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    """Get active members page by page (admin only)"""
+    members, next_cursor = await paginate(
+        db.members, {"active": True}, "registration_date", ASCENDING, limit, after,
+        projection=projection_for(Member)
+    )
+    return trusted_page_response(Member, members, next_cursor)
+
+@api_router.get("/members/export")
+async def export_members(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_admin_user)
+):
+    """Stream all active members as CSV or NDJSON (admin only)"""
+    return export_response(
+        db.members, Member, "members", format,
+        query={"active": True},
+        sort=[("registration_date", ASCENDING), ("id", ASCENDING)],
+        batch_size=batch_size
+    )
 
 # Course Reservation Routes
 @api_router.post("/reservations", response_model=CourseReservation)
@@ -462,11 +619,30 @@ async def create_course_reservation(reservation: CourseReservationCreate):
         logging.error(f"Error creating course reservation: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de la réservation")
 
-@api_router.get("/reservations", response_model=List[CourseReservation])
-async def get_course_reservations():
-    """Get all course reservations (admin only)"""
-    reservations = await db.course_reservations.find().sort("created_at", -1).to_list(100)
-    return [CourseReservation(**reservation) for reservation in reservations]
+@api_router.get("/reservations", response_model=Page[CourseReservation])
+async def get_course_reservations(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    """Get course reservations, newest first (admin only)"""
+    reservations, next_cursor = await paginate(
+        db.course_reservations, {}, "created_at", DESCENDING, limit, after,
+        projection=projection_for(CourseReservation)
+    )
+    return trusted_page_response(CourseReservation, reservations, next_cursor)
+
+@api_router.get("/reservations/export")
+async def export_course_reservations(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_admin_user)
+):
+    """Stream all course reservations as CSV or NDJSON (admin only)"""
+    return export_response(
+        db.course_reservations, CourseReservation, "reservations", format,
+        sort=[("created_at", DESCENDING), ("id", DESCENDING)],
+        batch_size=batch_size
+    )
 
 # Admin Routes
 @api_router.post("/admin/login")
@@ -496,43 +672,80 @@ async def create_contact_message(message: ContactMessageCreate):
         logging.error(f"Error saving contact message: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de l'envoi du message")
 
-@api_router.get("/contact", response_model=List[ContactMessage])
-async def get_contact_messages():
-    """Get all contact messages (for admin use)"""
-    messages = await db.contact_messages.find().sort("created_at", -1).to_list(100)
-    return [ContactMessage(**msg) for msg in messages]
+@api_router.get("/contact", response_model=Page[ContactMessage])
+async def get_contact_messages(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    """Get contact messages, newest first (for admin use)"""
+    messages, next_cursor = await paginate(
+        db.contact_messages, {}, "created_at", DESCENDING, limit, after,
+        projection=projection_for(ContactMessage)
+    )
+    return trusted_page_response(ContactMessage, messages, next_cursor)
+
+@api_router.get("/contact/export")
+async def export_contact_messages(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_admin_user)
+):
+    """Stream all contact messages as CSV or NDJSON (admin only)"""
+    return export_response(
+        db.contact_messages, ContactMessage, "contact_messages", format,
+        sort=[("created_at", DESCENDING), ("id", DESCENDING)],
+        batch_size=batch_size
+    )
 
 # Newsletter Routes
 @api_router.post("/newsletter/subscribe", response_model=NewsletterSubscriber)
 async def subscribe_newsletter(subscription: NewsletterSubscribe):
-    # Check if email already exists
-    existing = await db.newsletter_subscribers.find_one({"email": subscription.email})
-    if existing:
-        raise HTTPException(status_code=400, detail="Cette adresse e-mail est déjà inscrite à notre newsletter")
-    
     subscriber_dict = subscription.dict()
     subscriber_obj = NewsletterSubscriber(**subscriber_dict)
     
+    # Email uniqueness is enforced by a unique index
     try:
         await db.newsletter_subscribers.insert_one(subscriber_obj.dict())
         logging.info(f"New newsletter subscription: {subscriber_obj.email}")
         return subscriber_obj
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Cette adresse e-mail est déjà inscrite à notre newsletter")
     except Exception as e:
         logging.error(f"Error saving newsletter subscription: {e}")
         raise HTTPException(status_code=500, detail="Erreur lors de l'inscription à la newsletter")
 
-@api_router.get("/newsletter/subscribers", response_model=List[NewsletterSubscriber])
-async def get_newsletter_subscribers():
-    """Get all newsletter subscribers (for admin use)"""
-    subscribers = await db.newsletter_subscribers.find({"active": True}).to_list(1000)
-    return [NewsletterSubscriber(**sub) for sub in subscribers]
+@api_router.get("/newsletter/subscribers", response_model=Page[NewsletterSubscriber])
+async def get_newsletter_subscribers(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None
+):
+    """Get active newsletter subscribers page by page (for admin use)"""
+    subscribers, next_cursor = await paginate(
+        db.newsletter_subscribers, {"active": True}, "subscribed_at", ASCENDING, limit, after,
+        projection=projection_for(NewsletterSubscriber)
+    )
+    return trusted_page_response(NewsletterSubscriber, subscribers, next_cursor)
+
+@api_router.get("/newsletter/subscribers/export")
+async def export_newsletter_subscribers(
+    format: str = Query("csv", pattern=EXPORT_FORMAT_PATTERN),
+    batch_size: int = Query(DEFAULT_EXPORT_BATCH_SIZE, ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    current_user: User = Depends(get_admin_user)
+):
+    """Stream all active newsletter subscribers as CSV or NDJSON (admin only)"""
+    return export_response(
+        db.newsletter_subscribers, NewsletterSubscriber, "newsletter_subscribers", format,
+        query={"active": True},
+        sort=[("subscribed_at", ASCENDING), ("id", ASCENDING)],
+        batch_size=batch_size
+    )
 
 # Events Routes
 @api_router.get("/events", response_model=List[Event])
-async def get_events():
+async def get_events(request: Request):
     """Get upcoming events"""
-    events = await db.events.find().sort("date", 1).to_list(50)
-    return [Event(**event) for event in events]
+    body, etag = await events_cache.event_list(db, Event)
+    return cached_response(request, body, etag, EVENTS_CACHE_CONTROL)
 
 @api_router.post("/events", response_model=Event)
 async def create_event(event: EventCreate):
@@ -542,6 +755,7 @@ async def create_event(event: EventCreate):
     
     try:
         await db.events.insert_one(event_obj.dict())
+        await events_cache.invalidate()
         logging.info(f"New event created: {event_obj.title} on {event_obj.date}")
         return event_obj
     except Exception as e:
@@ -549,52 +763,57 @@ async def create_event(event: EventCreate):
         raise HTTPException(status_code=500, detail="Erreur lors de la création de l'événement")
 
 @api_router.get("/events/{event_id}", response_model=Event)
-async def get_event(event_id: str):
+async def get_event(event_id: str, request: Request):
     """Get specific event by ID"""
-    event = await db.events.find_one({"id": event_id})
-    if not event:
+    cached = await events_cache.event(db, Event, event_id)
+    if cached is None:
         raise HTTPException(status_code=404, detail="Événement non trouvé")
-    return Event(**event)
+    body, etag = cached
+    return cached_response(request, body, etag, EVENTS_CACHE_CONTROL)
 
 # Services Routes (static data for now)
+SERVICES = [
+    {
+        "id": 1,
+        "name": "Culte du Dimanche Matin",
+        "time": "07:00 - 10:00 AM / 11:00 AM - 12:00 PM",
+        "day": "Dimanche",
+        "description": "Service principal avec prédication et louange"
+    },
+    {
+        "id": 2,
+        "name": "École du Dimanche",
+        "time": "10:00 - 11:00 AM",
+        "day": "Dimanche", 
+        "description": "Étude biblique pour tous les âges"
+    },
+    {
+        "id": 3,
+        "name": "Culte du Mardi",
+        "time": "19:00 - 21:00 PM",
+        "day": "Mardi",
+        "description": "Service de prière et louange"
+    },
+    {
+        "id": 4,
+        "name": "Étude Biblique Vendredi",
+        "time": "19:00 - 21:00 PM",
+        "day": "Vendredi",
+        "description": "Étude approfondie de la Bible"
+    }
+]
+services_payload = StaticPayload(SERVICES)
+
 @api_router.get("/services")
-async def get_services():
+async def get_services(request: Request):
     """Get church services schedule"""
-    services = [
-        {
-            "id": 1,
-            "name": "Culte du Dimanche Matin",
-            "time": "07:00 - 10:00 AM / 11:00 AM - 12:00 PM",
-            "day": "Dimanche",
-            "description": "Service principal avec prédication et louange"
-        },
-        {
-            "id": 2,
-            "name": "École du Dimanche",
-            "time": "10:00 - 11:00 AM",
-            "day": "Dimanche", 
-            "description": "Étude biblique pour tous les âges"
-        },
-        {
-            "id": 3,
-            "name": "Culte du Mardi",
-            "time": "19:00 - 21:00 PM",
-            "day": "Mardi",
-            "description": "Service de prière et louange"
-        },
-        {
-            "id": 4,
-            "name": "Étude Biblique Vendredi",
-            "time": "19:00 - 21:00 PM",
-            "day": "Vendredi",
-            "description": "Étude approfondie de la Bible"
-        }
-    ]
-    return services
+    return services_payload.response(request)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -610,6 +829,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+background_tasks = []
+
+@app.on_event("startup")
+async def create_db_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    background_tasks.append(asyncio.create_task(reconcile_periodically(db)))
+    background_tasks.extend(
+        donation_service.webhook_queue.start_workers(donation_service.apply_webhook_event)
+    )
+    background_tasks.append(asyncio.create_task(sweep_periodically(donation_service)))
+    if donation_service.provider.moves_money:
+        background_tasks.append(asyncio.create_task(run_recurring_pledges(donation_service)))
+    else:
+        logging.warning("Recurring pledges are not charged with the mock payment provider")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    background_tasks.clear()
     client.close()
+    await donation_service.provider.close()
+    await shared_cache.close()
+    password_hash_pool.shutdown()
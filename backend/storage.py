@@ -0,0 +1,76 @@
+"""
+Storage backend selection
+
+Handlers and DonationService talk to a Motor-style client/database/collection
+interface. STORAGE_BACKEND picks the implementation behind it:
+
+- ``mongo`` (default): AsyncIOMotorClient connected to MONGO_URL
+- ``memory``: the in-process engine from memory_store, for load testing and
+  running the test suite without a mongod
+
+Mongo connection pooling and wire compression come from the environment;
+anything left unset keeps the driver default:
+
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS, MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS, MONGO_COMPRESSORS (e.g. "zstd,snappy,zlib"),
+    MONGO_ZLIB_COMPRESSION_LEVEL
+"""
+import os
+from typing import Any, Dict, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from memory_store import MemoryClient
+from pool_metrics import pool_metrics
+
+STORAGE_BACKENDS = ("mongo", "memory")
+
+# environment variable -> (MongoClient option, type)
+MONGO_CLIENT_SETTINGS = {
+    "MONGO_MAX_POOL_SIZE": ("maxPoolSize", int),
+    "MONGO_MIN_POOL_SIZE": ("minPoolSize", int),
+    "MONGO_MAX_IDLE_TIME_MS": ("maxIdleTimeMS", int),
+    "MONGO_WAIT_QUEUE_TIMEOUT_MS": ("waitQueueTimeoutMS", int),
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS": ("serverSelectionTimeoutMS", int),
+    "MONGO_CONNECT_TIMEOUT_MS": ("connectTimeoutMS", int),
+    "MONGO_COMPRESSORS": ("compressors", str),
+    "MONGO_ZLIB_COMPRESSION_LEVEL": ("zlibCompressionLevel", int),
+}
+
+def mongo_client_options() -> Dict[str, Any]:
+    """MongoClient keyword options for every MONGO_* setting present in the environment"""
+    options: Dict[str, Any] = {}
+    for env_var, (option, cast) in MONGO_CLIENT_SETTINGS.items():
+        value = os.environ.get(env_var)
+        if value:
+            options[option] = cast(value)
+    return options
+
+def create_client(backend: Optional[str] = None, mongo_url: Optional[str] = None):
+    """Create the database client for the configured storage backend"""
+    backend = backend or os.environ.get("STORAGE_BACKEND", "mongo")
+    if backend == "memory":
+        return MemoryClient()
+    if backend == "mongo":
+        return AsyncIOMotorClient(
+            mongo_url or os.environ['MONGO_URL'],
+            event_listeners=[pool_metrics],
+            **mongo_client_options()
+        )
+    raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; expected one of {STORAGE_BACKENDS}")
+
+async def supports_transactions(db) -> bool:
+    """Whether ``db``'s deployment can run multi-document transactions.
+
+    Replica set members report ``setName`` in ``hello`` and mongos reports
+    ``msg: isdbgrid``; standalone servers and the memory store do neither.
+    The answer is cached on the client.
+    """
+    client = db.client
+    cached = getattr(client, "_supports_transactions", None)
+    if cached is None:
+        hello = await db.command("hello")
+        cached = "setName" in hello or hello.get("msg") == "isdbgrid"
+        client._supports_transactions = cached
+    return cached
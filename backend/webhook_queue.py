@@ -0,0 +1,226 @@
+"""
+Durable webhook queue
+
+The webhook endpoint only verifies the provider signature and inserts the
+raw event into ``webhook_events``. The event id is the ``_id``, so when the
+provider retries a delivery it hits the unique key and is acknowledged
+without being queued twice. Background workers then process the queue:
+
+    {"_id": "evt_123", "type": "checkout.session.completed", "raw": "...",
+     "status": "pending", "attempts": 0, "available_at": <date>, ...}
+
+A worker claims an event with one ``find_one_and_update``. The claim moves
+``available_at`` forward by the lease, so if the worker dies the event
+becomes claimable again once the lease expires. A failed attempt is retried
+with exponential backoff. After WEBHOOK_MAX_ATTEMPTS attempts the event is
+parked as ``dead`` for inspection; that includes events whose handler hangs
+or kills its worker every time, which are never failed explicitly and only
+run out of leases. Processed events are removed by a TTL index on
+``processed_at`` after WEBHOOK_RETENTION_SECONDS, which must outlast the
+provider's redelivery window for deduplication to hold. Handlers must be idempotent, because a
+lease can expire while its worker is still running. The donation handlers
+rely on the guarded update in ``DonationService.complete_donation``.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+WEBHOOK_COLLECTION = "webhook_events"
+
+STRIPE_WEBHOOK_SECRET = os.environ.get("STRIPE_WEBHOOK_SECRET")
+# Maximum age of a signed timestamp, against replayed deliveries
+WEBHOOK_TOLERANCE_SECONDS = int(os.environ.get("WEBHOOK_TOLERANCE_SECONDS", "300"))
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "2"))
+WEBHOOK_LEASE_SECONDS = float(os.environ.get("WEBHOOK_LEASE_SECONDS", "60"))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE_SECONDS = float(os.environ.get("WEBHOOK_RETRY_BASE_SECONDS", "5"))
+# Stripe redelivers for up to three days
+WEBHOOK_RETENTION_SECONDS = int(os.environ.get("WEBHOOK_RETENTION_SECONDS", str(30 * 24 * 3600)))
+# Idle workers also wake up on every enqueue in this process
+WEBHOOK_POLL_SECONDS = float(os.environ.get("WEBHOOK_POLL_SECONDS", "2"))
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+DEAD = "dead"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+class InvalidSignature(ValueError):
+    pass
+
+def sign_payload(payload: bytes, secret: str, timestamp: Optional[int] = None) -> str:
+    """A ``Stripe-Signature`` header value for ``payload``"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+def verify_signature(
+    payload: bytes,
+    header: str,
+    secret: Optional[str],
+    tolerance: int = WEBHOOK_TOLERANCE_SECONDS,
+    now: Optional[float] = None,
+) -> None:
+    """Check a ``t=<timestamp>,v1=<hmac>`` signature header; raises InvalidSignature"""
+    if not secret:
+        raise InvalidSignature("STRIPE_WEBHOOK_SECRET is not configured")
+    timestamp, signatures = None, []
+    for item in header.split(","):
+        name, _, value = item.strip().partition("=")
+        if name == "t":
+            timestamp = value
+        elif name == "v1":
+            signatures.append(value)
+    if not timestamp or not timestamp.isdigit() or not signatures:
+        raise InvalidSignature("Malformed signature header")
+    now = time.time() if now is None else now
+    if abs(now - int(timestamp)) > tolerance:
+        raise InvalidSignature("Signature timestamp outside the tolerance")
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    if not any(hmac.compare_digest(expected, signature) for signature in signatures):
+        raise InvalidSignature("No signature matches the payload")
+
+def retry_delay(attempts: int, base: float = WEBHOOK_RETRY_BASE_SECONDS) -> float:
+    """Backoff before the next attempt, after ``attempts`` failed ones"""
+    return base * 2 ** (attempts - 1)
+
+class WebhookQueue:
+    def __init__(self, db, lease_seconds: float = WEBHOOK_LEASE_SECONDS, max_attempts: int = WEBHOOK_MAX_ATTEMPTS):
+        self.db = db
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Created with the workers, on the loop that runs them
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @property
+    def collection(self):
+        return self.db[WEBHOOK_COLLECTION]
+
+    async def enqueue(self, event_id: str, event_type: str, raw: bytes) -> bool:
+        """Store a verified event; False when this event id was already received"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": event_id,
+                "type": event_type,
+                "raw": raw.decode("utf-8"),
+                "status": PENDING,
+                "attempts": 0,
+                "available_at": now,
+                "received_at": now,
+            })
+        except DuplicateKeyError:
+            return False
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    async def claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Lease the oldest due event, or None when nothing is due"""
+        now = datetime.utcnow()
+        event = await self.collection.find_one_and_update(
+            # Pending events, and processing ones whose lease expired
+            {
+                "status": {"$in": [PENDING, PROCESSING]},
+                "available_at": {"$lte": now},
+                "attempts": {"$lt": self.max_attempts},
+            },
+            {
+                "$set": {
+                    "status": PROCESSING,
+                    "lease_owner": worker_id,
+                    "available_at": now + timedelta(seconds=self.lease_seconds),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if event is None:
+            await self.park_exhausted(now)
+        return event
+
+    async def park_exhausted(self, now: datetime) -> int:
+        """Move expired leases that used their last attempt to ``dead``"""
+        result = await self.collection.update_many(
+            {"status": PROCESSING, "available_at": {"$lte": now}, "attempts": {"$gte": self.max_attempts}},
+            {
+                "$set": {"status": DEAD, "last_error": "Lease expired on the last attempt"},
+                "$unset": {"lease_owner": ""},
+            }
+        )
+        if result.modified_count:
+            logging.error(f"{result.modified_count} webhook events ran out of attempts without finishing")
+        return result.modified_count
+
+    async def complete(self, event: Dict[str, Any], worker_id: str) -> None:
+        await self.collection.update_one(
+            {"_id": event["_id"], "lease_owner": worker_id},
+            {"$set": {"status": DONE, "processed_at": datetime.utcnow()}, "$unset": {"lease_owner": "", "raw": ""}}
+        )
+
+    async def fail(self, event: Dict[str, Any], worker_id: str, error: Exception) -> None:
+        """Schedule a retry with backoff, or park the event once attempts run out"""
+        attempts = event["attempts"]
+        update: Dict[str, Any] = {"last_error": str(error)[:500]}
+        if attempts >= self.max_attempts:
+            update["status"] = DEAD
+            logging.error(f"Webhook event {event['_id']} failed {attempts} times; giving up: {error}")
+        else:
+            update["status"] = PENDING
+            update["available_at"] = datetime.utcnow() + timedelta(seconds=retry_delay(attempts))
+            logging.warning(f"Webhook event {event['_id']} failed (attempt {attempts}): {error}")
+        await self.collection.update_one(
+            {"_id": event["_id"], "lease_owner": worker_id},
+            {"$set": update, "$unset": {"lease_owner": ""}}
+        )
+
+    async def process_next(self, handler: Handler, worker_id: str) -> bool:
+        """Claim and handle one event; False when the queue had nothing due"""
+        event = await self.claim(worker_id)
+        if event is None:
+            return False
+        try:
+            await handler(json.loads(event["raw"]))
+        except Exception as e:
+            await self.fail(event, worker_id, e)
+        else:
+            await self.complete(event, worker_id)
+        return True
+
+    async def run_worker(self, handler: Handler, poll_interval: float = WEBHOOK_POLL_SECONDS) -> None:
+        """Background task: drain due events, then wait for an enqueue or the poll interval"""
+        worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        while True:
+            # Cleared before claiming, so an enqueue during the claim is not missed
+            self._wakeup.clear()
+            try:
+                if await self.process_next(handler, worker_id):
+                    continue
+            except Exception as e:
+                logging.error(f"Webhook worker error: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start_workers(self, handler: Handler, count: int = WEBHOOK_WORKERS) -> List[asyncio.Task]:
+        self._wakeup = asyncio.Event()
+        return [asyncio.create_task(self.run_worker(handler)) for _ in range(count)]
+
+    async def stats(self) -> Dict[str, int]:
+        counts = await self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]).to_list(None)
+        return {row["_id"]: row["count"] for row in counts}
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Checkouts/sec through DonationService against the local fake provider
+
+The fake provider (backend/fake_provider.py) runs under uvicorn on a local
+port, so provider calls cross real sockets. Each checkout creates a
+session, pays it and checks its status, on the in-memory storage engine.
+The pooled client is compared with a client opened per call, which is what
+an unpooled integration would do.
+
+Usage:
+    python benchmarks/bench_checkout_flow.py [--latency-ms 20]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+
+import uvicorn  # noqa: E402
+
+from donation_models import CheckoutRequest  # noqa: E402
+from donation_service import DonationService  # noqa: E402
+from fake_provider import FakeProvider, create_app  # noqa: E402
+from payment_provider import HttpPaymentProvider, PaymentProvider  # noqa: E402
+from storage import create_client  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+CHECKOUTS = 500
+CONCURRENCY = 32
+REQUEST = CheckoutRequest(package_id="support", donor_email="ana@example.com", origin_url="https://example.org")
+
+
+class PerCallProvider(PaymentProvider):
+    """Opens and closes a client for every call"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    async def _call(self, method, *args, **kwargs):
+        provider = HttpPaymentProvider(base_url=self.base_url)
+        try:
+            return await getattr(provider, method)(*args, **kwargs)
+        finally:
+            await provider.close()
+
+    async def create_checkout_session(self, *args, **kwargs):
+        return await self._call("create_checkout_session", *args, **kwargs)
+
+    async def get_checkout_status(self, session_id):
+        return await self._call("get_checkout_status", session_id)
+
+    async def create_charge(self, *args, **kwargs):
+        return await self._call("create_charge", *args, **kwargs)
+
+
+def start_fake_provider(fake):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(create_app(fake), host="127.0.0.1", port=port, log_level="warning")
+    fake_server = uvicorn.Server(config)
+    threading.Thread(target=fake_server.run, daemon=True).start()
+    while not fake_server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", fake_server
+
+
+async def run(label, provider, fake):
+    db = create_client()[f"bench_{label}"]
+    service = DonationService(db, provider=provider)
+    remaining = iter(range(CHECKOUTS))
+
+    async def worker():
+        for _ in remaining:
+            response = await service.create_checkout_session(REQUEST)
+            fake.settle(response.session_id, paid=True)
+            status = await service.check_payment_status(response.session_id)
+            assert status["payment_status"] == "paid"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    await provider.close()
+    print(f"{label:<10} {CHECKOUTS / elapsed:>9,.0f} checkouts/s  ({elapsed:.2f}s)")
+
+
+def main(latency_ms):
+    fake = FakeProvider(latency=latency_ms / 1000)
+    base_url, fake_server = start_fake_provider(fake)
+    try:
+        asyncio.run(run("pooled", HttpPaymentProvider(base_url=base_url), fake))
+        asyncio.run(run("per-call", PerCallProvider(base_url), fake))
+    finally:
+        fake_server.should_exit = True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    main(parser.parse_args().latency_ms)
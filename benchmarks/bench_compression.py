@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+CPU cost vs bytes saved for response compression, per endpoint
+
+Fetches each endpoint uncompressed from the app (memory storage backend),
+then times gzip and brotli at several levels on that body. The middleware
+defaults are GZIP_LEVEL=6 and BROTLI_QUALITY=5.
+
+Usage:
+    python benchmarks/bench_compression.py
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("DB_NAME", "bench")
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+from bench_http_stack import seed  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+PATHS = [
+    "/api/church",
+    "/api/services",
+    "/api/events",
+    "/api/members?limit=100",
+    "/api/members?limit=500",
+    "/api/contact?limit=100",
+    "/api/members/export?format=csv",
+    "/api/members/export?format=ndjson",
+]
+
+CODECS = [
+    ("gzip-1", lambda body: gzip.compress(body, compresslevel=1, mtime=0)),
+    ("gzip-6", lambda body: gzip.compress(body, compresslevel=6, mtime=0)),
+    ("gzip-9", lambda body: gzip.compress(body, compresslevel=9, mtime=0)),
+]
+if brotli is not None:
+    CODECS += [
+        ("br-1", lambda body: brotli.compress(body, quality=1)),
+        ("br-5", lambda body: brotli.compress(body, quality=5)),
+        ("br-11", lambda body: brotli.compress(body, quality=11)),
+    ]
+
+
+def time_codec(codec, body):
+    iterations = max(3, min(200, 2_000_000 // max(len(body), 1)))
+    start = time.perf_counter()
+    for _ in range(iterations):
+        compressed = codec(body)
+    return (time.perf_counter() - start) / iterations, len(compressed)
+
+
+async def seed_contact_messages():
+    await server.db.contact_messages.insert_many([
+        server.ContactMessage(
+            name=f"Visiteur {i}", email=f"visiteur{i}@example.com", subject="Demande de prière",
+            message="Bonjour, je voudrais en savoir plus sur les cultes du dimanche. " * 3,
+        ).model_dump()
+        for i in range(500)
+    ])
+
+
+async def main():
+    await server.ensure_indexes(server.db)
+    await seed()
+    await seed_contact_messages()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'endpoint':<36} {'codec':<7} {'bytes':>10} {'saved':>7} {'cpu ms':>8} {'KB saved/ms':>12}")
+        for path in PATHS:
+            response = await client.get(path, headers={"Accept-Encoding": "identity"})
+            body = response.content
+            print(f"{path:<36} {'none':<7} {len(body):>10,}")
+            for name, codec in CODECS:
+                seconds, size = time_codec(codec, body)
+                saved = len(body) - size
+                print(
+                    f"{'':<36} {name:<7} {size:>10,} {saved / len(body):>6.0%} "
+                    f"{seconds * 1000:>8.3f} {saved / 1024 / (seconds * 1000):>12,.1f}"
+                )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Donation analytics on a synthetic 1M-donation dataset
+
+Times the vectorized summary (weekly and monthly buckets, type and anonymity
+splits, median/p90) against an equivalent pure-Python pass over the same
+rows. It then times the batched projection load through the in-memory
+storage engine on a smaller sample.
+
+Usage:
+    python benchmarks/bench_donation_analytics.py [donations] [load_sample]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["STORAGE_BACKEND"] = "memory"
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from donation_analytics import load_frame, summarize  # noqa: E402
+from storage import create_client  # noqa: E402
+
+START = datetime(2023, 1, 1)
+DAYS = 730
+TYPES = np.array(["one_time", "monthly", "yearly"])
+AMOUNTS = np.array([10.0, 25.0, 50.0, 100.0, 250.0, 500.0])
+
+
+def synthetic_frame(n, seed=42):
+    rng = np.random.default_rng(seed)
+    offsets = rng.integers(0, DAYS * 86400, n).astype("timedelta64[s]")
+    return pd.DataFrame({
+        "completed_at": pd.to_datetime(np.datetime64(START, "ms") + offsets),
+        "amount": rng.choice(AMOUNTS, n, p=[0.25, 0.3, 0.25, 0.12, 0.06, 0.02]),
+        "donation_type": pd.Categorical(rng.choice(TYPES, n, p=[0.7, 0.25, 0.05])),
+        "anonymous": rng.random(n) < 0.15,
+    })
+
+
+def python_summary(rows):
+    """What the summary costs without vectorization"""
+    buckets = defaultdict(list)
+    by_type = defaultdict(float)
+    by_anonymity = defaultdict(float)
+    for completed_at, amount, donation_type, anonymous in rows:
+        buckets[(completed_at.year, completed_at.month)].append(amount)
+        by_type[donation_type] += amount
+        by_anonymity[anonymous] += amount
+    for amounts in buckets.values():
+        amounts.sort()
+        statistics.median(amounts)
+        amounts[int(0.9 * (len(amounts) - 1))]
+    everything = sorted(amount for amounts in buckets.values() for amount in amounts)
+    return statistics.median(everything), by_type, by_anonymity
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"{label:<44} {time.perf_counter() - start:>8.3f}s")
+    return result
+
+
+async def time_load(sample):
+    frame = synthetic_frame(sample, seed=1)
+    docs = [
+        {
+            "id": str(i), "status": "completed", "amount": float(amount), "donation_type": str(donation_type),
+            "anonymous": bool(anonymous), "completed_at": completed_at.to_pydatetime(),
+            "email": f"donor{i}@example.com", "message": "Que Dieu vous bénisse", "metadata": {"source": "web"},
+        }
+        for i, (completed_at, amount, donation_type, anonymous) in enumerate(frame.itertuples(index=False))
+    ]
+    db = create_client()["bench"]
+    await db.donations.create_index([("status", 1), ("completed_at", 1)])
+    await db.donations.insert_many(docs)
+    start = time.perf_counter()
+    loaded = await load_frame(db, START, START + timedelta(days=DAYS))
+    elapsed = time.perf_counter() - start
+    print(f"{'load_frame (memory engine, ' + format(len(loaded), ',') + ' docs)':<44} {elapsed:>8.3f}s"
+          f"  ({len(loaded) / elapsed:,.0f} docs/s)")
+
+
+def main(n, sample):
+    frame = timed(f"generate {n:,} donations", synthetic_frame, n)
+    timed("summarize, monthly (vectorized)", summarize, frame, "month")
+    timed("summarize, weekly (vectorized)", summarize, frame, "week")
+    rows = list(zip(
+        frame["completed_at"].dt.to_pydatetime(), frame["amount"].tolist(),
+        frame["donation_type"].astype(str).tolist(), frame["anonymous"].tolist(),
+    ))
+    timed("pure-Python monthly equivalent", python_summary, rows)
+    asyncio.run(time_load(sample))
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 1_000_000, args[1] if len(args) > 1 else 100_000)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Requests/sec through the full FastAPI stack on the in-memory storage engine
+
+No mongod and no network: requests go through httpx's ASGI transport into
+the app, so the numbers isolate routing, validation and serialization.
+
+With --revalidate each path is first fetched once and then requested with
+its ETag in If-None-Match, measuring the 304 path browsers take on reload.
+
+Usage:
+    python benchmarks/bench_http_stack.py [--revalidate] [path ...]
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("DB_NAME", "bench")
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_PATHS = [
+    "/api/church",
+    "/api/services",
+    "/api/donations/packages",
+    "/api/events",
+    "/api/members/count",
+    "/api/members?limit=100",
+]
+REQUESTS = 1000
+CONCURRENCY = 32
+
+
+async def seed():
+    start = datetime(2025, 1, 1)
+    await server.db.members.insert_many([
+        server.Member(
+            name=f"Membre {i}", email=f"membre{i}@example.com", phone="809-555-0101",
+            registration_date=start + timedelta(minutes=i),
+        ).model_dump()
+        for i in range(5000)
+    ])
+    await server.db.events.insert_many([
+        server.Event(
+            title=f"Événement {i}", date=f"2025-{i % 12 + 1:02d}-15", time="18:00",
+            description="Culte et louange", location="Sanctuaire principal",
+        ).model_dump()
+        for i in range(50)
+    ])
+
+
+async def measure(client, path, revalidate=False):
+    headers = {}
+    expected = 200
+    if revalidate:
+        etag = (await client.get(path)).headers.get("etag")
+        if etag is None:
+            print(f"{path:<32} {'no ETag':>13}")
+            return
+        headers = {"If-None-Match": etag}
+        expected = 304
+    queue = asyncio.Queue()
+    for _ in range(REQUESTS):
+        queue.put_nowait(path)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(path, headers=headers)
+            assert response.status_code == expected, (path, response.status_code)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    elapsed = time.perf_counter() - start
+    print(f"{path:<32} {REQUESTS / elapsed:>9,.0f} req/s  ({expected})")
+
+
+async def main(paths, revalidate=False):
+    await server.ensure_indexes(server.db)
+    await seed()
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for path in paths:
+            await measure(client, path, revalidate)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    revalidate = "--revalidate" in args
+    paths = [arg for arg in args if arg != "--revalidate"]
+    asyncio.run(main(paths or DEFAULT_PATHS, revalidate))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Response rendering throughput: Starlette JSONResponse vs. FastJSONResponse
+
+Renders payloads shaped like our larger responses (a page of members, a
+donation history, the events list) and reports responses per second.
+"""
+
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+
+import serialization  # noqa: E402
+from serialization import FastJSONResponse  # noqa: E402
+
+
+USER_ID = str(uuid.uuid4())
+
+
+def members(count):
+    return {
+        "items": [
+            {
+                "id": str(uuid.uuid4()), "name": f"Membre {i} Éloïse", "email": f"membre{i}@example.com",
+                "phone": "+1 809 555 0101", "address": "Avenida Nunez de Carcerez #9", "birth_date": None,
+                "profession": "Enseignant", "qte_enfants": i % 4, "registration_date": "2025-01-01T10:00:00",
+                "active": True,
+            }
+            for i in range(count)
+        ],
+        "next_cursor": "eyJ4IjoxfQ",
+    }
+
+
+def donations(count):
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "id": str(uuid.uuid4()), "user_id": USER_ID, "email": "ana@example.com", "amount": 25.0 + i % 7 * 12.5,
+            "currency": "usd", "donation_type": "monthly", "status": "completed", "payment_status": "paid",
+            "created_at": (start + timedelta(days=i)).isoformat(), "metadata": {"source": "church_website"},
+        }
+        for i in range(count)
+    ]
+
+
+PAYLOADS = {
+    "members page (100)": members(100),
+    "members page (1000)": members(1000),
+    "donation history (20)": donations(20),
+    "donation history (500)": donations(500),
+}
+
+
+def main():
+    for name, payload in PAYLOADS.items():
+        assert FastJSONResponse(payload).body == JSONResponse(payload).body
+        number = 200
+        baseline = min(timeit.repeat(lambda: JSONResponse(payload), number=number, repeat=5)) / number
+        fast = min(timeit.repeat(lambda: FastJSONResponse(payload), number=number, repeat=5)) / number
+        print(
+            f"{name:<24} JSONResponse {1 / baseline:>9,.0f}/s | "
+            f"FastJSONResponse[{serialization.JSON_BACKEND}] {1 / fast:>9,.0f}/s | {baseline / fast:4.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
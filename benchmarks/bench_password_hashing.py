@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Event-loop latency while bcrypt runs inline vs. in the password hashing pool
+
+Simulates a burst of logins next to a ticker that stands in for unrelated
+requests (e.g. /api/events) and reports how late the ticker wakes up.
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from auth_utils import PasswordHashPool, get_password_hash, verify_password  # noqa: E402
+
+LOGINS = 24
+TICK_SECONDS = 0.01
+
+
+async def ticker(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+
+async def run(mode: str, hashed: str):
+    pool = PasswordHashPool(workers=4, max_queue=LOGINS)
+    stop = asyncio.Event()
+    lags = []
+    tick_task = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(0.05)
+
+    async def login():
+        if mode == "inline":
+            verify_password("secret", hashed)
+            await asyncio.sleep(0)
+        else:
+            await pool.run(verify_password, "secret", hashed)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(LOGINS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    pool.shutdown()
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{mode:>6}: {LOGINS} logins in {elapsed:.2f}s | loop lag "
+        f"p50={statistics.median(lags):.1f}ms p99={p99:.1f}ms max={lags[-1]:.1f}ms "
+        f"({len(lags)} ticks)"
+    )
+
+
+def main():
+    hashed = get_password_hash("secret")
+    for mode in ("inline", "pool"):
+        asyncio.run(run(mode, hashed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Recurring pledge run time for a large due set on the in-memory storage engine
+
+Seeds N due monthly pledges, then times one run_due_pledges pass. Provider
+calls can be given a simulated latency, so the numbers show how batch size
+and concurrency hide round trips.
+
+Usage:
+    python benchmarks/bench_recurring_pledges.py [--pledges 100000] [--latency-ms 50]
+                                                 [--batch-size 1000] [--concurrency 32]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+
+from donation_service import DonationService  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from payment_provider import ChargeResult, MockPaymentProvider  # noqa: E402
+from recurring_pledges import PLEDGES_COLLECTION, run_due_pledges  # noqa: E402
+from storage import create_client  # noqa: E402
+
+
+class SlowProvider(MockPaymentProvider):
+    """Approves every charge after ``latency`` seconds"""
+
+    moves_money = True
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def create_charge(self, amount, currency, customer, metadata, idempotency_key):
+        await asyncio.sleep(self.latency)
+        return ChargeResult(charge_id=f"ch_{idempotency_key}", succeeded=True)
+
+
+async def main(args):
+    db = create_client()["bench_recurring"]
+    await ensure_indexes(db)
+    now = datetime.utcnow()
+    start = now - timedelta(days=31)
+    await db[PLEDGES_COLLECTION].insert_many([
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": None,
+            "email": f"donor{i}@example.com",
+            "amount": float(10 + i % 90),
+            "currency": "usd",
+            "interval": "monthly",
+            "anchor_day": start.day,
+            "customer": f"cus_{i}",
+            "status": "active",
+            "failures": 0,
+            "errors": 0,
+            "charges": 0,
+            "created_at": start,
+            "lease_until": start,
+            "period": now - timedelta(seconds=i % 3600),
+            "next_due": now - timedelta(seconds=i % 3600),
+        }
+        for i in range(args.pledges)
+    ])
+
+    service = DonationService(db, provider=SlowProvider(args.latency_ms / 1000))
+    began = time.perf_counter()
+    totals = await run_due_pledges(service, now=now, batch_size=args.batch_size, concurrency=args.concurrency)
+    elapsed = time.perf_counter() - began
+    print(f"{args.pledges:,} pledges in {elapsed:.1f}s ({args.pledges / elapsed:,.0f}/s): {totals}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pledges", type=int, default=100000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Read-path serialization: validated models vs. trusted model_construct
+
+Compares what a list handler used to cost (build Member(**doc) for every
+document, then FastAPI validates and renders through response_model) with
+the trusted path (model_construct + a single dump_json).
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench")
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from pagination import Page  # noqa: E402
+from serialization import trusted_page_response  # noqa: E402
+from server import Member  # noqa: E402
+
+PAGE_ADAPTER = TypeAdapter(Page[Member])
+
+
+def make_docs(count):
+    return [
+        {
+            "id": f"member-{i}", "name": f"Membre {i}", "email": f"membre{i}@example.com",
+            "phone": "+1 809 555 0101", "address": "Santiago", "profession": "Enseignant",
+            "qte_enfants": i % 4, "registration_date": datetime(2025, 1, 1), "active": True,
+        }
+        for i in range(count)
+    ]
+
+
+def validated(docs):
+    page = Page[Member](items=[Member(**doc) for doc in docs], next_cursor=None)
+    dumped = page.model_dump()
+    return JSONResponse(PAGE_ADAPTER.dump_python(PAGE_ADAPTER.validate_python(dumped), mode="json")).body
+
+
+def trusted(docs):
+    return trusted_page_response(Member, docs, None).body
+
+
+def main():
+    for count in (100, 1_000, 10_000):
+        docs = make_docs(count)
+        assert validated(docs) == trusted(docs)
+        number = max(1, 20_000 // count)
+        slow = min(timeit.repeat(lambda: validated(docs), number=number, repeat=3)) / number
+        fast = min(timeit.repeat(lambda: trusted(docs), number=number, repeat=3)) / number
+        print(f"{count:>6} docs: validated {slow * 1000:8.2f} ms | trusted {fast * 1000:8.2f} ms | {slow / fast:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
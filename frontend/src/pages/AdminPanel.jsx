@@ -60,14 +60,27 @@ const AdminPanel = () => {
     }
   };
 
+  // Follow next_cursor until the paginated endpoint is exhausted
+  const fetchAllPages = async (path) => {
+    const items = [];
+    let cursor = null;
+    do {
+      const query = cursor ? `?limit=500&after=${encodeURIComponent(cursor)}` : '?limit=500';
+      const page = await fetch(`${BACKEND_URL}${path}${query}`).then(r => r.json());
+      items.push(...page.items);
+      cursor = page.next_cursor;
+    } while (cursor);
+    return items;
+  };
+
   const loadData = async () => {
     try {
       const [members, contacts, events, newsletters, reservations] = await Promise.all([
-        fetch(`${BACKEND_URL}/api/members`).then(r => r.json()).catch(() => []),
-        fetch(`${BACKEND_URL}/api/contact`).then(r => r.json()).catch(() => []),
+        fetchAllPages('/api/members').catch(() => []),
+        fetchAllPages('/api/contact').catch(() => []),
         fetch(`${BACKEND_URL}/api/events`).then(r => r.json()).catch(() => []),
-        fetch(`${BACKEND_URL}/api/newsletter/subscribers`).then(r => r.json()).catch(() => []),
-        fetch(`${BACKEND_URL}/api/reservations`).then(r => r.json()).catch(() => [])
+        fetchAllPages('/api/newsletter/subscribers').catch(() => []),
+        fetchAllPages('/api/reservations').catch(() => [])
       ]);
 
       setData({ members, contacts, events, newsletters, reservations });
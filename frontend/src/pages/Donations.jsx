@@ -62,8 +62,47 @@ const Donations = () => {
   const checkReturnFromStripe = () => {
     const sessionId = getUrlParameter('session_id');
     if (sessionId) {
+      watchPaymentStatus(sessionId);
+    }
+  };
+
+  const handlePaymentStatus = (data) => {
+    if (data.payment_status === 'paid') {
+      // Payment successful
+      showSuccessMessage(data.amount, data.currency);
+      return true;
+    } else if (data.payment_status === 'failed') {
+      setError('Le paiement a échoué. Veuillez réessayer avec un autre moyen de paiement.');
+      return true;
+    } else if (data.status === 'expired') {
+      setError('Session de paiement expirée. Veuillez réessayer.');
+      return true;
+    }
+    return false;
+  };
+
+  const watchPaymentStatus = (sessionId) => {
+    if (typeof window.EventSource === 'undefined') {
       pollPaymentStatus(sessionId);
+      return;
     }
+
+    // The server pushes the status once the payment is final
+    const source = new EventSource(`${BACKEND_URL}/api/donations/status/${sessionId}/stream`);
+    source.addEventListener('status', (event) => {
+      if (handlePaymentStatus(JSON.parse(event.data))) {
+        source.close();
+      }
+    });
+    source.addEventListener('timeout', () => {
+      source.close();
+      setError('Vérification du statut de paiement expirée. Veuillez vérifier votre email de confirmation.');
+    });
+    source.onerror = () => {
+      // Fall back to polling if the stream cannot be opened
+      source.close();
+      pollPaymentStatus(sessionId);
+    };
   };
 
   const pollPaymentStatus = async (sessionId, attempts = 0) => {
@@ -83,12 +122,7 @@ const Donations = () => {
 
       const data = await response.json();
       
-      if (data.payment_status === 'paid') {
-        // Payment successful
-        showSuccessMessage(data.amount, data.currency);
-        return;
-      } else if (data.status === 'expired') {
-        setError('Session de paiement expirée. Veuillez réessayer.');
+      if (handlePaymentStatus(data)) {
         return;
       }
 
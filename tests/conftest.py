@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("STRIPE_API_KEY", "sk_test_dummy")
+# Run offline against the in-memory engine unless told to use a real mongod
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+
+@pytest.fixture
+def run_with_db():
+    """Run a coroutine factory against a throwaway database with indexes applied"""
+    from pymongo.errors import ServerSelectionTimeoutError
+
+    from indexes import ensure_indexes
+    from storage import create_client
+
+    def run(scenario):
+        async def runner():
+            client = create_client()
+            if os.environ["STORAGE_BACKEND"] == "mongo":
+                try:
+                    await client.admin.command("ping")
+                except ServerSelectionTimeoutError:
+                    client.close()
+                    pytest.skip("MongoDB is not reachable")
+            db = client[f"test_{uuid.uuid4().hex[:12]}"]
+            try:
+                await ensure_indexes(db)
+                return await scenario(db)
+            finally:
+                await client.drop_database(db.name)
+                client.close()
+
+        return asyncio.run(runner())
+
+    return run
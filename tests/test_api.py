@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from cache import LocalCacheBackend
+from member_counter import COUNTERS_COLLECTION, adjust_active_members, reconcile_active_members
+from memory_store import MemoryClient
+
+
+@pytest.fixture
+def client(monkeypatch):
+    db = MemoryClient()["api_test"]
+    monkeypatch.setattr(server, "db", db)
+    monkeypatch.setattr(server.donation_service, "db", db)
+    monkeypatch.setattr(server.donation_service.webhook_queue, "db", db)
+    server.user_cache.clear()
+    # Cached entries from earlier tests belong to another database
+    monkeypatch.setattr(server.shared_cache, "backend", LocalCacheBackend())
+    with TestClient(server.app) as test_client:
+        yield test_client
+
+
+def register(client, email="ana@example.com", username="ana"):
+    response = client.post("/api/auth/register", json={
+        "email": email, "username": username, "password": "secret123",
+        "first_name": "Ana", "last_name": "Pérez",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def admin_headers(client):
+    register(client, email="admin@example.com", username="admin")
+    asyncio.run(server.db.users.update_one({"username": "admin"}, {"$set": {"role": "admin"}}))
+    token = client.post("/api/auth/login", json={"email": "admin@example.com", "password": "secret123"}).json()
+    return {"Authorization": f"Bearer {token['access_token']}"}
+
+
+def test_register_login_and_profile(client):
+    register(client)
+    assert client.post("/api/auth/register", json={
+        "email": "ana@example.com", "username": "other", "password": "x", "first_name": "A", "last_name": "P",
+    }).json() == {"detail": "Email already registered"}
+
+    login = client.post("/api/auth/login", json={"email": "ana@example.com", "password": "secret123"})
+    assert login.status_code == 200
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    assert client.get("/api/auth/me", headers=headers).json()["username"] == "ana"
+    updated = client.put("/api/auth/profile", json={"bio": "Chorale"}, headers=headers).json()
+    assert updated["bio"] == "Chorale"
+    assert client.get("/api/auth/me", headers=headers).json()["bio"] == "Chorale"
+
+
+def test_members_pages_and_count(client):
+    for i in range(5):
+        response = client.post("/api/members/register", json={
+            "name": f"Membre {i}", "email": f"membre{i}@example.com", "phone": "809-555-0101",
+        })
+        assert response.status_code == 200
+    assert client.get("/api/members/count").json() == {"total": 5, "registered": 5}
+
+    first = client.get("/api/members", params={"limit": 3}).json()
+    second = client.get("/api/members", params={"limit": 3, "after": first["next_cursor"]}).json()
+    assert [m["name"] for m in first["items"] + second["items"]] == [f"Membre {i}" for i in range(5)]
+    assert second["next_cursor"] is None
+
+    export = client.get("/api/members/export", params={"format": "ndjson"}, headers=admin_headers(client))
+    assert export.headers["content-type"] == "application/x-ndjson"
+    assert len(export.text.splitlines()) == 5
+
+
+def test_events_and_donation_checkout(client):
+    event = client.post("/api/events", json={
+        "title": "Conférence", "date": "2025-03-15", "time": "18:00",
+        "description": "Conférence annuelle", "location": "Sanctuaire",
+    }).json()
+    assert [e["id"] for e in client.get("/api/events").json()] == [event["id"]]
+    assert client.get(f"/api/events/{event['id']}").json()["title"] == "Conférence"
+    assert client.get("/api/events/missing").status_code == 404
+
+    checkout = client.post("/api/donations/checkout", json={
+        "package_id": "support", "donor_email": "ana@example.com", "origin_url": "https://example.org",
+    })
+    assert checkout.status_code == 200
+    status = client.get(f"/api/donations/status/{checkout.json()['session_id']}")
+    assert status.status_code == 200
+
+
+def test_events_are_cached_until_an_event_is_created(client):
+    def create(title, date):
+        return client.post("/api/events", json={
+            "title": title, "date": date, "time": "18:00", "description": "Culte", "location": "Sanctuaire",
+        }).json()
+
+    first = create("Pâques", "2025-04-20")
+    listing = client.get("/api/events")
+    etag = listing.headers["etag"]
+    assert listing.headers["cache-control"] == "no-cache"
+    assert client.get("/api/events", headers={"If-None-Match": etag}).status_code == 304
+
+    detail = client.get(f"/api/events/{first['id']}")
+    assert detail.json() == listing.json()[0]
+    assert client.get(f"/api/events/{first['id']}", headers={"If-None-Match": detail.headers["etag"]}).status_code == 304
+
+    # create_event invalidates, so the list is rebuilt with a new ETag
+    second = create("Noël", "2025-12-25")
+    refreshed = client.get("/api/events", headers={"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert [e["id"] for e in refreshed.json()] == [first["id"], second["id"]]
+
+
+def test_member_counter_tracks_deactivation_and_reconciles(client):
+    members = [
+        client.post("/api/members/register", json={
+            "name": f"Membre {i}", "email": f"membre{i}@example.com", "phone": "809-555-0101",
+        }).json()
+        for i in range(3)
+    ]
+    headers = admin_headers(client)
+
+    path = f"/api/members/{members[0]['id']}/deactivate"
+    assert client.put(path).status_code in (401, 403)
+    assert client.put(path, headers=headers).status_code == 200
+    assert client.put(path, headers=headers).status_code == 404
+    assert client.get("/api/members/count").json()["total"] == 2
+
+    # Drift (e.g. a member inserted directly) is repaired by reconciliation
+    asyncio.run(server.db.members.update_one({"id": members[1]["id"]}, {"$set": {"active": False}}))
+    assert client.get("/api/members/count").json()["total"] == 2
+    assert asyncio.run(reconcile_active_members(server.db)) == 1
+    assert client.get("/api/members/count").json()["total"] == 1
+
+
+def test_counter_failure_does_not_fail_registration(client, monkeypatch):
+    counters = server.db[COUNTERS_COLLECTION]
+
+    async def counter_down(*args, **kwargs):
+        raise ConnectionError("counter down")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(counters, "update_one", counter_down)
+        response = client.post("/api/members/register", json={"name": "Ana", "email": "ana@example.com", "phone": "809-555-0101"})
+    assert response.status_code == 200
+    # The member exists and the next reconciliation counts it
+    assert asyncio.run(server.db.members.count_documents({"active": True})) == 1
+    assert asyncio.run(reconcile_active_members(server.db)) == 1
+    assert client.get("/api/members/count").json()["total"] == 1
+
+
+def test_exports_require_an_admin(client):
+    client.post("/api/members/register", json={"name": "Ana", "email": "ana@example.com", "phone": "809-555-0101"})
+    token = register(client, email="member@example.com", username="member")["access_token"]
+    admin = admin_headers(client)
+    for path in ("/api/members/export", "/api/reservations/export", "/api/contact/export", "/api/newsletter/subscribers/export"):
+        assert client.get(path).status_code in (401, 403)
+        assert client.get(path, headers={"Authorization": f"Bearer {token}"}).status_code == 403
+        assert client.get(path, headers=admin).status_code == 200
+    assert "ana@example.com" in client.get("/api/members/export", headers=admin).text
+
+
+def test_reconcile_keeps_increments_made_while_counting(run_with_db):
+    async def scenario(db):
+        await db.members.insert_many([{"id": str(i), "email": f"m{i}@example.com", "active": True} for i in range(3)])
+        await db[COUNTERS_COLLECTION].insert_one({"_id": "active_members", "value": 7})
+        count_documents = db.members.count_documents
+        registered = False
+
+        async def count_then_register(*args, **kwargs):
+            nonlocal registered
+            actual = await count_documents(*args, **kwargs)
+            if not registered:
+                # A registration commits between the count and the reset
+                registered = True
+                await db.members.insert_one({"id": "late", "email": "late@example.com", "active": True})
+                await adjust_active_members(db, 1)
+            return actual
+
+        db.members.count_documents = count_then_register
+        reconciled = await reconcile_active_members(db)
+        return reconciled, await db[COUNTERS_COLLECTION].find_one({"_id": "active_members"})
+
+    reconciled, counter = run_with_db(scenario)
+    assert reconciled == counter["value"] == 4
@@ -0,0 +1,95 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import cache
+from checkout_sweeper import acquire_sweep_lease, sweep_stale_checkouts
+from donation_models import CheckoutRequest
+from donation_service import DonationService
+from payment_provider import CheckoutStatus, MockPaymentProvider
+
+REQUEST = CheckoutRequest(package_id="support", donor_email="ana@example.com", origin_url="https://example.org")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+
+
+class ScriptedProvider(MockPaymentProvider):
+    """Reports a scripted status per session and tracks concurrent lookups"""
+
+    def __init__(self):
+        self.script = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def get_checkout_status(self, session_id):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            outcome = self.script.get(session_id, "open")
+            if outcome == "error":
+                raise RuntimeError("provider unavailable")
+            return CheckoutStatus(
+                status="complete" if outcome == "paid" else outcome,
+                payment_status="paid" if outcome == "paid" else "unpaid",
+                amount_total=5000,
+                currency="usd",
+            )
+        finally:
+            self.in_flight -= 1
+
+
+def test_sweep_settles_stale_checkouts_in_batches(run_with_db):
+    now = datetime.utcnow()
+    ages = {"expired": 2, "paid": 2, "error": 2, "open": 2, "abandoned": 30, "fresh": 0}
+
+    async def scenario(db):
+        provider = ScriptedProvider()
+        service = DonationService(db, provider=provider)
+        sessions = {}
+        for name, hours in ages.items():
+            response = await service.create_checkout_session(REQUEST)
+            sessions[name] = response
+            await db.payment_transactions.update_one(
+                {"session_id": response.session_id},
+                {"$set": {"created_at": now - timedelta(hours=hours, minutes=len(sessions))}}
+            )
+        for name in ("expired", "paid", "error"):
+            provider.script[sessions[name].session_id] = name
+
+        totals = await sweep_stale_checkouts(service, batch_size=2, concurrency=2, now=now)
+        states = {}
+        for name, response in sessions.items():
+            transaction = await db.payment_transactions.find_one({"session_id": response.session_id})
+            donation = await db.donations.find_one({"id": response.donation_id})
+            states[name] = (transaction["status"], donation["status"])
+        rollup = await db.donation_rollups.find_one({"_id": "all"})
+        return totals, states, rollup, provider.max_in_flight
+
+    totals, states, rollup, max_in_flight = run_with_db(scenario)
+    assert totals == {"checked": 4, "expired": 2, "completed": 1}
+    assert states == {
+        "expired": ("expired", "expired"),
+        "paid": ("completed", "completed"),
+        "error": ("pending", "pending"),
+        "open": ("pending", "pending"),
+        "abandoned": ("expired", "expired"),
+        "fresh": ("pending", "pending"),
+    }
+    assert rollup["count"] == 1
+    assert max_in_flight <= 2
+
+
+def test_sweep_lease_is_held_by_one_worker(run_with_db):
+    async def scenario(db):
+        return [
+            await acquire_sweep_lease(db, "a", 60),
+            await acquire_sweep_lease(db, "b", 60),
+            await acquire_sweep_lease(db, "a", 60),
+        ]
+
+    assert run_with_db(scenario) == [True, False, True]
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import cache
+from donation_models import CheckoutRequest
+from donation_service import DonationService
+from memory_store import MemoryClient
+
+REQUEST = CheckoutRequest(package_id="support", donor_email="ana@example.com", origin_url="https://example.org")
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+
+
+def test_checkout_writes_each_document_once(run_with_db):
+    async def scenario(db):
+        async def no_update(*args, **kwargs):
+            raise AssertionError("checkout should not update the donation after inserting it")
+
+        db.donations.update_one = no_update
+        response = await DonationService(db).create_checkout_session(REQUEST)
+        donation = await db.donations.find_one({"id": response.donation_id})
+        transaction = await db.payment_transactions.find_one({"session_id": response.session_id})
+        return response, donation, transaction
+
+    response, donation, transaction = run_with_db(scenario)
+    assert donation["payment_session_id"] == response.session_id
+    assert transaction["donation_id"] == response.donation_id
+    assert transaction["amount"] == donation["amount"] == 50.0
+
+
+def test_failed_transaction_insert_leaves_no_donation(run_with_db):
+    async def scenario(db):
+        async def fail(*args, **kwargs):
+            raise RuntimeError("write concern timeout")
+
+        db.payment_transactions.insert_one = fail
+        with pytest.raises(HTTPException) as raised:
+            await DonationService(db).create_checkout_session(REQUEST)
+        return raised.value.status_code, await db.donations.count_documents({})
+
+    assert run_with_db(scenario) == (500, 0)
+
+
+def test_replica_sets_write_both_documents_in_one_transaction():
+    class FakeSession:
+        def __init__(self):
+            self.callbacks = 0
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def with_transaction(self, callback):
+            self.callbacks += 1
+            await callback(self)
+
+    session = FakeSession()
+    client = MemoryClient()
+    db = client["checkout_tx"]
+    seen = []
+
+    async def hello(command, *args, **kwargs):
+        return {"ok": 1.0, "setName": "rs0"}
+
+    async def start_session():
+        return session
+
+    def recording(collection):
+        insert_one = collection.insert_one
+
+        async def insert(document, session=None, **kwargs):
+            seen.append((collection.name, session))
+            return await insert_one(document)
+        return insert
+
+    db.command = hello
+    client.start_session = start_session
+    db.donations.insert_one = recording(db.donations)
+    db.payment_transactions.insert_one = recording(db.payment_transactions)
+
+    response = asyncio.run(DonationService(db).create_checkout_session(REQUEST))
+    assert session.callbacks == 1
+    assert seen == [("donations", session), ("payment_transactions", session)]
+    assert asyncio.run(db.donations.find_one({"id": response.donation_id})) is not None
@@ -0,0 +1,100 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from compression import CompressionMiddleware, choose_encoding
+from http_cache import cached_response
+
+BODY = b'{"items":[' + b",".join(b'{"name":"Membre %d"}' % i for i in range(200)) + b"]}"
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+
+    @app.get("/large")
+    async def large():
+        return Response(BODY, media_type="application/json", headers={"ETag": '"large-v1"'})
+
+    @app.get("/cached/{size}")
+    async def cached(size: int, request: Request):
+        return cached_response(request, BODY if size else b'{"total":5}', f'"cached-{size}"', "no-cache")
+
+    @app.get("/small")
+    async def small():
+        return Response(b'{"total":5}', media_type="application/json")
+
+    @app.get("/image")
+    async def image():
+        return Response(BODY, media_type="image/png")
+
+    @app.get("/export")
+    async def export():
+        async def rows():
+            for i in range(100):
+                yield b"Membre %d,membre%d@example.com\n" % (i, i)
+        return StreamingResponse(rows(), media_type="text/csv")
+
+    app.add_middleware(CompressionMiddleware, min_size=500)
+    return app
+
+
+def test_choose_encoding_honours_preferences():
+    assert choose_encoding("gzip, deflate, br", ("br", "gzip")) == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0.5", ("br", "gzip")) == "gzip"
+    assert choose_encoding("br;q=0, *", ("br", "gzip")) == "gzip"
+    assert choose_encoding("identity", ("br", "gzip")) is None
+    assert choose_encoding("", ("br", "gzip")) is None
+
+
+def test_large_responses_are_gzipped_once_per_etag(app):
+    middleware_client = TestClient(app)
+    response = middleware_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"large-v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == BODY
+    assert int(response.headers["content-length"]) < len(BODY) / 3
+
+    middleware = app.middleware_stack
+    while not isinstance(middleware, CompressionMiddleware):
+        middleware = middleware.app
+    middleware_client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert middleware.cache.stats()["hits"] == 1
+
+
+def test_brotli_is_preferred_when_available(app):
+    pytest.importorskip("brotli")
+    response = TestClient(app).get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.content == BODY
+
+
+def test_small_binary_and_unrequested_responses_are_untouched(app):
+    client = TestClient(app)
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/image", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/large", headers={"Accept-Encoding": "identity"}).headers
+
+
+def test_streaming_responses_are_compressed_incrementally(app):
+    with TestClient(app).stream("GET", "/export", headers={"Accept-Encoding": "gzip"}) as response:
+        assert response.headers["content-encoding"] == "gzip"
+        assert "content-length" not in response.headers
+        raw = b"".join(response.iter_raw())
+    lines = gzip.decompress(raw).splitlines()
+    assert len(lines) == 100 and lines[-1] == b"Membre 99,membre99@example.com"
+
+
+@pytest.mark.parametrize("size", [0, 1])
+def test_not_modified_repeats_the_weak_etag(app, size):
+    client = TestClient(app)
+    headers = {"Accept-Encoding": "gzip"}
+    first = client.get(f"/cached/{size}", headers=headers)
+    again = client.get(f"/cached/{size}", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert first.headers["etag"] == again.headers["etag"] == f'W/"cached-{size}"'
+    assert again.headers["vary"] == "Accept-Encoding"
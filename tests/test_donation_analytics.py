@@ -0,0 +1,95 @@
+import random
+import statistics
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import cache
+from donation_analytics import grouped_percentile, load_frame, sort_within_groups, summarize
+from donation_models import Donation
+from donation_service import DonationService
+
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+
+
+def synthetic_donations(count=300):
+    rng = random.Random(7)
+    return [
+        Donation(
+            amount=float(rng.choice([10, 25, 50, 100, 250])),
+            donation_type=rng.choice(["one_time", "monthly", "yearly"]),
+            anonymous=rng.random() < 0.2,
+            status="completed" if i % 10 else "pending",
+            completed_at=START + timedelta(hours=rng.randrange(24 * 90)),
+        ).model_dump()
+        for i in range(count)
+    ]
+
+
+def test_summary_matches_a_plain_python_computation(run_with_db):
+    donations = synthetic_donations()
+    completed = [d for d in donations if d["status"] == "completed"]
+
+    async def scenario(db):
+        await db.donations.insert_many(donations)
+        return summarize(await load_frame(db, START, START + timedelta(days=90), batch_size=50), "month")
+
+    summary = run_with_db(scenario)
+    amounts = [d["amount"] for d in completed]
+    assert summary["total_count"] == len(completed)
+    assert summary["total_amount"] == sum(amounts)
+    assert summary["median"] == statistics.median(amounts)
+    assert summary["p90"] == round(float(np.percentile(amounts, 90)), 2)
+
+    assert [b["start"] for b in summary["buckets"]] == ["2025-01-01", "2025-02-01", "2025-03-01"]
+    january = [d for d in completed if d["completed_at"].month == 1]
+    assert summary["buckets"][0]["count"] == len(january)
+    assert summary["buckets"][0]["anonymous_amount"] == sum(d["amount"] for d in january if d["anonymous"])
+    assert summary["by_type"]["monthly"]["count"] == sum(d["donation_type"] == "monthly" for d in completed)
+    assert summary["by_anonymity"]["named"]["amount"] == sum(d["amount"] for d in completed if not d["anonymous"])
+
+
+def test_weekly_buckets_start_on_monday_and_results_are_cached(run_with_db):
+    async def scenario(db):
+        await db.donations.insert_many(synthetic_donations(50))
+        service = DonationService(db)
+        end = START + timedelta(days=90)
+        weekly = await service.get_donation_analytics(START, end, "week")
+
+        await db.donations.insert_many(synthetic_donations(50))
+        assert await service.get_donation_analytics(START, end, "week") == weekly
+        return weekly
+
+    weekly = run_with_db(scenario)
+    assert all(datetime.fromisoformat(b["start"]).weekday() == 0 for b in weekly["buckets"])
+    assert sum(b["count"] for b in weekly["buckets"]) == weekly["total_count"]
+
+
+def test_empty_range_returns_zeroes(run_with_db):
+    async def scenario(db):
+        return summarize(await load_frame(db, START, START + timedelta(days=7)))
+
+    summary = run_with_db(scenario)
+    assert summary["total_count"] == 0 and summary["buckets"] == [] and summary["median"] == 0.0
+
+
+def test_grouped_percentiles_match_numpy():
+    rng = np.random.default_rng(3)
+    amounts = rng.gamma(2.0, 40.0, 5000).round(2)
+    codes = rng.integers(0, 12, 5000)
+    codes[codes == 4] = 5  # an empty group
+    counts = np.bincount(codes, minlength=12)
+    ordered = sort_within_groups(amounts, codes)
+    for q in (0.5, 0.9):
+        result = grouped_percentile(ordered, counts, q)
+        for group in range(12):
+            if counts[group]:
+                assert result[group] == pytest.approx(np.percentile(amounts[codes == group], q * 100))
+            else:
+                assert np.isnan(result[group])
@@ -0,0 +1,82 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+import cache
+from donation_models import Donation
+from donation_rollups import (
+    ROLLUPS_COLLECTION,
+    backfill_rollups,
+    compute_rollups,
+    read_range,
+    rebuild_rollups,
+    record_completion,
+)
+from donation_service import DonationService
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+
+
+def buckets_without_timestamps(buckets):
+    return sorted(({k: v for k, v in b.items() if k != "updated_at"} for b in buckets), key=lambda b: b["_id"])
+
+
+def test_completions_are_counted_once_and_match_a_rebuild(run_with_db):
+    async def scenario(db):
+        service = DonationService(db)
+        donations = [Donation(amount=10.0 * (i % 5 + 1), email=f"don{i}@example.com") for i in range(50)]
+        await db.donations.insert_many([d.model_dump() for d in donations])
+
+        # Every donation is completed twice concurrently (e.g. webhook + status poll)
+        results = await asyncio.gather(*(service.complete_donation(d.id) for d in donations * 2))
+        assert results.count(True) == 50
+
+        stats = await service.get_donation_stats()
+        expected_total = sum(d.amount for d in donations)
+        assert stats["total_amount"] == stats["monthly_amount"] == expected_total
+        assert stats["total_count"] == stats["monthly_count"] == 50
+
+        incremental = await db[ROLLUPS_COLLECTION].find().to_list(None)
+        assert buckets_without_timestamps(incremental) == buckets_without_timestamps(await compute_rollups(db))
+
+        today = datetime.utcnow().date()
+        ranged = await service.get_donation_stats(today, today)
+        assert ranged["range"] == {"start": today.isoformat(), "end": today.isoformat(), "amount": expected_total, "count": 50}
+
+    run_with_db(scenario)
+
+
+def test_date_ranges_sum_day_buckets(run_with_db):
+    async def scenario(db):
+        for day, amount in [(datetime(2025, 1, 31, 23), 25.0), (datetime(2025, 2, 1, 9), 50.0), (datetime(2025, 2, 14), 100.0)]:
+            await record_completion(db, amount, day)
+
+        assert (await read_range(db, date(2025, 2, 1), date(2025, 2, 28)))["amount"] == 150.0
+        assert (await read_range(db, date(2025, 1, 1), date(2025, 2, 1)))["count"] == 2
+        assert (await read_range(db, date(2025, 3, 1), date(2025, 3, 31)))["count"] == 0
+        months = await db[ROLLUPS_COLLECTION].find({"period": "month"}).to_list(None)
+        assert {m["key"]: m["total"] for m in months} == {"2025-01": 25.0, "2025-02": 150.0}
+
+    run_with_db(scenario)
+
+
+def test_rebuild_repairs_drift_and_backfill_only_fills_empty(run_with_db):
+    async def scenario(db):
+        donation = Donation(amount=40.0, status="completed", completed_at=datetime(2025, 3, 2))
+        await db.donations.insert_one(donation.model_dump())
+
+        assert await backfill_rollups(db) == 3
+        assert await backfill_rollups(db) == 0
+
+        await db[ROLLUPS_COLLECTION].update_one({"_id": "all"}, {"$inc": {"total": 999}})
+        await db[ROLLUPS_COLLECTION].insert_one({"_id": "day:2024-01-01", "period": "day", "key": "2024-01-01", "total": 5, "count": 1})
+        await rebuild_rollups(db)
+        rollups = {r["_id"]: r for r in await db[ROLLUPS_COLLECTION].find().to_list(None)}
+        assert set(rollups) == {"all", "month:2025-03", "day:2025-03-02"}
+        assert rollups["all"]["total"] == 40.0
+
+    run_with_db(scenario)
@@ -0,0 +1,117 @@
+import asyncio
+import random
+from datetime import datetime
+
+import pytest
+
+import cache
+import donation_service
+from auth_models import User
+from donation_models import Donation
+from donation_rollups import read_stats
+from donation_service import DonationService
+from donor_ledger import LEDGER_COLLECTION, get_ledger, reconcile_ledgers, record_donation
+from recurring_pledges import PLEDGES_COLLECTION
+
+DONATIONS = 1000
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+
+
+def test_concurrent_completions_keep_totals_exact(run_with_db):
+    rng = random.Random(11)
+
+    async def scenario(db):
+        users = [User(email=f"donor{i}@example.com", username=f"donor{i}", first_name="D", last_name=str(i)) for i in range(10)]
+        await db.users.insert_many([u.model_dump() for u in users])
+        donations = [
+            Donation(user_id=rng.choice(users).id, amount=float(rng.randint(1, 500)))
+            for _ in range(DONATIONS)
+        ]
+        await db.donations.insert_many([d.model_dump() for d in donations])
+
+        service = DonationService(db)
+        # Every donation completes twice at once, e.g. a webhook racing a status poll
+        await asyncio.gather(*(service.complete_donation(d.id) for d in donations + donations))
+
+        year = str(datetime.utcnow().year)
+        for user in users:
+            own = [d.amount for d in donations if d.user_id == user.id]
+            ledger = await get_ledger(db, user.id)
+            assert ledger["total"] == pytest.approx(sum(own))
+            assert ledger["count"] == len(own)
+            assert ledger["years"][year] == {"total": pytest.approx(sum(own)), "count": len(own)}
+            stored = await db.users.find_one({"id": user.id})
+            assert stored["donation_total"] == pytest.approx(sum(own))
+
+    run_with_db(scenario)
+
+
+def test_reconcile_recomputes_ledgers_and_user_totals(run_with_db):
+    async def scenario(db):
+        user = User(email="ana@example.com", username="ana", first_name="Ana", last_name="P", donation_total=12345.0)
+        ghost = User(email="old@example.com", username="old", first_name="O", last_name="D", donation_total=50.0)
+        await db.users.insert_many([user.model_dump(), ghost.model_dump()])
+        await db.donations.insert_many([
+            Donation(user_id=user.id, amount=100.0, status="completed", completed_at=datetime(2024, 12, 24)).model_dump(),
+            Donation(user_id=user.id, amount=40.0, status="completed", completed_at=datetime(2025, 1, 5)).model_dump(),
+            Donation(user_id=user.id, amount=60.0, status="completed", completed_at=datetime(2025, 4, 20)).model_dump(),
+            Donation(user_id=user.id, amount=999.0, status="pending").model_dump(),
+        ])
+        await db[LEDGER_COLLECTION].insert_one({"_id": ghost.id, "total": 50.0, "count": 1, "years": {}})
+
+        assert await reconcile_ledgers(db, batch_size=1) == 1
+        assert await get_ledger(db, user.id) == {
+            "total": 200.0, "count": 3,
+            "years": {"2024": {"total": 100.0, "count": 1}, "2025": {"total": 100.0, "count": 2}},
+        }
+        assert (await db.users.find_one({"id": user.id}))["donation_total"] == 200.0
+        assert (await db.users.find_one({"id": ghost.id}))["donation_total"] == 0.0
+        assert await db[LEDGER_COLLECTION].find_one({"_id": ghost.id}) is None
+
+    run_with_db(scenario)
+
+
+def test_failed_completion_effects_finish_on_retry(run_with_db, monkeypatch):
+    async def scenario(db):
+        user = User(email="ana@example.com", username="ana", first_name="Ana", last_name="P")
+        await db.users.insert_one(user.model_dump())
+        donation = Donation(user_id=user.id, amount=25.0, donation_type="monthly")
+        await db.donations.insert_one(donation.model_dump())
+
+        failures = [ConnectionError("ledger down")]
+
+        async def flaky_record_donation(*args, **kwargs):
+            if failures:
+                raise failures.pop()
+            return await record_donation(*args, **kwargs)
+
+        monkeypatch.setattr(donation_service, "record_donation", flaky_record_donation)
+        service = DonationService(db)
+        # The ledger error reaches the caller so that it retries
+        with pytest.raises(ConnectionError):
+            await service.complete_donation(donation.id, customer_id="cus_1")
+        assert (await get_ledger(db, user.id))["count"] == 0
+        assert await db[PLEDGES_COLLECTION].count_documents({}) == 0
+
+        # Within the lease a concurrent caller leaves the effects to the first one
+        assert await service.complete_donation(donation.id) is False
+        assert (await get_ledger(db, user.id))["count"] == 0
+
+        # Once the lease expires the next retry finishes the ledger and the pledge
+        await db.donations.update_one({"id": donation.id}, {"$set": {"effects_lease_until": datetime.utcnow()}})
+        assert await service.complete_donation(donation.id) is False
+        assert await service.complete_donation(donation.id) is False
+
+        ledger = await get_ledger(db, user.id)
+        assert (ledger["total"], ledger["count"]) == (25.0, 1)
+        assert (await read_stats(db))["total_count"] == 1
+        pledge = await db[PLEDGES_COLLECTION].find_one({"id": donation.id})
+        assert pledge["customer"] == "cus_1"
+        stored = await db.donations.find_one({"id": donation.id})
+        assert stored["effects_pending"] == []
+
+    run_with_db(scenario)
@@ -0,0 +1,47 @@
+import asyncio
+import json
+
+from cache import LocalCacheBackend, SharedCache
+from events_cache import EventsCache
+from memory_store import MemoryClient
+from server import Event
+
+
+def make_event(title, date):
+    return Event(title=title, date=date, time="20:00", description="Prière", location="Sanctuaire").model_dump()
+
+
+def test_list_is_served_from_cache_until_invalidated():
+    async def scenario():
+        db = MemoryClient()["events_cache_test"]
+        cache = EventsCache(SharedCache(LocalCacheBackend()))
+        await db.events.insert_one(make_event("Veillée", "2025-05-01"))
+        body, etag = await cache.event_list(db, Event)
+
+        await db.events.insert_one(make_event("Baptêmes", "2025-06-01"))
+        assert await cache.event_list(db, Event) == (body, etag)
+
+        await cache.invalidate()
+        refreshed, new_etag = await cache.event_list(db, Event)
+        assert [e["title"] for e in json.loads(refreshed)] == ["Veillée", "Baptêmes"]
+        assert new_etag != etag
+
+    asyncio.run(scenario())
+
+
+def test_missing_events_are_not_cached():
+    async def scenario():
+        db = MemoryClient()["events_cache_test"]
+        backend = LocalCacheBackend()
+        cache = EventsCache(SharedCache(backend))
+        event = make_event("Veillée", "2025-05-01")
+        for _ in range(20):
+            assert await cache.event(db, Event, f"made-up-{_}") is None
+        assert await cache.event(db, Event, event["id"]) is None
+        assert len(backend._entries) == 0
+
+        await db.events.insert_one(event)
+        body, _ = await cache.event(db, Event, event["id"])
+        assert Event.model_validate_json(body).id == event["id"]
+
+    asyncio.run(scenario())
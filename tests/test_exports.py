@@ -0,0 +1,90 @@
+import asyncio
+import json
+import subprocess
+import sys
+import textwrap
+from datetime import datetime
+from pathlib import Path
+
+from exports import stream_csv, stream_ndjson
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+FIELDS = ["id", "name", "email", "registration_date", "active"]
+
+# Drains an export of N synthetic documents and reports the process's peak RSS
+EXPORT_SCRIPT = textwrap.dedent(
+    """
+    import asyncio, resource, sys
+    from datetime import datetime
+    sys.path.insert(0, sys.argv[3])
+    from exports import stream_csv, stream_ndjson
+
+    async def documents(count):
+        for i in range(count):
+            yield {"id": f"member-{i}", "name": f"Membre {i}", "email": f"membre{i}@example.com",
+                   "registration_date": datetime(2025, 1, 1), "active": True}
+
+    async def drain(count, render):
+        total = 0
+        async for chunk in render(documents(count), ["id", "name", "email", "registration_date", "active"]):
+            total += len(chunk)
+        return total
+
+    render = stream_csv if sys.argv[2] == "csv" else stream_ndjson
+    written = asyncio.run(drain(int(sys.argv[1]), render))
+    print(written, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    """
+)
+
+
+async def documents(rows):
+    for row in rows:
+        yield row
+
+
+async def collect(render, rows):
+    return b"".join([chunk async for chunk in render(documents(rows), FIELDS)]).decode()
+
+
+def test_csv_and_ndjson_rendering():
+    rows = [{"id": "1", "name": "José, Jr.", "email": "jose@example.com",
+             "registration_date": datetime(2025, 1, 2, 3, 4, 5), "active": True}]
+    assert asyncio.run(collect(stream_csv, rows)).splitlines() == [
+        "id,name,email,registration_date,active",
+        '1,"José, Jr.",jose@example.com,2025-01-02T03:04:05,True',
+    ]
+    line = asyncio.run(collect(stream_ndjson, rows)).strip()
+    assert json.loads(line) == {"id": "1", "name": "José, Jr.", "email": "jose@example.com",
+                                "registration_date": "2025-01-02T03:04:05", "active": True}
+
+
+def test_csv_escapes_formula_values():
+    rows = [{"id": "1", "name": '=HYPERLINK("http://evil.example","Click")', "email": "@SUM(A1)",
+             "registration_date": "-2+3", "active": -5},
+            {"id": "2", "name": "+1 555", "email": "\tx", "registration_date": ["=1", "b"], "active": None}]
+    lines = asyncio.run(collect(stream_csv, rows)).splitlines()
+    assert lines[1:] == [
+        '1,"\'=HYPERLINK(""http://evil.example"",""Click"")",\'@SUM(A1),\'-2+3,-5',
+        "2,'+1 555,'\tx,'=1;b,",
+    ]
+    # NDJSON is data, not a spreadsheet: values are left as they are
+    line = asyncio.run(collect(stream_ndjson, rows[:1])).splitlines()[0]
+    assert json.loads(line)["name"] == '=HYPERLINK("http://evil.example","Click")'
+
+
+def peak_rss_kb(count, export_format):
+    output = subprocess.run(
+        [sys.executable, "-c", EXPORT_SCRIPT, str(count), export_format, str(BACKEND_DIR)],
+        check=True, capture_output=True, text=True,
+    ).stdout.split()
+    return int(output[0]), int(output[1])
+
+
+def test_peak_rss_stays_flat_as_export_grows():
+    for export_format in ("csv", "ndjson"):
+        small_bytes, small_rss = peak_rss_kb(1_000, export_format)
+        large_bytes, large_rss = peak_rss_kb(200_000, export_format)
+        assert large_bytes > 150 * small_bytes
+        # ~20 MB of output must not show up in the process's peak memory
+        assert large_rss - small_rss < 8 * 1024
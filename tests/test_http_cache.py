@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+
+
+@pytest.fixture
+def client():
+    return TestClient(server.app)
+
+
+@pytest.mark.parametrize("path", ["/api/church", "/api/services", "/api/donations/packages"])
+def test_static_endpoints_revalidate_with_etag(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    # Weakened by the compression middleware, as the client accepts gzip
+    assert etag.startswith('W/"') and response.headers["cache-control"].startswith("public, max-age=")
+    assert client.get(path, headers={"Accept-Encoding": "identity"}).headers["etag"] == etag[2:]
+
+    not_modified = client.get(path, headers={"If-None-Match": f'"stale", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    # Weak comparison: the strong form of the validator matches too
+    assert client.get(path, headers={"If-None-Match": etag[2:]}).status_code == 304
+
+    assert client.get(path, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_static_payloads_match_previous_responses(client):
+    assert client.get("/api/church").json()["name"] == "Iglesia Bautista Yaguita de Pastor"
+    assert [s["id"] for s in client.get("/api/services").json()] == [1, 2, 3, 4]
+    packages = client.get("/api/donations/packages").json()
+    assert packages == [p.model_dump(mode="json") for p in server.donation_service.get_packages()]
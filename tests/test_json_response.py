@@ -0,0 +1,97 @@
+import random
+import uuid
+from datetime import date, datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import serialization
+from auth_models import User, UserRole
+from donation_models import DonationStatus
+from serialization import FastJSONResponse
+from server import EventCategory, Member, MessageStatus
+
+PAYLOADS = [
+    {},
+    [],
+    None,
+    "Iglesia Bautista Yaguita — Santiago, République Dominicaine ✝",
+    {"control": "tab\tnewline\nquote\"backslash\\\x1f\x7f", "slash": "a/b", "sep": "  "},
+    {"nested": {"list": [1, 2.5, True, False, None, [], {}], "emoji": "🙏"}},
+    {"floats": [0.0, -0.0, 0.1, 0.1 + 0.2, 1 / 3, 50.0, 25.5, 1e15, 1e16, 1.5e300, 1e-4, 1e-5, 2.5e-8]},
+    {"ints": [0, -1, 2**53, 2**63 - 1, -(2**63), 2**64 + 1, 10**30]},
+    # True == 1, so the int and bool keys need separate dicts
+    {1: "int key", 2.5: "float key", None: "none key"},
+    {True: "bool key", False: "false key"},
+    {"tuple": (1, 2, 3)},
+    {"total": 1234.56, "registered": 1200},
+    {1e16: "exponent key", -2.5e-8: "negative key", "1e5": "string key", "s": ["1e5", "a,1e5]", "x:-2e-7}"]},
+    1e300,
+    [-1e-5],
+]
+
+ENUMS = [UserRole.ADMIN, DonationStatus.COMPLETED, EventCategory.CONFERENCE, MessageStatus.NEW]
+
+
+def starlette_body(content):
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+@pytest.fixture(params=["orjson", "stdlib"])
+def backend(request, monkeypatch):
+    if request.param == "orjson" and serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(serialization, "JSON_BACKEND", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_primitive_payloads_match_starlette(backend, payload):
+    assert FastJSONResponse(payload).body == JSONResponse(payload).body
+
+
+def test_random_floats_match_starlette(backend):
+    rng = random.Random(7)
+    values = [rng.uniform(-1e6, 1e6) for _ in range(2000)] + [rng.random() * 10 ** rng.randint(-12, 20) for _ in range(2000)]
+    assert FastJSONResponse(values).body == JSONResponse(values).body
+    for value in values[2000::7]:
+        assert FastJSONResponse({"amount": value}).body == JSONResponse({"amount": value}).body
+
+
+def test_uuid_pages_skip_the_stdlib_fallback(monkeypatch):
+    if serialization.orjson is None:
+        pytest.skip("orjson is not installed")
+    monkeypatch.setattr(serialization, "JSON_BACKEND", "orjson")
+    rng = random.Random(3)
+    page = [{"id": str(uuid.UUID(int=rng.getrandbits(128), version=4)), "email": "e1e2@example.com"} for _ in range(500)]
+    expected = JSONResponse(page).body
+    monkeypatch.setattr(serialization, "_stdlib_dumps", None)
+    assert FastJSONResponse(page).body == expected
+
+
+def test_native_types_match_jsonable_encoder(backend):
+    content = {
+        "created_at": datetime(2025, 1, 2, 3, 4, 5, 123000),
+        "midnight": datetime(2025, 1, 2),
+        "day": date(2025, 3, 15),
+        "enums": ENUMS,
+        "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+        "email": Member(name="Ana", email="ana@example.com", phone="1").email,
+    }
+    assert FastJSONResponse(content).body == starlette_body(content)
+
+
+def test_model_payloads_match_fastapi_rendering(backend):
+    user = User(
+        email="ana@example.com", username="ana", first_name="Ana", last_name="Pérez",
+        role=UserRole.ADMIN, donation_total=75.5, last_login=datetime(2025, 5, 1, 9, 30),
+    )
+    content = user.model_dump(mode="json")
+    assert FastJSONResponse(content).body == JSONResponse(content).body
+
+
+def test_nan_is_rejected_like_starlette(monkeypatch):
+    monkeypatch.setattr(serialization, "JSON_BACKEND", "stdlib")
+    with pytest.raises(ValueError):
+        FastJSONResponse({"amount": float("nan")})
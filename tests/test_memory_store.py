@@ -0,0 +1,87 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from pymongo import DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from donation_models import DonationStatus
+from indexes import QUERY_SHAPES, check_query_plans, ensure_indexes
+from memory_store import MemoryClient
+
+
+def run(scenario):
+    return asyncio.run(scenario(MemoryClient()["test"]))
+
+
+def test_find_sort_limit_projection():
+    async def scenario(db):
+        await db.events.insert_many([
+            {"id": "a", "date": "2025-03-15", "title": "Conférence"},
+            {"id": "b", "date": "2025-02-20", "title": "Formation"},
+            {"id": "c", "date": "2025-05-10", "title": "Graduation"},
+        ])
+        return await db.events.find({"date": {"$gte": "2025-03-01"}}, {"_id": 0, "id": 1}).sort("date", 1).limit(5).to_list(5)
+
+    assert run(scenario) == [{"id": "a"}, {"id": "c"}]
+
+
+def test_documents_round_trip_like_bson():
+    async def scenario(db):
+        await db.donations.insert_one({"id": "d1", "status": DonationStatus.COMPLETED,
+                                       "created_at": datetime(2025, 1, 1, 0, 0, 0, 123456)})
+        return await db.donations.find_one({"status": DonationStatus.COMPLETED}, {"_id": 0})
+
+    assert run(scenario) == {"id": "d1", "status": "completed", "created_at": datetime(2025, 1, 1, 0, 0, 0, 123000)}
+
+
+def test_updates_upserts_and_returned_documents():
+    async def scenario(db):
+        await db.counters.update_one({"_id": "members"}, {"$inc": {"value": 1}, "$setOnInsert": {"kind": "count"}}, upsert=True)
+        await db.counters.update_one({"_id": "members"}, {"$inc": {"value": 2}, "$setOnInsert": {"kind": "other"}}, upsert=True)
+        after = await db.counters.find_one_and_update(
+            {"_id": "members"}, {"$set": {"checked": True}}, return_document=ReturnDocument.AFTER
+        )
+        bulk = await db.counters.bulk_write([UpdateOne({"_id": "x"}, {"$set": {"value": 0}}, upsert=True)])
+        return after, bulk.upserted_count
+
+    after, upserted = run(scenario)
+    assert after == {"_id": "members", "value": 3, "kind": "count", "checked": True}
+    assert upserted == 1
+
+
+def test_unique_index_raises_duplicate_key_with_key_pattern():
+    async def scenario(db):
+        await db.users.create_indexes([IndexModel([("email", 1)], name="email_1", unique=True)])
+        await db.users.insert_one({"email": "ana@example.com"})
+        with pytest.raises(DuplicateKeyError) as exc_info:
+            await db.users.insert_one({"email": "ana@example.com"})
+        return exc_info.value.details["keyPattern"]
+
+    assert run(scenario) == {"email": 1}
+
+
+def test_aggregate_match_group_sort():
+    async def scenario(db):
+        await db.donations.insert_many([
+            {"amount": 25.0, "status": "completed", "completed_at": datetime(2025, 1, 5)},
+            {"amount": 50.0, "status": "completed", "completed_at": datetime(2025, 2, 5)},
+            {"amount": 100.0, "status": "completed", "completed_at": datetime(2025, 2, 9)},
+            {"amount": 999.0, "status": "pending", "completed_at": None},
+        ])
+        return await db.donations.aggregate([
+            {"$match": {"status": "completed"}},
+            {"$group": {"_id": {"$month": "$completed_at"}, "total": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+            {"$sort": {"_id": DESCENDING}},
+        ]).to_list(None)
+
+    assert run(scenario) == [{"_id": 2, "total": 150.0, "count": 2}, {"_id": 1, "total": 25.0, "count": 1}]
+
+
+def test_registered_indexes_cover_every_query_shape():
+    async def scenario(db):
+        await ensure_indexes(db)
+        return await check_query_plans(db)
+
+    assert run(scenario) == []
+    assert QUERY_SHAPES
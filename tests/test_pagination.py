@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+
+from pagination import decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trips_datetimes():
+    moment = datetime(2025, 3, 15, 18, 0, 0, 123000)
+    assert decode_cursor(encode_cursor(moment, "abc")) == (moment, "abc")
+
+
+def test_malformed_cursor_is_a_400():
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor("not-a-cursor")
+    assert exc_info.value.status_code == 400
+
+
+def test_walking_pages_visits_every_document_once(run_with_db):
+    start = datetime(2025, 1, 1)
+    # Pairs share a timestamp so the id tie-breaker is exercised
+    docs = [{"id": f"m{i:04d}", "created_at": start + timedelta(minutes=i // 2)} for i in range(250)]
+
+    async def scenario(db):
+        await db.contact_messages.insert_many(docs)
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = await paginate(db.contact_messages, {}, "created_at", DESCENDING, 40, cursor)
+            seen.extend(doc["id"] for doc in page)
+            pages += 1
+            if cursor is None:
+                return seen, pages
+
+    seen, pages = run_with_db(scenario)
+    assert seen == [doc["id"] for doc in reversed(docs)]
+    assert pages == 7
+
+
+@pytest.mark.parametrize("direction", [ASCENDING, DESCENDING])
+def test_documents_missing_the_sort_field_are_paged(run_with_db, direction):
+    start = datetime(2025, 1, 1)
+    # Legacy documents without created_at (or with null) sort before every value
+    docs = [{"id": f"old{i}"} for i in range(5)] + [{"id": "null", "created_at": None}]
+    docs += [{"id": f"m{i:02d}", "created_at": start + timedelta(minutes=i)} for i in range(10)]
+
+    async def scenario(db):
+        await db.contact_messages.insert_many(docs)
+        seen, cursor = [], None
+        while True:
+            page, cursor = await paginate(db.contact_messages, {}, "created_at", direction, 4, cursor)
+            seen.extend(doc["id"] for doc in page)
+            if cursor is None:
+                return seen
+
+    expected = sorted((doc["id"] for doc in docs[:6])) + [doc["id"] for doc in docs[6:]]
+    assert run_with_db(scenario) == (expected if direction == ASCENDING else expected[::-1])
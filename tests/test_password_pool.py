@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from auth_utils import PasswordHashPool, get_password_hash, verify_password
+
+
+def test_pool_hashes_and_verifies():
+    pool = PasswordHashPool(workers=2, max_queue=2)
+
+    async def scenario():
+        hashed = await pool.run(get_password_hash, "secret")
+        return await pool.run(verify_password, "secret", hashed)
+
+    try:
+        assert asyncio.run(scenario()) is True
+    finally:
+        pool.shutdown()
+
+
+def test_pool_rejects_with_503_when_queue_is_full():
+    pool = PasswordHashPool(workers=1, max_queue=1)
+
+    async def scenario():
+        busy = [asyncio.create_task(pool.run(time.sleep, 0.2)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(HTTPException) as exc_info:
+            await pool.run(time.sleep, 0)
+        await asyncio.gather(*busy)
+        return exc_info.value
+
+    try:
+        error = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert pool.in_flight == 0
@@ -0,0 +1,123 @@
+import asyncio
+
+import httpx
+import pytest
+
+import cache
+import donation_service
+from donation_models import CheckoutRequest
+from donation_service import DonationService
+from fake_provider import FakeProvider, create_app
+from payment_provider import HttpPaymentProvider, PaymentProvider, ProviderError, RetryBudget
+from payment_status import PaymentStatusBroker
+
+REQUEST = CheckoutRequest(package_id="support", donor_email="ana@example.com", origin_url="https://example.org")
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+    monkeypatch.setattr(donation_service, "payment_status_broker", PaymentStatusBroker())
+
+
+def _fake_client(fake: FakeProvider, **kwargs) -> HttpPaymentProvider:
+    transport = httpx.ASGITransport(app=create_app(fake))
+    return HttpPaymentProvider(base_url="http://fake", api_key="sk_test", transport=transport, **kwargs)
+
+
+def test_checkout_flow_against_fake_provider(run_with_db):
+    fake = FakeProvider()
+
+    async def scenario(db):
+        provider = _fake_client(fake)
+        service = DonationService(db, provider=provider)
+        try:
+            response = await service.create_checkout_session(REQUEST)
+            before = await service.check_payment_status(response.session_id)
+            fake.settle(response.session_id, paid=True)
+            after = await service.check_payment_status(response.session_id)
+            donation = await db.donations.find_one({"id": response.donation_id})
+            return response, before, after, donation
+        finally:
+            await provider.close()
+
+    response, before, after, donation = run_with_db(scenario)
+    session = fake.sessions[response.session_id]
+    assert response.url.endswith(f"/checkout/{response.session_id}")
+    assert session["amount_total"] == 5000
+    assert session["metadata"]["donation_type"] == "one_time"
+    assert session["success_url"] == f"https://example.org/dons/succes?session_id={response.session_id}"
+    assert (before["status"], before["payment_status"]) == ("open", "unpaid")
+    assert after == {"status": "complete", "payment_status": "paid", "amount": 50.0, "currency": "usd"}
+    assert donation["status"] == "completed"
+
+
+def test_incomplete_providers_fail_at_construction():
+    class CheckoutOnly(PaymentProvider):
+        async def create_checkout_session(self, *args, **kwargs):
+            pass
+
+        async def get_checkout_status(self, session_id):
+            pass
+
+    with pytest.raises(TypeError, match="create_charge"):
+        CheckoutOnly()
+
+
+def test_session_creation_is_idempotent():
+    async def scenario():
+        fake = FakeProvider()
+        provider = _fake_client(fake)
+        try:
+            args = dict(
+                amount=25.0, currency="usd", product_name="Don", success_url="https://example.org",
+                cancel_url="https://example.org", metadata={},
+            )
+            first = await provider.create_checkout_session(idempotency_key="donation-1", **args)
+            second = await provider.create_checkout_session(idempotency_key="donation-1", **args)
+            return first, second, len(fake.sessions)
+        finally:
+            await provider.close()
+
+    first, second, count = asyncio.run(scenario())
+    assert first == second
+    assert count == 1
+
+
+def _flaky_transport(failures):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) <= failures:
+            return httpx.Response(503)
+        return httpx.Response(200, json={
+            "status": "open", "payment_status": "unpaid", "amount_total": 100, "currency": "usd",
+        })
+
+    return httpx.MockTransport(handler), calls
+
+
+def test_transient_failures_are_retried(monkeypatch):
+    monkeypatch.setattr("payment_provider.PROVIDER_RETRY_BACKOFF_SECONDS", 0)
+    transport, calls = _flaky_transport(failures=2)
+    provider = HttpPaymentProvider(base_url="http://fake", transport=transport, max_retries=2)
+
+    status = asyncio.run(provider.get_checkout_status("cs_1"))
+    assert status.amount_total == 100
+    assert len(calls) == 3
+    assert provider.stats()["retries"] == 2
+
+
+def test_exhausted_retry_budget_fails_fast(monkeypatch):
+    monkeypatch.setattr("payment_provider.PROVIDER_RETRY_BACKOFF_SECONDS", 0)
+    transport, calls = _flaky_transport(failures=10)
+    provider = HttpPaymentProvider(
+        base_url="http://fake", transport=transport, max_retries=5, retry_budget=RetryBudget(ratio=0.1, reserve=1)
+    )
+
+    with pytest.raises(ProviderError):
+        asyncio.run(provider.get_checkout_status("cs_1"))
+    # One retry from the reserve, then the budget is spent
+    assert len(calls) == 2
+    assert provider.stats()["retry_budget_exhausted"] == 1
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+import cache
+import donation_service
+import payment_status
+from donation_models import CheckoutRequest
+from donation_service import DonationService
+from payment_status import PaymentStatusBroker, is_terminal, status_stream
+
+REQUEST = CheckoutRequest(package_id="support", donor_email="ana@example.com", origin_url="https://example.org")
+
+
+class CheckoutStatus:
+    def __init__(self, status, payment_status):
+        self.status = status
+        self.payment_status = payment_status
+        self.amount_total = 5000
+        self.currency = "usd"
+        self.customer = None
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+    monkeypatch.setattr(payment_status, "payment_status_broker", PaymentStatusBroker())
+    monkeypatch.setattr(donation_service, "payment_status_broker", payment_status.payment_status_broker)
+
+
+def _with_provider(service, status, payment):
+    async def get_checkout_status(session_id):
+        return CheckoutStatus(status, payment)
+
+    service.get_checkout_status = get_checkout_status
+
+
+def test_is_terminal():
+    assert is_terminal({"status": "complete", "payment_status": "paid"})
+    assert is_terminal({"status": "expired", "payment_status": "unpaid"})
+    assert not is_terminal({"status": "open", "payment_status": "unpaid"})
+
+
+def test_wait_returns_published_payload():
+    async def scenario():
+        broker = PaymentStatusBroker()
+        waiter = asyncio.ensure_future(broker.wait("cs_1", timeout=1))
+        await asyncio.sleep(0)
+        broker.publish("cs_1", {"payment_status": "paid"})
+        return await waiter, await broker.wait("cs_2", timeout=0.01), broker._waiters
+
+    assert asyncio.run(scenario()) == ({"payment_status": "paid"}, None, {})
+
+
+def test_unchanged_status_is_not_rewritten(run_with_db):
+    async def scenario(db):
+        service = DonationService(db)
+        response = await service.create_checkout_session(REQUEST)
+        await service.check_payment_status(response.session_id)
+        first = await db.payment_transactions.find_one({"session_id": response.session_id})
+        await service.check_payment_status(response.session_id)
+        second = await db.payment_transactions.find_one({"session_id": response.session_id})
+        return first, second
+
+    first, second = run_with_db(scenario)
+    assert first["payment_status"] == "failed"
+    assert second["updated_at"] == first["updated_at"]
+
+
+def test_terminal_status_is_served_without_mongo(run_with_db):
+    async def scenario(db):
+        service = DonationService(db)
+        response = await service.create_checkout_session(REQUEST)
+        _with_provider(service, "complete", "paid")
+        paid = await service.check_payment_status(response.session_id)
+
+        async def no_reads(*args, **kwargs):
+            raise AssertionError("terminal status should come from the cache")
+
+        db.payment_transactions.find_one = no_reads
+        again = await service.check_payment_status(response.session_id)
+        donation = await db.donations.find_one({"id": response.donation_id})
+        return paid, again, donation
+
+    paid, again, donation = run_with_db(scenario)
+    assert paid == again
+    assert paid["payment_status"] == "paid"
+    assert donation["status"] == "completed"
+
+
+def test_stream_pushes_published_status():
+    async def scenario():
+        broker = PaymentStatusBroker()
+        checks = []
+
+        async def check(session_id):
+            checks.append(session_id)
+            return {"status": "open", "payment_status": "unpaid"}
+
+        async def disconnected():
+            return False
+
+        async def collect():
+            return [event async for event in status_stream(broker, "cs_1", check, disconnected, recheck=5, timeout=5)]
+
+        events = asyncio.ensure_future(collect())
+        await asyncio.sleep(0.01)
+        broker.publish("cs_1", {"status": "complete", "payment_status": "paid"})
+        return await events, checks
+
+    events, checks = asyncio.run(scenario())
+    assert checks == ["cs_1"]
+    assert events[0].startswith(b"event: status\ndata: ")
+    assert events[-1] == b'event: status\ndata: {"status": "complete", "payment_status": "paid"}\n\n'
+
+
+def test_stream_times_out_with_keepalives():
+    async def scenario():
+        async def check(session_id):
+            return {"status": "open", "payment_status": "unpaid"}
+
+        async def disconnected():
+            return False
+
+        stream = status_stream(PaymentStatusBroker(), "cs_1", check, disconnected, recheck=0.01, timeout=0.05)
+        return [event async for event in stream]
+
+    events = asyncio.run(scenario())
+    assert b": keepalive\n\n" in events
+    assert events[-1].startswith(b"event: timeout\n")
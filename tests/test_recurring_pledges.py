@@ -0,0 +1,283 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import httpx
+
+import cache
+from donation_models import CheckoutRequest, Donation, DonationType
+from donation_service import DonationService
+from fake_provider import FakeProvider, create_app
+from payment_provider import ChargeResult, HttpPaymentProvider, MockPaymentProvider, ProviderError
+from recurring_pledges import PAST_DUE, PLEDGES_COLLECTION, RECURRING_MAX_ERRORS, add_months, run_due_pledges
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+
+
+class ChargingProvider(MockPaymentProvider):
+    """Idempotent by key, like the real provider; declines the listed customers"""
+
+    def __init__(self, declined=()):
+        self.declined = set(declined)
+        self.calls = []
+        self.charges = {}
+
+    async def create_charge(self, amount, currency, customer, metadata, idempotency_key):
+        self.calls.append(idempotency_key)
+        await asyncio.sleep(0)
+        if idempotency_key not in self.charges:
+            self.charges[idempotency_key] = ChargeResult(
+                charge_id=f"ch_{len(self.charges)}",
+                succeeded=customer not in self.declined,
+                failure_reason="card_declined" if customer in self.declined else None,
+            )
+        return self.charges[idempotency_key]
+
+
+async def _start_pledges(service, count, donation_type=DonationType.MONTHLY):
+    donations = [
+        Donation(amount=10.0, donation_type=donation_type, payment_session_id=f"cs_{i}")
+        for i in range(count)
+    ]
+    await service.db.donations.insert_many([d.model_dump() for d in donations])
+    for i, donation in enumerate(donations):
+        await service.complete_donation(donation.id, customer_id=f"cus_{i}")
+    return donations
+
+
+async def _last_due(db):
+    return (await db[PLEDGES_COLLECTION].find_one({}, sort=[("next_due", -1)]))["next_due"]
+
+
+def test_add_months_keeps_the_anchor_day():
+    jan_31 = datetime(2024, 1, 31, 9, 30)
+    assert add_months(jan_31, 1, 31) == datetime(2024, 2, 29, 9, 30)
+    assert add_months(datetime(2024, 2, 29, 9, 30), 1, 31) == datetime(2024, 3, 31, 9, 30)
+    assert add_months(datetime(2024, 2, 29), 12, 29) == datetime(2025, 2, 28)
+    assert add_months(datetime(2024, 11, 15), 2, 15) == datetime(2025, 1, 15)
+
+
+def test_due_pledges_are_charged_once_per_period(run_with_db):
+    async def scenario(db):
+        provider = ChargingProvider()
+        service = DonationService(db, provider=provider)
+        donations = await _start_pledges(service, 25)
+        # A recurring charge does not start a new pledge
+        pledges = await db[PLEDGES_COLLECTION].count_documents({})
+        due = await _last_due(db)
+
+        early = await run_due_pledges(service, now=due - timedelta(days=2))
+        first = await run_due_pledges(service, now=due, batch_size=10, concurrency=4)
+        again = await run_due_pledges(service, now=due, batch_size=10, concurrency=4)
+        charges = await db.donations.find({"pledge_id": {"$ne": None}}).to_list(None)
+        rollup = await db.donation_rollups.find_one({"_id": "all"})
+        pledge = await db[PLEDGES_COLLECTION].find_one({"id": donations[0].id})
+        return pledges, early, first, again, charges, rollup, pledge, due, len(provider.calls)
+
+    pledges, early, first, again, charges, rollup, pledge, due, calls = run_with_db(scenario)
+    assert pledges == 25
+    assert early["charged"] == 0
+    assert first == {"charged": 25, "declined": 0, "errors": 0}
+    assert again["charged"] == 0
+    assert calls == 25
+    assert len(charges) == 25
+    assert all(c["status"] == "completed" and c["donation_type"] == "monthly" for c in charges)
+    assert rollup["count"] == 50
+    assert pledge["next_due"] == add_months(pledge["created_at"], 2, pledge["anchor_day"])
+    assert pledge["charges"] == 1
+
+
+def test_restart_after_a_crash_does_not_double_charge(run_with_db):
+    async def scenario(db):
+        provider = ChargingProvider()
+        service = DonationService(db, provider=provider)
+        await _start_pledges(service, 5)
+        due = await _last_due(db)
+
+        pledges = db[PLEDGES_COLLECTION]
+        bulk_write = pledges.bulk_write
+
+        async def crash(*args, **kwargs):
+            raise RuntimeError("worker killed before the pledges advanced")
+
+        pledges.bulk_write = crash
+        with pytest.raises(RuntimeError):
+            await run_due_pledges(service, now=due, lease_seconds=60)
+        pledges.bulk_write = bulk_write
+
+        # Still leased: nothing happens until the lease expires
+        assert (await run_due_pledges(service, now=due, lease_seconds=60))["charged"] == 0
+        resumed = await run_due_pledges(service, now=due + timedelta(seconds=61))
+        charges = await db.donations.count_documents({"pledge_id": {"$ne": None}, "status": "completed"})
+        rollup = await db.donation_rollups.find_one({"_id": "all"})
+        return resumed, charges, rollup, provider
+
+    resumed, charges, rollup, provider = run_with_db(scenario)
+    assert resumed["charged"] == 5
+    assert charges == 5
+    assert rollup["count"] == 10
+    # Charges already recorded as succeeded are not sent to the provider again
+    assert len(provider.charges) == 5
+    assert len(provider.calls) == 5
+
+
+def test_declines_retry_then_mark_past_due(run_with_db):
+    async def scenario(db):
+        provider = ChargingProvider(declined={"cus_0"})
+        service = DonationService(db, provider=provider)
+        donations = await _start_pledges(service, 2)
+        now = await _last_due(db)
+        results = []
+        for _ in range(3):
+            results.append(await run_due_pledges(service, now=now))
+            pledge = await db[PLEDGES_COLLECTION].find_one({"id": donations[0].id})
+            now = pledge["next_due"] if pledge["status"] != PAST_DUE else now + timedelta(days=30)
+        return results, pledge, len(set(provider.calls))
+
+    results, pledge, keys = run_with_db(scenario)
+    assert [r["declined"] for r in results] == [1, 1, 1]
+    assert pledge["status"] == PAST_DUE
+    assert pledge["failures"] == 3
+    # Each retry is a new attempt with its own idempotency key
+    assert keys >= 4
+
+
+def test_overdue_pledges_are_charged_once_per_run(run_with_db):
+    async def scenario(db):
+        provider = ChargingProvider()
+        service = DonationService(db, provider=provider)
+        donations = await _start_pledges(service, 1)
+        pledge = await db[PLEDGES_COLLECTION].find_one({})
+        # The scheduler was down for three periods
+        now = add_months(pledge["next_due"], 3, pledge["anchor_day"]) + timedelta(hours=1)
+        first = await run_due_pledges(service, now=now)
+        second = await run_due_pledges(service, now=now)
+        pledge = await db[PLEDGES_COLLECTION].find_one({"id": donations[0].id})
+        return first, second, pledge, now
+
+    first, second, pledge, now = run_with_db(scenario)
+    assert first["charged"] == 1
+    assert second["charged"] == 0
+    assert now < pledge["next_due"] <= add_months(now, 1, pledge["anchor_day"])
+
+
+def test_provider_errors_back_off_then_mark_past_due(run_with_db):
+    class FailingProvider(ChargingProvider):
+        async def create_charge(self, amount, currency, customer, metadata, idempotency_key):
+            self.calls.append(idempotency_key)
+            raise ProviderError("provider unavailable")
+
+    async def scenario(db):
+        provider = FailingProvider()
+        service = DonationService(db, provider=provider)
+        await _start_pledges(service, 1)
+        now = await _last_due(db)
+        dues = []
+        for _ in range(RECURRING_MAX_ERRORS):
+            assert (await run_due_pledges(service, now=now))["errors"] == 1
+            pledge = await db[PLEDGES_COLLECTION].find_one({})
+            dues.append(pledge["next_due"])
+            now = pledge["next_due"]
+        return pledge, dues, provider.calls
+
+    pledge, dues, calls = run_with_db(scenario)
+    assert pledge["status"] == PAST_DUE
+    assert pledge["errors"] == RECURRING_MAX_ERRORS
+    gaps = [later - earlier for earlier, later in zip(dues, dues[1:-1])]
+    assert gaps == sorted(gaps) and gaps[0] < gaps[-1]
+    # An error may hide a charge that went through, so every retry reuses the key
+    assert len(set(calls)) == 1
+
+
+def test_mock_provider_never_completes_a_charge(run_with_db):
+    async def scenario(db):
+        service = DonationService(db, provider=MockPaymentProvider())
+        await _start_pledges(service, 2)
+        counts = await run_due_pledges(service, now=await _last_due(db))
+        charged = await db.donations.count_documents({"pledge_id": {"$ne": None}})
+        return counts, charged, service.provider.moves_money
+
+    counts, charged, moves_money = run_with_db(scenario)
+    assert counts == {"charged": 0, "declined": 2, "errors": 0}
+    assert charged == 0
+    assert not moves_money
+
+
+def test_stale_claim_does_not_recharge_or_charge_cancelled_pledges(run_with_db):
+    async def scenario(db):
+        provider = ChargingProvider()
+        service = DonationService(db, provider=provider)
+        donations = await _start_pledges(service, 3)
+        due = await _last_due(db)
+        pledges = db[PLEDGES_COLLECTION]
+        update_many = pledges.update_many
+        interleaved = False
+
+        async def after_other_worker(*args, **kwargs):
+            nonlocal interleaved
+            if not interleaved:
+                interleaved = True
+                # Between this worker's find and its lease: another worker
+                # charges two pledges, and the donor cancels the third
+                await pledges.update_one({"id": donations[2].id}, {"$set": {"status": "cancelled"}})
+                await run_due_pledges(service, now=due)
+            return await update_many(*args, **kwargs)
+
+        pledges.update_many = after_other_worker
+        stale = await run_due_pledges(service, now=due + timedelta(seconds=5))
+        pledges.update_many = update_many
+        charged = await db.donations.count_documents({"pledge_id": {"$ne": None}})
+        return stale, charged, provider.calls
+
+    stale, charged, calls = run_with_db(scenario)
+    assert stale["charged"] == 0
+    assert charged == 2
+    assert len(calls) == 2
+
+
+def test_concurrent_runs_share_the_work(run_with_db):
+    async def scenario(db):
+        provider = ChargingProvider()
+        service = DonationService(db, provider=provider)
+        await _start_pledges(service, 40, DonationType.YEARLY)
+        due = await _last_due(db)
+        runs = await asyncio.gather(*(run_due_pledges(service, now=due, batch_size=5) for _ in range(3)))
+        return runs, provider
+
+    runs, provider = run_with_db(scenario)
+    assert sum(run["charged"] for run in runs) == 40
+    assert len(provider.calls) == len(set(provider.calls)) == 40
+
+
+def test_recurring_checkout_saves_the_customer_it_charges(run_with_db):
+    fake = FakeProvider()
+
+    async def scenario(db):
+        provider = HttpPaymentProvider(
+            base_url="http://fake", api_key="sk_test", transport=httpx.ASGITransport(app=create_app(fake))
+        )
+        service = DonationService(db, provider=provider)
+        try:
+            request = CheckoutRequest(
+                package_id="support", donation_type=DonationType.MONTHLY,
+                donor_email="ana@example.com", origin_url="https://example.org",
+            )
+            response = await service.create_checkout_session(request)
+            fake.settle(response.session_id, paid=True)
+            await service.check_payment_status(response.session_id)
+            pledge = await db[PLEDGES_COLLECTION].find_one({"id": response.donation_id})
+            charged = await run_due_pledges(service, now=pledge["next_due"])
+            with pytest.raises(ProviderError):
+                await provider.create_charge(10.0, "usd", response.session_id, {}, "unknown-customer")
+            return pledge, charged
+        finally:
+            await provider.close()
+
+    pledge, charged = run_with_db(scenario)
+    assert pledge["customer"] in fake.customers
+    assert charged == {"charged": 1, "declined": 0, "errors": 0}
+    assert [intent["customer"] for intent in fake.intents.values()] == [pledge["customer"]]
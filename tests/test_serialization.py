@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import List
+
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from donation_models import Donation
+from pagination import Page
+from serialization import projection_for, trusted_list_response, trusted_page_response
+from server import Event, Member
+
+
+def fastapi_body(response_type, models):
+    """What FastAPI renders today: validate, dump in JSON mode, json.dumps"""
+    adapter = TypeAdapter(response_type)
+    return JSONResponse(adapter.dump_python(adapter.validate_python(models), mode="json")).body
+
+
+def member_doc(i):
+    return {
+        "id": f"member-{i}", "name": f"Membre {i} Éloïse", "email": f"membre{i}@example.com",
+        "phone": "+1 809 555 0101", "qte_enfants": i % 4, "active": True,
+        "registration_date": datetime(2025, 1, 2, 3, 4, 5, 123000),
+    }
+
+
+def test_projection_selects_model_fields_only():
+    projection = projection_for(Event)
+    assert projection["_id"] == 0
+    assert set(projection) - {"_id"} == set(Event.model_fields)
+
+
+def test_trusted_page_matches_validated_rendering():
+    docs = [member_doc(i) for i in range(3)]
+    expected = fastapi_body(Page[Member], Page[Member](items=[Member(**d) for d in docs], next_cursor="abc"))
+    assert trusted_page_response(Member, docs, "abc").body == expected
+
+
+def test_trusted_list_matches_validated_rendering_with_raw_enum_strings():
+    docs = [{
+        "id": "d1", "user_id": "u1", "email": "ana@example.com", "amount": 50.0,
+        "donation_type": "monthly", "payment_status": "paid", "status": "completed",
+        "created_at": datetime(2025, 5, 1), "completed_at": None, "metadata": {"source": "church_website"},
+    }]
+    expected = fastapi_body(List[Donation], [Donation(**d) for d in docs])
+    assert trusted_list_response(Donation, docs).body == expected
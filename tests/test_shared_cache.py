@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+
+from cache import LocalCacheBackend, RedisCacheBackend, SharedCache
+
+
+def backends():
+    yield pytest.param(lambda: LocalCacheBackend(), id="local")
+    yield pytest.param(redis_backend, id="fakeredis")
+
+
+def redis_backend(server=None):
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisCacheBackend(fakeredis.FakeAsyncRedis(server=server))
+
+
+@pytest.mark.parametrize("make_backend", backends())
+def test_versions_invalidate_entries(make_backend):
+    async def scenario():
+        cache = SharedCache(make_backend())
+        value = 1
+
+        async def load():
+            return str(value).encode()
+
+        assert await cache.get_or_load("counts", "a", load) == b"1"
+        value = 2
+        assert await cache.get_or_load("counts", "a", load) == b"1"
+        await cache.bump("counts")
+        assert await cache.get_or_load("counts", "a", load) == b"2"
+        assert cache.stats()["hits"] == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", backends())
+def test_concurrent_misses_load_once(make_backend):
+    async def scenario():
+        cache = SharedCache(make_backend())
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return b"stats"
+
+        results = await asyncio.gather(*(cache.get_or_load("stats", "all", load) for _ in range(100)))
+        assert results == [b"stats"] * 100
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_workers_sharing_redis_load_a_cold_key_once():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+
+    async def scenario():
+        workers = [SharedCache(redis_backend(server)) for _ in range(4)]
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.1)
+            return b"events"
+
+        results = await asyncio.gather(*(worker.get_or_load("events", "list", load) for worker in workers))
+        assert results == [b"events"] * 4
+        assert calls == 1
+
+        # A bump from one worker is seen by the others once their version copy expires
+        await workers[0].bump("events")
+        for worker in workers[1:]:
+            worker.version_ttl = 0
+            worker._versions.clear()
+            assert await worker.version("events") == 1
+
+    asyncio.run(scenario())
+
+
+def test_backend_errors_fall_back_to_loader():
+    class BrokenBackend(LocalCacheBackend):
+        async def get_counter(self, key):
+            raise ConnectionError("redis down")
+
+    async def scenario():
+        cache = SharedCache(BrokenBackend())
+
+        async def load():
+            return b"fresh"
+
+        assert await cache.get_or_load("stats", "all", load) == b"fresh"
+        assert cache.stats()["errors"] == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", backends())
+def test_cancelled_leader_does_not_fail_followers(make_backend):
+    async def scenario():
+        cache = SharedCache(make_backend())
+        calls = 0
+
+        async def load():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return b"stats"
+
+        leader = asyncio.create_task(cache.get_or_load("stats", "all", load))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(cache.get_or_load("stats", "all", load)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await asyncio.gather(*followers) == [b"stats"] * 5
+        assert leader.cancelled()
+        assert calls == 1
+        assert await cache.get_or_load("stats", "all", load) == b"stats"
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("make_backend", backends())
+def test_failed_load_releases_the_lock(make_backend):
+    async def scenario():
+        cache = SharedCache(make_backend())
+
+        async def fail():
+            raise LookupError("missing")
+
+        async def load():
+            return b"found"
+
+        with pytest.raises(LookupError):
+            await cache.get_or_load("events", "event:1", fail)
+        # No lock left behind for another worker to wait out
+        assert await asyncio.wait_for(cache.get_or_load("events", "event:1", load), 1) == b"found"
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+import asyncio
+
+from fastapi import HTTPException
+
+import server
+from auth_models import UserCreate
+from server import MemberCreate, NewsletterSubscribe
+
+SIGNUPS = 500
+
+
+async def fire(handler, payload, count=SIGNUPS):
+    results = await asyncio.gather(*(handler(payload) for _ in range(count)), return_exceptions=True)
+    successes = [r for r in results if not isinstance(r, Exception)]
+    failures = [r for r in results if isinstance(r, Exception)]
+    return successes, failures
+
+
+def assert_single_winner(successes, failures, detail):
+    assert len(successes) == 1
+    assert len(failures) == SIGNUPS - 1
+    assert all(isinstance(f, HTTPException) and f.status_code == 400 for f in failures)
+    assert {f.detail for f in failures} == {detail}
+
+
+def test_concurrent_member_signups_create_one_document(run_with_db, monkeypatch):
+    payload = MemberCreate(name="Ana Pérez", email="ana@example.com", phone="+1 809 555 0101")
+
+    async def scenario(db):
+        monkeypatch.setattr(server, "db", db)
+        result = await fire(server.register_member, payload)
+        return result, await db.members.count_documents({"email": "ana@example.com"})
+
+    (successes, failures), stored = run_with_db(scenario)
+    assert_single_winner(successes, failures, "Cette adresse e-mail est déjà enregistrée")
+    assert stored == 1
+
+
+def test_concurrent_newsletter_signups_create_one_document(run_with_db, monkeypatch):
+    payload = NewsletterSubscribe(email="ana@example.com", name="Ana")
+
+    async def scenario(db):
+        monkeypatch.setattr(server, "db", db)
+        result = await fire(server.subscribe_newsletter, payload)
+        return result, await db.newsletter_subscribers.count_documents({"email": "ana@example.com"})
+
+    (successes, failures), stored = run_with_db(scenario)
+    assert_single_winner(successes, failures, "Cette adresse e-mail est déjà inscrite à notre newsletter")
+    assert stored == 1
+
+
+def test_concurrent_user_signups_create_one_document(run_with_db, monkeypatch):
+    payload = UserCreate(
+        email="ana@example.com", username="ana", password="secret", first_name="Ana", last_name="Pérez"
+    )
+
+    async def fast_hash(password):
+        return f"hashed-{password}"
+
+    async def scenario(db):
+        monkeypatch.setattr(server, "db", db)
+        # bcrypt cost is not what this test is about
+        monkeypatch.setattr(server, "get_password_hash_async", fast_hash)
+        result = await fire(server.register_user, payload)
+        return result, await db.users.count_documents({"email": "ana@example.com"})
+
+    (successes, failures), stored = run_with_db(scenario)
+    assert_single_winner(successes, failures, "Email already registered")
+    assert stored == 1
@@ -0,0 +1,54 @@
+from pymongo.monitoring import (
+    ConnectionCheckedInEvent,
+    ConnectionCheckedOutEvent,
+    ConnectionCheckOutFailedEvent,
+    ConnectionCheckOutStartedEvent,
+    ConnectionCreatedEvent,
+)
+
+from pool_metrics import PoolMetricsListener
+from storage import create_client, mongo_client_options
+
+ADDRESS = ("db.example", 27017)
+
+
+def test_mongo_options_come_from_environment(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+    monkeypatch.delenv("MONGO_MIN_POOL_SIZE", raising=False)
+    assert mongo_client_options() == {
+        "maxPoolSize": 50,
+        "waitQueueTimeoutMS": 2000,
+        "compressors": "zstd,snappy,zlib",
+    }
+
+
+def test_mongo_client_is_built_with_pool_settings(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    monkeypatch.setenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "1500")
+    client = create_client("mongo", "mongodb://db.example:27017")
+    try:
+        assert client.options.pool_options.max_pool_size == 7
+        assert client.options.server_selection_timeout == 1.5
+    finally:
+        client.close()
+
+
+def test_listener_tracks_in_use_and_checkout_waits():
+    listener = PoolMetricsListener()
+    listener.connection_created(ConnectionCreatedEvent(ADDRESS, 1))
+    listener.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+    listener.connection_checked_out(ConnectionCheckedOutEvent(ADDRESS, 1))
+    listener.connection_check_out_started(ConnectionCheckOutStartedEvent(ADDRESS))
+    listener.connection_check_out_failed(ConnectionCheckOutFailedEvent(ADDRESS, "timeout"))
+
+    stats = listener.snapshot()["db.example:27017"]
+    assert stats["open_connections"] == 1
+    assert stats["in_use"] == 1
+    assert stats["checkouts"] == 1
+    assert stats["checkout_failures"] == {"timeout": 1}
+    assert stats["wait_ms"]["max"] >= 0
+
+    listener.connection_checked_in(ConnectionCheckedInEvent(ADDRESS, 1))
+    assert listener.snapshot()["db.example:27017"]["in_use"] == 0
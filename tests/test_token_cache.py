@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from auth_utils import create_access_token, token_cache, verify_token
+
+
+def make_token(expires_delta):
+    return create_access_token(
+        data={"sub": "ana@example.com", "user_id": "u-1", "role": "member"},
+        expires_delta=expires_delta,
+    )
+
+
+def test_repeat_verification_is_served_from_cache():
+    token_cache.clear()
+    token = make_token(timedelta(minutes=30))
+    first = verify_token(token)
+    second = verify_token(token)
+    assert first == second == {"email": "ana@example.com", "user_id": "u-1", "role": "member"}
+    assert token_cache.hits == 1
+    assert token_cache.misses == 1
+
+
+def test_cached_claims_do_not_outlive_token_expiry():
+    token_cache.clear()
+    token = make_token(timedelta(seconds=1))
+    verify_token(token)
+    time.sleep(1.5)
+    with pytest.raises(HTTPException) as exc_info:
+        verify_token(token)
+    assert exc_info.value.status_code == 401
+
+
+def test_invalid_token_is_not_cached():
+    token_cache.clear()
+    with pytest.raises(HTTPException):
+        verify_token("not-a-token")
+    assert len(token_cache) == 0
@@ -0,0 +1,138 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import cache
+import donation_service
+from donation_models import CheckoutRequest
+from donation_service import DonationService
+from payment_status import PaymentStatusBroker
+from webhook_queue import DEAD, DONE, PENDING, InvalidSignature, WebhookQueue, sign_payload, verify_signature
+
+SECRET = "whsec_test"
+REQUEST = CheckoutRequest(package_id="support", donor_email="ana@example.com", origin_url="https://example.org")
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(cache.shared_cache, "backend", cache.LocalCacheBackend())
+    monkeypatch.setattr(donation_service, "payment_status_broker", PaymentStatusBroker())
+    monkeypatch.setattr(donation_service, "STRIPE_WEBHOOK_SECRET", SECRET)
+
+
+def _event(event_id, session_id, event_type="checkout.session.completed", payment_status="paid") -> bytes:
+    return json.dumps({
+        "id": event_id,
+        "type": event_type,
+        "data": {"object": {"id": session_id, "payment_status": payment_status}},
+    }).encode()
+
+
+def test_verify_signature():
+    body = b'{"id": "evt_1"}'
+    verify_signature(body, sign_payload(body, SECRET, timestamp=1000), SECRET, now=1010)
+    for header, secret, now in [
+        (sign_payload(body + b" ", SECRET, timestamp=1000), SECRET, 1010),
+        (sign_payload(body, "other", timestamp=1000), SECRET, 1010),
+        (sign_payload(body, SECRET, timestamp=1000), SECRET, 2000),
+        (sign_payload(body, SECRET, timestamp=1000), None, 1010),
+        ("garbage", SECRET, 1010),
+    ]:
+        with pytest.raises(InvalidSignature):
+            verify_signature(body, header, secret, tolerance=300, now=now)
+
+
+def test_redelivered_events_are_queued_once_and_applied_once(run_with_db):
+    async def scenario(db):
+        service = DonationService(db)
+        response = await service.create_checkout_session(REQUEST)
+        body = _event("evt_1", response.session_id)
+        acks = [await service.handle_webhook(body, sign_payload(body, SECRET)) for _ in range(3)]
+        # A second event for the same session, e.g. async_payment_succeeded
+        other = _event("evt_2", response.session_id, "checkout.session.async_payment_succeeded")
+        await service.handle_webhook(other, sign_payload(other, SECRET))
+
+        while await service.webhook_queue.process_next(service.apply_webhook_event, "worker"):
+            pass
+        donation = await db.donations.find_one({"id": response.donation_id})
+        transaction = await db.payment_transactions.find_one({"session_id": response.session_id})
+        rollup = await db.donation_rollups.find_one({"_id": "all"})
+        return acks, donation, transaction, rollup, await service.webhook_queue.stats(), response.session_id
+
+    acks, donation, transaction, rollup, stats, session_id = run_with_db(scenario)
+    assert [ack["duplicate"] for ack in acks] == [False, True, True]
+    assert donation["status"] == transaction["status"] == "completed"
+    assert transaction["payment_status"] == "paid"
+    assert rollup["count"] == 1
+    assert stats == {DONE: 2}
+    assert donation_service.payment_status_broker.cached(session_id)["payment_status"] == "paid"
+
+
+def test_invalid_signature_is_rejected(run_with_db):
+    async def scenario(db):
+        service = DonationService(db)
+        body = _event("evt_1", "cs_1")
+        with pytest.raises(HTTPException) as raised:
+            await service.handle_webhook(body, sign_payload(body, "other"))
+        return raised.value.status_code, await db.webhook_events.count_documents({})
+
+    assert run_with_db(scenario) == (400, 0)
+
+
+def test_failures_retry_with_backoff_then_park(run_with_db):
+    async def scenario(db):
+        queue = WebhookQueue(db, max_attempts=2)
+        await queue.enqueue("evt_1", "checkout.session.completed", _event("evt_1", "cs_1"))
+
+        async def broken(event):
+            raise RuntimeError("boom")
+
+        await queue.process_next(broken, "worker")
+        retrying = await db.webhook_events.find_one({"_id": "evt_1"})
+        # Not due again until the backoff elapses
+        assert not await queue.process_next(broken, "worker")
+        await db.webhook_events.update_one({"_id": "evt_1"}, {"$set": {"available_at": retrying["received_at"]}})
+        await queue.process_next(broken, "worker")
+        return retrying, await db.webhook_events.find_one({"_id": "evt_1"})
+
+    retrying, parked = run_with_db(scenario)
+    assert retrying["status"] == PENDING
+    assert retrying["available_at"] > retrying["received_at"]
+    assert retrying["last_error"] == "boom"
+    assert parked["status"] == DEAD
+    assert parked["attempts"] == 2
+
+
+def test_expired_lease_is_reclaimed(run_with_db):
+    async def scenario(db):
+        queue = WebhookQueue(db, lease_seconds=0)
+        await queue.enqueue("evt_1", "checkout.session.expired", _event("evt_1", "cs_1"))
+        first = await queue.claim("crashed")
+        second = await queue.claim("worker")
+
+        # The crashed worker's late completion no longer owns the lease
+        await queue.complete(first, "crashed")
+        assert (await db.webhook_events.find_one({"_id": "evt_1"}))["status"] != DONE
+        await queue.complete(second, "worker")
+        return first["attempts"], second["attempts"], await db.webhook_events.find_one({"_id": "evt_1"})
+
+    first, second, event = run_with_db(scenario)
+    assert (first, second) == (1, 2)
+    assert event["status"] == DONE
+    assert "raw" not in event
+
+
+def test_events_whose_worker_always_dies_are_parked(run_with_db):
+    async def scenario(db):
+        queue = WebhookQueue(db, lease_seconds=0, max_attempts=3)
+        await queue.enqueue("evt_1", "checkout.session.completed", _event("evt_1", "cs_1"))
+        # Each worker dies mid-handler, so nothing ever calls fail()
+        claims = [await queue.claim(f"crashed-{i}") for i in range(4)]
+        return claims, await db.webhook_events.find_one({"_id": "evt_1"})
+
+    claims, event = run_with_db(scenario)
+    assert [claim["attempts"] for claim in claims[:3]] == [1, 2, 3]
+    assert claims[3] is None
+    assert event["status"] == DEAD
+    assert "lease_owner" not in event